@@ -0,0 +1,39 @@
+"""
+Maintenance des tables d'audit : crée les partitions des prochains mois
+(PostgreSQL) puis archive en CSV compressé les mois sortis de la rétention.
+À exécuter chaque jour (maintenance_automatique.py) ou via cron :
+
+    python manage.py archiver_audit [--retention 12] [--repertoire DIR] [--simulation]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from api.services_partitions import archiver, creer_partitions_a_venir
+
+
+class Command(BaseCommand):
+    help = "Crée les partitions à venir des tables d'audit et archive les mois anciens"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention', type=int, default=None,
+                            help="Mois gardés en base, mois courant compris (AUDIT_RETENTION_MOIS)")
+        parser.add_argument('--avance', type=int, default=None,
+                            help="Mois à venir dont la partition est créée (AUDIT_PARTITIONS_AVANCE)")
+        parser.add_argument('--repertoire', default=None,
+                            help="Répertoire des archives (AUDIT_ARCHIVE_DIR)")
+        parser.add_argument('--simulation', action='store_true',
+                            help="Liste les mois qui seraient archivés sans rien modifier")
+
+    def handle(self, *args, **options):
+        if options['retention'] is not None and options['retention'] < 1:
+            raise CommandError("La rétention doit être d'au moins un mois")
+
+        if not options['simulation']:
+            for nom in creer_partitions_a_venir(options['avance']):
+                self.stdout.write(f"Partition créée : {nom}")
+
+        archives = archiver(options['retention'], options['repertoire'], simulation=options['simulation'])
+        for archive in archives:
+            self.stdout.write(f"{'À archiver' if options['simulation'] else 'Archivé'} : {archive}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(archives)} mois {'à archiver' if options['simulation'] else 'archivés'}"
+        ))
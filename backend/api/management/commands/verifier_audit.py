@@ -0,0 +1,54 @@
+"""
+Vérification de la chaîne d'empreintes des tables d'audit (Acces, AuditConformite) :
+
+    python manage.py verifier_audit [--table api_acces] [--processus 4] [--sceller]
+
+Se termine en erreur si une ligne a été modifiée, supprimée ou insérée après coup.
+Les rangs archivés (archiver_audit) ne sont pas relus : la première ligne
+restante est vérifiée à partir de l'empreinte de la dernière ligne archivée.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from api.services_integrite import MODELES_CHAINES, TAILLE_LOT_VERIFICATION, sceller, verifier_chaine
+
+
+class Command(BaseCommand):
+    help = "Vérifie la chaîne d'empreintes des tables d'audit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', action='append', choices=[modele._meta.db_table for modele in MODELES_CHAINES],
+                            help="Table à vérifier (toutes par défaut)")
+        parser.add_argument('--processus', type=int, default=None,
+                            help="Processus de vérification (AUDIT_VERIFICATION_PROCESSUS)")
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT_VERIFICATION,
+                            help="Lignes lues par requête")
+        parser.add_argument('--sceller', action='store_true',
+                            help="Chaîne d'abord les lignes qui ne le sont pas encore")
+
+    def handle(self, *args, **options):
+        anomalies = 0
+        for modele in MODELES_CHAINES:
+            table = modele._meta.db_table
+            if options['table'] and table not in options['table']:
+                continue
+            if options['sceller']:
+                self.stdout.write(f"{table} : {sceller(modele)} lignes chaînées")
+
+            rapport = verifier_chaine(modele, options['processus'], options['taille_lot'])
+            self.stdout.write(
+                f"{table} : {rapport['lignes']} lignes vérifiées (rangs {rapport['debut']} à {rapport['fin']}), "
+                f"{rapport['nb_anomalies']} anomalies"
+            )
+            if rapport['non_chainees']:
+                self.stdout.write(self.style.WARNING(
+                    f"  {rapport['non_chainees']} lignes non chaînées (--sceller pour les chaîner)"
+                ))
+            if rapport['archivees']:
+                self.stdout.write(f"  rangs 1 à {rapport['archivees']} archivés")
+            for rang, message in rapport['anomalies']:
+                self.stdout.write(self.style.ERROR(f"  rang {rang} : {message}"))
+            anomalies += rapport['nb_anomalies']
+
+        if anomalies:
+            raise CommandError(f"{anomalies} anomalies dans la chaîne d'audit")
+        self.stdout.write(self.style.SUCCESS("Chaîne d'audit intègre"))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_alerteconformite_typealerteconformite_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('fichier', models.FileField(upload_to='imports/')),
+                ('nom_fichier', models.CharField(max_length=255)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20)),
+                ('encodage', models.CharField(blank=True, max_length=50, null=True)),
+                ('lignes_total', models.IntegerField(default=0)),
+                ('lignes_traitees', models.IntegerField(default=0)),
+                ('stats', models.JSONField(default=dict, help_text='Compteurs par table')),
+                ('erreurs', models.JSONField(default=list)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import CSV',
+                'verbose_name_plural': 'Imports CSV',
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='mise_a_jour',
+            field=models.BooleanField(default=False, help_text='Met à jour les patients existants dont la ligne a changé'),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='empreinte_import',
+            field=models.CharField(blank=True, help_text='Empreinte SHA-256 de la dernière ligne CSV importée', max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_import_mise_a_jour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepriseImport',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('empreinte_fichier', models.CharField(help_text='SHA-256 du fichier importé', max_length=64, unique=True)),
+                ('taille_morceau', models.IntegerField()),
+                ('morceaux_valides', models.IntegerField(default=0, help_text='Nombre de morceaux déjà validés en base')),
+                ('lignes_validees', models.IntegerField(default=0)),
+                ('stats', models.JSONField(default=dict, help_text='Statistiques cumulées au dernier morceau validé')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "Point de reprise d'import",
+                'verbose_name_plural': "Points de reprise d'import",
+            },
+        ),
+    ]
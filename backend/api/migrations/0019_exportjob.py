@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_repriseimport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('format', models.CharField(choices=[('PDF', 'PDF')], default='PDF', max_length=10)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20)),
+                ('fichier', models.FileField(blank=True, null=True, upload_to='exports/')),
+                ('lignes_total', models.IntegerField(default=0)),
+                ('lignes_traitees', models.IntegerField(default=0)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Export en arrière-plan',
+                'verbose_name_plural': 'Exports en arrière-plan',
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dossiermedical',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='analyse',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='resultatanalyse',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
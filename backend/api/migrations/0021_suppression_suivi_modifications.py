@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_date_modification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='dossiermedical',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='analyse',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='resultatanalyse',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='Suppression',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('entite', models.CharField(help_text='patients, dossiers, analyses ou resultats', max_length=50)),
+                ('objet_id', models.IntegerField()),
+                ('date_suppression', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Suppression',
+                'verbose_name_plural': 'Suppressions',
+                'ordering': ['date_suppression'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_suppression_suivi_modifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='cout_estime',
+            field=models.FloatField(default=0, help_text='Durée de rendu estimée en secondes'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='parametres',
+            field=models.JSONField(default=dict, help_text="Paramètres de l'export (période de l'historique...)"),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='type_export',
+            field=models.CharField(choices=[('PATIENTS', 'Patients'), ('HISTORIQUE', 'Historique des accès')], default='PATIENTS', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='format',
+            field=models.CharField(choices=[('PDF', 'PDF'), ('CSV', 'CSV')], default='PDF', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['statut', 'date_creation'], name='api_exportj_statut_30c0f1_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_exportjob_planification'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='acces',
+            name='dateAcces',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+# Tables d'audit partitionnées par mois (PostgreSQL seulement)
+TABLES_AUDIT = [
+    ('api_acces', 'dateAcces'),
+    ('api_auditconformite', 'date_action'),
+]
+
+
+def partitionner_tables_audit(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from api.services_partitions import partitionner
+    for table, colonne in TABLES_AUDIT:
+        partitionner(schema_editor, table, colonne)
+
+
+def departitionner_tables_audit(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from api.services_partitions import departitionner
+    for table, _ in TABLES_AUDIT:
+        departitionner(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_acces_date_par_defaut'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='acces',
+            index=models.Index(fields=['dateAcces'], name='api_acces_dateAcc_8ce404_idx'),
+        ),
+        migrations.RunPython(partitionner_tables_audit, departitionner_tables_audit),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def calculer_activite(apps, schema_editor):
+    """Compteurs horaires des accès déjà journalisés"""
+    Acces = apps.get_model('api', 'Acces')
+    ActiviteAcces = apps.get_model('api', 'ActiviteAcces')
+    lignes = Acces.objects.annotate(heure=TruncHour('dateAcces')).values(
+        'heure', 'utilisateur_id', 'typeAcces'
+    ).annotate(nombre=Count('id')).order_by()
+    ActiviteAcces.objects.bulk_create((
+        ActiviteAcces(heure=ligne['heure'], utilisateur_id=ligne['utilisateur_id'],
+                      type_acces=ligne['typeAcces'], nombre=ligne['nombre'])
+        for ligne in lignes.iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_partitionnement_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiviteAcces',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('heure', models.DateTimeField(help_text="Début de l'heure (UTC)")),
+                ('type_acces', models.CharField(max_length=250)),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('utilisateur', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Activité horaire des accès',
+                'verbose_name_plural': 'Activité horaire des accès',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activiteacces',
+            constraint=models.UniqueConstraint(fields=('heure', 'utilisateur', 'type_acces'), name='activite_acces_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='activiteacces',
+            constraint=models.UniqueConstraint(condition=models.Q(('utilisateur__isnull', True)), fields=('heure', 'type_acces'), name='activite_acces_anonyme_unique'),
+        ),
+        migrations.RunPython(calculer_activite, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def sceller_lignes_existantes(apps, schema_editor):
+    # Avant toute écriture chaînée : les lignes existantes prennent les premiers
+    # rangs, dans l'ordre où l'archivage les retirera
+    from api.services_integrite import sceller
+    ChaineAudit = apps.get_model('api', 'ChaineAudit')
+    for nom in ('Acces', 'AuditConformite'):
+        sceller(apps.get_model('api', nom), chaines=ChaineAudit)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0025_activite_acces'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaineAudit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True)),
+                ('rang', models.BigIntegerField(default=0)),
+                ('empreinte', models.CharField(blank=True, default='', max_length=64)),
+                ('rang_archive', models.BigIntegerField(default=0)),
+                ('empreinte_archive', models.CharField(blank=True, default='', max_length=64)),
+                ('rangs_archives', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': "Chaîne d'audit",
+                'verbose_name_plural': "Chaînes d'audit",
+            },
+        ),
+        migrations.AddField(
+            model_name='acces',
+            name='empreinte',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='acces',
+            name='rang',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditconformite',
+            name='empreinte',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditconformite',
+            name='rang',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='acces',
+            index=models.Index(fields=['rang'], name='api_acces_rang_57d81f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditconformite',
+            index=models.Index(fields=['rang'], name='api_auditco_rang_410850_idx'),
+        ),
+        migrations.AlterField(
+            model_name='acces',
+            name='regle',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='api.regleconformite'),
+        ),
+        migrations.AlterField(
+            model_name='acces',
+            name='utilisateur',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='auditconformite',
+            name='alerte_generee',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='api.alerteconformite'),
+        ),
+        migrations.AlterField(
+            model_name='auditconformite',
+            name='utilisateur',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(sceller_lignes_existantes, migrations.RunPython.noop),
+    ]
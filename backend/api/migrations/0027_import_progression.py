@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_chaine_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='date_progression',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
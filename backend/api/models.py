@@ -94,6 +94,8 @@ class Patient(models.Model):
     logement = models.ForeignKey(Logement, on_delete=models.SET_NULL, null=True)
     alimentation = models.ForeignKey(Alimentation, on_delete=models.SET_NULL, null=True)
     residence = models.ForeignKey(Residence, on_delete=models.SET_NULL, null=True)
+    empreinte_import = models.CharField(max_length=64, null=True, blank=True, help_text="Empreinte SHA-256 de la dernière ligne CSV importée")
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         ordering = ['idPatient']
@@ -105,12 +107,14 @@ class DossierMedical(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     dateCreation = models.DateField()
     commentaireGeneral = models.TextField()
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
 
 class Analyse(models.Model):
     idAnalyse = models.AutoField(primary_key=True)
     dossier = models.ForeignKey(DossierMedical, on_delete=models.CASCADE)
     typeAnalyse = models.CharField(max_length=250)
     dateAnalyse = models.DateField()
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
 
 class ResultatAnalyse(models.Model):
     idResultatAnalyse = models.AutoField(primary_key=True)
@@ -123,6 +127,7 @@ class ResultatAnalyse(models.Model):
     creatinine = models.FloatField()
     uree = models.FloatField()
     proteinurie = models.FloatField()
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
 
 # ===================== SYSTÈME D'ALERTES DE CONFORMITÉ =====================
 
@@ -347,7 +352,23 @@ class NotificationConformite(models.Model):
     def __str__(self):
         return f"Notification {self.type_notification} - {self.sujet}"
 
-class AuditConformite(models.Model):
+class EnregistrementChaine(models.Model):
+    """
+    Ligne d'audit chaînée : rang dans la chaîne de sa table et empreinte SHA-256
+    de son contenu et de l'empreinte du rang précédent (services_integrite).
+    Une ligne modifiée, supprimée ou ajoutée après coup rompt la chaîne. Les
+    lignes sont chaînées par lots à l'écriture (inserer_chaine) ; une ligne
+    écrite par save() reste non chaînée jusqu'au scellement (verifier_audit --sceller).
+    Les clés étrangères n'ont pas de contrainte en base : supprimer un
+    utilisateur, une règle ou une alerte ne modifie pas les lignes chaînées.
+    """
+    rang = models.BigIntegerField(null=True, blank=True, editable=False)
+    empreinte = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+class AuditConformite(EnregistrementChaine):
     """Audit trail pour la conformité"""
     TYPE_ACTION_CHOICES = [
         ('LECTURE', 'Lecture'),
@@ -364,7 +385,7 @@ class AuditConformite(models.Model):
     ]
     
     id = models.AutoField(primary_key=True)
-    utilisateur = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True, blank=True)
+    utilisateur = models.ForeignKey(Utilisateur, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
     session_id = models.CharField(max_length=100, blank=True, null=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True, null=True)
@@ -385,16 +406,18 @@ class AuditConformite(models.Model):
     conforme_hipaa = models.BooleanField(default=True)
     conforme_cdp = models.BooleanField(default=True)
     
-    alerte_generee = models.ForeignKey(AlerteConformite, on_delete=models.SET_NULL, null=True, blank=True)
+    alerte_generee = models.ForeignKey(AlerteConformite, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
     
     class Meta:
         verbose_name = "Audit de conformité"
         verbose_name_plural = "Audits de conformité"
         ordering = ['-date_action']
+        # Partitionnée par mois sur date_action sous PostgreSQL (services_partitions)
         indexes = [
             models.Index(fields=['utilisateur', 'date_action']),
             models.Index(fields=['type_action', 'date_action']),
             models.Index(fields=['objet', 'objet_id']),
+            models.Index(fields=['rang']),
         ]
     
     def __str__(self):
@@ -441,13 +464,64 @@ class RegleConformite(models.Model):
     niveauCritique = models.IntegerField()
     is_active = models.BooleanField(default=True)
 
-class Acces(models.Model): 
+class Acces(EnregistrementChaine):
     typeAcces = models.CharField(max_length=250)
-    dateAcces = models.DateTimeField(auto_now_add=True)
-    regle = models.ForeignKey(RegleConformite, on_delete=models.CASCADE, null=True, blank=True)
-    utilisateur = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True, blank=True)
+    # Date de l'accès lui-même : les accès sont enregistrés par lots, après coup
+    dateAcces = models.DateTimeField(default=timezone.now)
+    regle = models.ForeignKey(RegleConformite, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
+    utilisateur = models.ForeignKey(Utilisateur, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
     donnees_concernees = models.TextField(blank=True, null=True)
 
+    class Meta:
+        # Partitionnée par mois sur dateAcces sous PostgreSQL (services_partitions)
+        indexes = [
+            models.Index(fields=['dateAcces']),
+            models.Index(fields=['rang']),
+        ]
+
+class ActiviteAcces(models.Model):
+    """
+    Nombre d'accès par heure, utilisateur et type d'accès, tenu à jour à chaque
+    écriture dans Acces (services_activite) : les tableaux de bord lisent ces
+    compteurs au lieu de parcourir le journal, et ils survivent à son archivage
+    """
+    id = models.AutoField(primary_key=True)
+    heure = models.DateTimeField(help_text="Début de l'heure (UTC)")
+    # Compteurs conservés après la suppression de l'utilisateur (sans contrainte en base)
+    utilisateur = models.ForeignKey(Utilisateur, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True)
+    type_acces = models.CharField(max_length=250)
+    nombre = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Activité horaire des accès"
+        verbose_name_plural = "Activité horaire des accès"
+        constraints = [
+            # Cibles des incréments (INSERT ... ON CONFLICT), accès anonymes à part
+            models.UniqueConstraint(fields=['heure', 'utilisateur', 'type_acces'], name='activite_acces_unique'),
+            models.UniqueConstraint(
+                fields=['heure', 'type_acces'], condition=models.Q(utilisateur__isnull=True),
+                name='activite_acces_anonyme_unique'
+            ),
+        ]
+
+class ChaineAudit(models.Model):
+    """Dernier maillon de la chaîne d'empreintes d'une table d'audit, et début archivé"""
+    table = models.CharField(max_length=100, unique=True)
+    rang = models.BigIntegerField(default=0)
+    empreinte = models.CharField(max_length=64, blank=True, default='')
+    # Rangs 1 à rang_archive archivés, empreinte du dernier d'entre eux
+    rang_archive = models.BigIntegerField(default=0)
+    empreinte_archive = models.CharField(max_length=64, blank=True, default='')
+    # Lignes archivées de rang supérieur à la première ligne restante : {rang: empreinte}
+    rangs_archives = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        verbose_name = "Chaîne d'audit"
+        verbose_name_plural = "Chaînes d'audit"
+
+    def __str__(self):
+        return f"{self.table} - rang {self.rang}"
+
 class ParametreConformite(models.Model):
     idParametre = models.AutoField(primary_key=True)
     nom = models.CharField(max_length=250)
@@ -502,6 +576,124 @@ class DemandeExportation(models.Model):
                 pass
         super().save(*args, **kwargs)
 
+
+# ===================== IMPORTS CSV =====================
+
+class ImportJob(models.Model):
+    """Import CSV exécuté en arrière-plan, suivi par l'endpoint de progression"""
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    utilisateur = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True, blank=True, related_name='imports')
+    fichier = models.FileField(upload_to='imports/')
+    nom_fichier = models.CharField(max_length=255)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    encodage = models.CharField(max_length=50, blank=True, null=True)
+    mise_a_jour = models.BooleanField(default=False, help_text="Met à jour les patients existants dont la ligne a changé")
+
+    lignes_total = models.IntegerField(default=0)
+    lignes_traitees = models.IntegerField(default=0)
+    stats = models.JSONField(default=dict, help_text="Compteurs par table")
+    erreurs = models.JSONField(default=list)
+    message = models.TextField(blank=True, null=True)
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    # Mise à jour à chaque morceau validé : un import en cours sans progression récente est interrompu
+    date_progression = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Import CSV"
+        verbose_name_plural = "Imports CSV"
+        ordering = ['-date_creation']
+
+    def __str__(self):
+        return f"Import {self.nom_fichier} - {self.statut}"
+
+
+class RepriseImport(models.Model):
+    """Point de reprise d'un import CSV par morceaux, supprimé une fois l'import terminé"""
+    id = models.AutoField(primary_key=True)
+    empreinte_fichier = models.CharField(max_length=64, unique=True, help_text="SHA-256 du fichier importé")
+    taille_morceau = models.IntegerField()
+    morceaux_valides = models.IntegerField(default=0, help_text="Nombre de morceaux déjà validés en base")
+    lignes_validees = models.IntegerField(default=0)
+    stats = models.JSONField(default=dict, help_text="Statistiques cumulées au dernier morceau validé")
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Point de reprise d'import"
+        verbose_name_plural = "Points de reprise d'import"
+
+    def __str__(self):
+        return f"Reprise {self.empreinte_fichier[:12]} - {self.morceaux_valides} morceaux"
+
+
+class Suppression(models.Model):
+    """Trace d'une suppression (tombstone) reprise par l'export incrémental"""
+    id = models.AutoField(primary_key=True)
+    entite = models.CharField(max_length=50, help_text="patients, dossiers, analyses ou resultats")
+    objet_id = models.IntegerField()
+    date_suppression = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Suppression"
+        verbose_name_plural = "Suppressions"
+        ordering = ['date_suppression']
+
+    def __str__(self):
+        return f"{self.entite} #{self.objet_id} supprimé le {self.date_suppression}"
+
+
+class ExportJob(models.Model):
+    """Export de masse rendu en arrière-plan, téléchargeable une fois terminé"""
+    STATUT_CHOICES = ImportJob.STATUT_CHOICES
+    FORMAT_CHOICES = [
+        ('PDF', 'PDF'),
+        ('CSV', 'CSV'),
+    ]
+    TYPE_CHOICES = [
+        ('PATIENTS', 'Patients'),
+        ('HISTORIQUE', 'Historique des accès'),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    utilisateur = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True, blank=True, related_name='exports')
+    type_export = models.CharField(max_length=20, choices=TYPE_CHOICES, default='PATIENTS')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='PDF')
+    parametres = models.JSONField(default=dict, help_text="Paramètres de l'export (période de l'historique...)")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    fichier = models.FileField(upload_to='exports/', blank=True, null=True)
+    cout_estime = models.FloatField(default=0, help_text="Durée de rendu estimée en secondes")
+
+    lignes_total = models.IntegerField(default=0)
+    lignes_traitees = models.IntegerField(default=0)
+    message = models.TextField(blank=True, null=True)
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Export en arrière-plan"
+        verbose_name_plural = "Exports en arrière-plan"
+        ordering = ['-date_creation']
+        indexes = [
+            # File d'attente : exports en attente / en cours par ordre d'arrivée
+            models.Index(fields=['statut', 'date_creation']),
+        ]
+
+    def __str__(self):
+        return f"Export {self.format} #{self.id} - {self.statut}"
+
    
     #def __str__(self):
       #  return self.id_code
@@ -7,19 +7,49 @@ from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.utils import timezone
 from .validators import validate_password_strength, validate_username, validate_email, sanitize_input
+from .services_planification import position_file
 from django.core.mail import send_mail
 
 from .models import (
     Utilisateur, Patient, Profession, Logement, Residence, Comportement,
     DossierMedical, Rapport, Vaccin, Infection, RegleConformite,
     ParametreConformite, Alerte, Analyse, ResultatAnalyse, Alimentation, Acces,
-    DemandeExportation, TypeAlerteConformite, AlerteConformite, RegleAlerteConformite, NotificationConformite, AuditConformite
+    DemandeExportation, TypeAlerteConformite, AlerteConformite, RegleAlerteConformite, NotificationConformite, AuditConformite,
+    ImportJob, ExportJob
 )
 
 #classe serializer
 class ImportSerializer(serializers.Serializer):
     file = serializers.FileField()
 
+class ImportJobSerializer(serializers.ModelSerializer):
+    utilisateur_nom = serializers.CharField(source='utilisateur.username', read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'utilisateur', 'utilisateur_nom', 'nom_fichier', 'statut', 'encodage', 'mise_a_jour',
+            'lignes_total', 'lignes_traitees', 'stats', 'erreurs', 'message',
+            'date_creation', 'date_debut', 'date_progression', 'date_fin'
+        ]
+        read_only_fields = fields
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    utilisateur_nom = serializers.CharField(source='utilisateur.username', read_only=True)
+    position_file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'utilisateur', 'utilisateur_nom', 'type_export', 'format', 'statut', 'position_file',
+            'lignes_total', 'lignes_traitees', 'cout_estime', 'message',
+            'date_creation', 'date_debut', 'date_fin'
+        ]
+        read_only_fields = fields
+
+    def get_position_file(self, obj):
+        return position_file(obj)
+
 # Serializers d'authentification
 class UserSerializer(serializers.ModelSerializer):
     """Serializer pour les détails de l'utilisateur"""
@@ -200,6 +230,7 @@ class PatientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Patient
         fields = '__all__'
+        read_only_fields = ['empreinte_import']
 
 class ProfessionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.utils import timezone
 from .models import ParametreConformite, Alerte, DossierMedical, Utilisateur
 import logging
 from .models import RegleConformite, ParametreConformite, Alerte
+from .services_regles import index_regles
 
 logger = logging.getLogger(__name__)
 
@@ -183,17 +185,29 @@ class AuditTrailService:
     @staticmethod
     def enregistrer_acces(utilisateur, type_acces, donnees_concernees=None):
         """
-        Enregistre un accès aux données médicales
+        Enregistre un accès aux données médicales. Comme auparavant, les règles
+        d'alerte ne sont pas vérifiées pour ces accès (seul log_audit les vérifie).
+        Avec AUDIT_TAMPON (par défaut), l'accès est confié au journal d'audit
+        différé et écrit en base par lot : la fonction renvoie alors None, pas
+        l'Acces créé. Sans AUDIT_TAMPON, elle renvoie l'Acces écrit immédiatement.
         """
         try:
+            if getattr(settings, 'AUDIT_TAMPON', True):
+                from .services_journal import journal_audit
+                
+                journal_audit().enregistrer(utilisateur, type_acces, donnees_concernees, alertes=False)
+                logger.info(f"Accès enregistré: {utilisateur.username} - {type_acces}")
+                return None
+            
             from .models import Acces
+            from .services_journal import ecrire_acces
             
-            acces = Acces.objects.create(
+            acces, = ecrire_acces([Acces(
                 typeAcces=type_acces,
-                dateAcces=timezone.now().date(),
+                dateAcces=timezone.now(),
                 utilisateur=utilisateur,
                 donnees_concernees=donnees_concernees
-            )
+            )])
             
             logger.info(f"Accès enregistré: {utilisateur.username} - {type_acces}")
             return acces
@@ -366,32 +380,16 @@ def verifier_et_declencher_alerte(type_acces, utilisateur, donnees_concernees, e
     donnees_concernees: description ou objet concerné
     extra: dict, infos complémentaires (ex: nombre de tentatives)
     """
-    # from .models import RegleConformite, ParametreConformite, Alerte
-
-    # 1. Chercher la règle active correspondante
-    regle = RegleConformite.objects.filter(
-        nomRegle__iexact=type_acces,
-        is_active=True
-    ).first()
+    # 1. Règle active correspondante et son seuil (index en mémoire, sans requête)
+    regle = index_regles.regle(type_acces)
     if not regle:
         return None  # Pas de règle active pour cet événement
 
-    # 2. Chercher le seuil associé (si besoin)
-    param = ParametreConformite.objects.filter(regle=regle).first()
-    seuil_min = getattr(param, 'seuilMin', None)
-    seuil_max = getattr(param, 'seuilMax', None)
-
-    # 3. Vérifier le seuil (exemple pour nombre de tentatives)
-    declencher = True
-    if seuil_min is not None and extra and 'valeur' in extra:
-        if extra['valeur'] < seuil_min:
-            declencher = False
-    if seuil_max is not None and extra and 'valeur' in extra:
-        if extra['valeur'] > seuil_max:
-            declencher = True
+    # 2. Vérifier le seuil (exemple pour nombre de tentatives)
+    declencher = regle.declenche(extra)
 
     if declencher:
-        # 4. Déclencher l'alerte selon le type d'accès
+        # 3. Déclencher l'alerte selon le type d'accès
         return Alerte.objects.create(
             typeAlerte=type_acces,
             message=f"Alerte déclenchée pour {type_acces} par {utilisateur.username}",
@@ -400,6 +398,5 @@ def verifier_et_declencher_alerte(type_acces, utilisateur, donnees_concernees, e
             notifie_cdp=True,
             utilisateur=utilisateur,
             donnees_concernees=str(donnees_concernees),
-            norme_concernee="SECURITE"
         )
     return None
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Activité horaire des accès (table ActiviteAcces)
+Chaque écriture dans Acces incrémente, dans la même transaction, le compteur
+(heure, utilisateur, type d'accès) correspondant. Les tableaux de bord lisent
+totaux et histogramme dans ces compteurs en une requête, dont le coût dépend du
+nombre d'heures de la période et non du nombre d'accès journalisés.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from django.db import connection
+from django.db.models import Q, Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+from .models import ActiviteAcces
+
+# Compteurs écrits par requête (4 paramètres chacun)
+TAILLE_LOT_ACTIVITE = 200
+
+
+def debut_heure(date):
+    return date.replace(minute=0, second=0, microsecond=0)
+
+
+def incrementer_activite(acces):
+    """
+    Ajoute des accès (instances Acces) aux compteurs horaires par
+    INSERT ... ON CONFLICT DO UPDATE ; à appeler dans la transaction qui les insère
+    """
+    compteurs = Counter((debut_heure(a.dateAcces), a.utilisateur_id, a.typeAcces) for a in acces)
+    q = connection.ops.quote_name
+    table = q(ActiviteAcces._meta.db_table)
+    # Les accès anonymes ont leur propre contrainte d'unicité (NULL n'entre pas en conflit)
+    cibles = {
+        False: '(heure, utilisateur_id, type_acces)',
+        True: '(heure, type_acces) WHERE utilisateur_id IS NULL',
+    }
+    with connection.cursor() as cursor:
+        for anonyme, cible in cibles.items():
+            # Ordre fixe : deux lots concurrents verrouillent leurs compteurs dans le même ordre
+            lignes = [
+                (connection.ops.adapt_datetimefield_value(heure), utilisateur, type_acces, nombre)
+                for (heure, utilisateur, type_acces), nombre in sorted(
+                    compteurs.items(), key=lambda compteur: (compteur[0][0], compteur[0][1] or 0, compteur[0][2])
+                )
+                if (utilisateur is None) == anonyme
+            ]
+            for i in range(0, len(lignes), TAILLE_LOT_ACTIVITE):
+                lot = lignes[i:i + TAILLE_LOT_ACTIVITE]
+                cursor.execute(
+                    f"INSERT INTO {table} (heure, utilisateur_id, type_acces, nombre) "
+                    f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(lot))} "
+                    f"ON CONFLICT {cible} DO UPDATE SET nombre = {table}.nombre + excluded.nombre",
+                    [valeur for ligne in lot for valeur in ligne]
+                )
+
+
+def statistiques_activite(depuis):
+    """
+    Totaux et nombre d'accès par heure du jour depuis `depuis` (arrondi à
+    l'heure), lus dans les compteurs horaires en une requête
+    """
+    minuit = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    lignes = ActiviteAcces.objects.filter(heure__gte=debut_heure(depuis)).annotate(
+        heure_du_jour=ExtractHour('heure')
+    ).values('heure_du_jour').annotate(
+        total=Sum('nombre'),
+        aujourdhui=Sum('nombre', filter=Q(heure__gte=minuit, heure__lt=minuit + timedelta(days=1))),
+        connexions=Sum('nombre', filter=Q(type_acces='CONNEXION')),
+    ).order_by()
+
+    statistiques = {'total': 0, 'aujourdhui': 0, 'connexions': 0, 'par_heure': [0] * 24}
+    for ligne in lignes:
+        statistiques['par_heure'][ligne['heure_du_jour']] = ligne['total']
+        for cle in ('total', 'aujourdhui', 'connexions'):
+            statistiques[cle] += ligne[cle] or 0
+    return statistiques
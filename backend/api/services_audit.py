@@ -0,0 +1,111 @@
+"""
+Service des rapports d'audit des accès
+Les exports parcourent la table Acces par un curseur (.iterator()) avec
+l'utilisateur et la règle joints dans la même requête : la mémoire ne dépend
+pas du nombre de lignes et la réponse part dès le premier lot
+"""
+
+import csv
+import itertools
+import json
+import logging
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Acces
+from .services_export import TamponEcho
+from .services_pdf import GABARIT_RAPPORT_AUDIT, render_table, document_historique
+
+logger = logging.getLogger(__name__)
+
+# Lignes lues par aller-retour avec la base
+TAILLE_LOT_AUDIT = 2000
+
+CHAMPS_RAPPORT_AUDIT = ['id', 'dateAcces', 'utilisateur__username', 'typeAcces', 'donnees_concernees']
+
+# Même en-tête pour le CSV et le PDF
+ENTETE_RAPPORT_AUDIT = GABARIT_RAPPORT_AUDIT.entete
+
+ENTETE_HISTORIQUE = ['Date/Heure', 'Utilisateur', "Type d'Action", 'Ressource', 'Détails']
+
+
+# ===================== RAPPORT D'AUDIT =====================
+
+def acces_rapport_audit():
+    """(date, utilisateur, type, données) de chaque accès, lus par lots"""
+    return Acces.objects.values_list(
+        'dateAcces', 'utilisateur__username', 'typeAcces', 'donnees_concernees'
+    ).iterator(chunk_size=TAILLE_LOT_AUDIT)
+
+
+def par_lots(iterable, taille=TAILLE_LOT_AUDIT):
+    """Regroupe un itérable en listes de `taille` éléments"""
+    iterable = iter(iterable)
+    while lot := list(itertools.islice(iterable, taille)):
+        yield lot
+
+
+def flux_rapport_audit_json():
+    """Tableau JSON des accès produit lot par lot (même format que JsonResponse)"""
+    lignes = Acces.objects.values(*CHAMPS_RAPPORT_AUDIT).iterator(chunk_size=TAILLE_LOT_AUDIT)
+    yield '['
+    separateur = ''
+    for lot in par_lots(lignes):
+        yield separateur + ', '.join(json.dumps(ligne, cls=DjangoJSONEncoder) for ligne in lot)
+        separateur = ', '
+    yield ']'
+
+
+def flux_rapport_audit_csv():
+    """Lignes CSV du rapport d'audit (en-tête compris), lot par lot"""
+    writer = csv.writer(TamponEcho())
+    yield writer.writerow(ENTETE_RAPPORT_AUDIT)
+    for lot in par_lots(acces_rapport_audit()):
+        yield ''.join(
+            writer.writerow([date_acces, utilisateur or '', type_acces, donnees])
+            for date_acces, utilisateur, type_acces, donnees in lot
+        )
+
+
+def rendre_rapport_audit_pdf(destination):
+    """
+    PDF du rapport d'audit : un tableau par page construit à mesure que le
+    document avance, les accès étant lus par le même curseur
+    """
+    lignes = (
+        [str(date_acces), utilisateur or '', type_acces, donnees or '']
+        for date_acces, utilisateur, type_acces, donnees in acces_rapport_audit()
+    )
+    render_table(lignes, GABARIT_RAPPORT_AUDIT, destination)
+
+
+# ===================== HISTORIQUE ADMINISTRATEUR =====================
+
+def acces_historique(date_debut):
+    """(date, utilisateur, type, données, règle) des accès depuis date_debut, plus récents d'abord"""
+    return Acces.objects.filter(dateAcces__gte=date_debut).order_by('-dateAcces').values_list(
+        'dateAcces', 'utilisateur__username', 'typeAcces', 'donnees_concernees', 'regle__nomRegle'
+    ).iterator(chunk_size=TAILLE_LOT_AUDIT)
+
+
+def flux_historique_csv(date_debut):
+    """Lignes CSV de l'historique (en-tête compris), lot par lot"""
+    writer = csv.writer(TamponEcho())
+    yield writer.writerow(ENTETE_HISTORIQUE)
+    for lot in par_lots(acces_historique(date_debut)):
+        yield ''.join(
+            writer.writerow([
+                date_acces.strftime('%Y-%m-%d %H:%M:%S'),
+                utilisateur or 'N/A',
+                type_acces,
+                donnees or 'N/A',
+                regle or 'Action système',
+            ])
+            for date_acces, utilisateur, type_acces, donnees, regle in lot
+        )
+
+
+def rendre_historique_pdf(destination, date_debut, periode, genere_le):
+    """PDF de l'historique, sans limite sur le nombre d'accès"""
+    document_historique(destination, (
+        (date_acces, utilisateur, type_acces, donnees)
+        for date_acces, utilisateur, type_acces, donnees, _ in acces_historique(date_debut)
+    ), periode, genere_le)
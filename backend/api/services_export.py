@@ -0,0 +1,769 @@
+"""
+Service d'exportation des données patients
+Les patients sont lus par pages (pagination par clé sur idPatient) avec leurs
+relations préchargées : le nombre de requêtes est constant par page et la
+réponse est produite au fil de l'eau
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from calendar import timegm
+from datetime import timedelta
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .models import Patient, DossierMedical, Analyse, ResultatAnalyse, Infection, Vaccin, Alerte, Suppression
+from .services_pdf import GABARIT_PATIENTS, GABARIT_PATIENT, render_table, document_dossier, document_resultat
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dépendance optionnelle : seul l'export Parquet est indisponible
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Nombre de patients lus par page
+TAILLE_PAGE_EXPORT = 500
+
+# Même en-tête pour le CSV et le PDF
+ENTETE_PATIENTS = GABARIT_PATIENTS.entete
+
+CHAMPS_RESULTAT_EXPORT = ['glycemie', 'cholesterol', 'triglyceride', 'hdl', 'ldl', 'creatinine', 'uree', 'proteinurie']
+
+CHAMPS_DONNEES_MEDICALES = ['antecedents', 'allergies', 'traitements']
+
+class TamponEcho:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne écrite au lieu de la stocker"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def prefetch_dernier_dossier():
+    """
+    Précharge uniquement le dossier le plus récent de chaque patient (dans
+    patient.dossiers_recents), avec ses analyses et résultats, infections et vaccins
+    """
+    plus_recent = DossierMedical.objects.filter(
+        patient=OuterRef('patient')
+    ).order_by('-dateCreation', '-idDossier').values('idDossier')[:1]
+    dossiers = DossierMedical.objects.filter(
+        idDossier=Subquery(plus_recent)
+    ).prefetch_related(
+        Prefetch('analyse_set', queryset=Analyse.objects.select_related('resultatanalyse').order_by('idAnalyse')),
+        'infection_set',
+        'vaccin_set',
+    )
+    return Prefetch('dossiermedical_set', queryset=dossiers, to_attr='dossiers_recents')
+
+
+def patients_par_pages(queryset=None, taille_page=TAILLE_PAGE_EXPORT):
+    """
+    Parcourt les patients par pages de taille fixe, en reprenant après le dernier
+    idPatient lu plutôt qu'avec un OFFSET : 5 requêtes par page, quel que soit le
+    nombre de patients
+    """
+    if queryset is None:
+        queryset = Patient.objects.all()
+    queryset = queryset.order_by('idPatient').prefetch_related(prefetch_dernier_dossier())
+    dernier = None
+    while True:
+        page = queryset if dernier is None else queryset.filter(idPatient__gt=dernier)
+        patients = list(page[:taille_page])
+        if not patients:
+            return
+        yield patients
+        dernier = patients[-1].idPatient
+
+
+def dernier_dossier(patient):
+    """Dossier le plus récent d'un patient lu par patients_par_pages"""
+    dossiers = getattr(patient, 'dossiers_recents', None)
+    if dossiers is None:
+        return patient.dossiermedical_set.order_by('-dateCreation', '-idDossier').first()
+    return dossiers[0] if dossiers else None
+
+
+def ligne_patient(patient, omettre_vides=False):
+    """
+    Ligne d'export d'un patient (colonnes de ENTETE_PATIENTS) ; avec
+    omettre_vides, les résultats et données médicales vides sont ignorés (PDF)
+    """
+    dossier = dernier_dossier(patient)
+    analyses = []
+    resultats = []
+    infections = []
+    vaccins = []
+    if dossier:
+        for analyse in dossier.analyse_set.all():
+            analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse})")
+            if hasattr(analyse, 'resultatanalyse'):
+                ra = analyse.resultatanalyse
+                resultats.append('; '.join(
+                    f"{champ}: {getattr(ra, champ, '')}" for champ in CHAMPS_RESULTAT_EXPORT
+                    if hasattr(ra, champ) and not (omettre_vides and getattr(ra, champ) is None)
+                ))
+        for inf in dossier.infection_set.all():
+            infections.append(f"{inf.nomInfection} ({inf.typeInfection})")
+        for vac in dossier.vaccin_set.all():
+            vaccins.append(f"{vac.nomVaccin} ({vac.typeVaccination}, dose {vac.dose})")
+    donnees_medicales = [
+        f"{champ}: {getattr(patient, champ, '')}" for champ in CHAMPS_DONNEES_MEDICALES
+        if hasattr(patient, champ) and not (omettre_vides and not getattr(patient, champ))
+    ]
+    return [
+        getattr(patient, 'idPatient', ''),
+        dossier.commentaireGeneral if dossier else '',
+        dossier.dateCreation if dossier else '',
+        ' | '.join(analyses),
+        ' | '.join(resultats),
+        ' | '.join(infections),
+        ' | '.join(vaccins),
+        ' | '.join(donnees_medicales),
+    ]
+
+
+def lignes_patients_csv(queryset=None, taille_page=TAILLE_PAGE_EXPORT, rappel_progression=None):
+    """
+    Générateur des lignes CSV de l'export patients (en-tête compris), une page
+    de patients à la fois : la mémoire reste constante quelle que soit la base.
+    rappel_progression(nb_patients) est appelé après chaque page.
+    """
+    writer = csv.writer(TamponEcho())
+    yield writer.writerow(ENTETE_PATIENTS)
+    nb_patients = 0
+    for patients in patients_par_pages(queryset, taille_page):
+        yield ''.join(writer.writerow(ligne_patient(patient)) for patient in patients)
+        nb_patients += len(patients)
+        if rappel_progression:
+            rappel_progression(nb_patients)
+
+
+# ===================== EXPORT PDF =====================
+
+def rendre_patients_pdf(destination, queryset=None, rappel_progression=None, taille_page=TAILLE_PAGE_EXPORT):
+    """
+    Écrit le PDF de l'export patients dans `destination` (fichier ou réponse HTTP).
+    Les patients sont lus par pages au fil du rendu ; rappel_progression(nb_patients)
+    est appelé après chaque page. Renvoie le nombre de patients exportés.
+    """
+    nb_patients = 0
+
+    def lignes():
+        nonlocal nb_patients
+        for patients in patients_par_pages(queryset, taille_page):
+            for patient in patients:
+                yield ligne_patient(patient, omettre_vides=True)
+            nb_patients += len(patients)
+            if rappel_progression:
+                rappel_progression(nb_patients)
+
+    render_table(lignes(), GABARIT_PATIENTS, destination)
+    return nb_patients
+
+
+# ===================== EXPORTS EN ARRIÈRE-PLAN =====================
+
+_pool = None
+
+def _get_pool():
+    """
+    Pool de processus partagé (créé à la première utilisation) : le rendu
+    reportlab occupe un cœur sans bloquer les workers de l'API
+    """
+    global _pool
+    if _pool is None:
+        # spawn : la soumission a lieu dans un thread du serveur, fork n'y est pas sûr
+        _pool = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'EXPORT_PDF_PROCESSUS', 2),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        )
+    return _pool
+
+_priorite_abaissee = False
+
+def abaisser_priorite():
+    """
+    Passe le processus courant en priorité basse (une seule fois) : les rendus
+    du pool cèdent le processeur aux requêtes interactives
+    """
+    global _priorite_abaissee
+    if not _priorite_abaissee and hasattr(os, 'nice'):
+        os.nice(getattr(settings, 'EXPORT_PRIORITE', 10))
+        _priorite_abaissee = True
+
+def soumettre_tache(fonction, *args):
+    """Soumet une tâche au pool d'export"""
+    global _pool
+    try:
+        return _get_pool().submit(fonction, *args)
+    except BrokenProcessPool:
+        # Un processus est mort (mémoire, signal) : le pool est recréé
+        logger.warning("Pool d'export cassé, recréation")
+        _pool = None
+        return _get_pool().submit(fonction, *args)
+
+
+# ===================== DOCUMENTS UNITAIRES =====================
+
+def rendre_patient_pdf(patient):
+    """PDF d'un patient : dossier le plus récent et ses analyses avec résultats"""
+    dossier = patient.dossiermedical_set.order_by('-dateCreation', '-idDossier').first()
+    analyses = []
+    if dossier:
+        for analyse in dossier.analyse_set.select_related('resultatanalyse'):
+            try:
+                ra = analyse.resultatanalyse
+                # Toutes les valeurs, y compris celles à 0
+                resultats = [f"{champ}: {getattr(ra, champ)}" for champ in CHAMPS_RESULTAT_EXPORT if hasattr(ra, champ)]
+                if resultats:
+                    analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - {', '.join(resultats)}")
+                else:
+                    analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - Aucun résultat disponible")
+            except ResultatAnalyse.DoesNotExist:
+                analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - Aucun résultat disponible")
+
+    return render_table([[
+        dossier.commentaireGeneral if dossier else '',
+        ' | '.join(analyses) if analyses else 'Aucune analyse disponible'
+    ]], GABARIT_PATIENT, titre=f"Export du patient {patient.idPatient}")
+
+
+def rendre_patient_csv(patient):
+    """CSV d'un patient : identité, dossier le plus récent et ses analyses avec résultats"""
+    dossier = patient.dossiermedical_set.order_by('-dateCreation', '-idDossier').first()
+    analyses = []
+    if dossier:
+        for analyse in dossier.analyse_set.select_related('resultatanalyse'):
+            res = ''
+            if hasattr(analyse, 'resultatanalyse'):
+                ra = analyse.resultatanalyse
+                res = '; '.join([f"{champ}: {getattr(ra, champ, '')}" for champ in CHAMPS_RESULTAT_EXPORT if hasattr(ra, champ)])
+            analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - {res}")
+    writer = csv.writer(TamponEcho())
+    return (
+        writer.writerow(['ID Patient', 'Nom', 'Prénom', 'Date naissance', 'Dossier médical', 'Analyses'])
+        + writer.writerow([
+            getattr(patient, 'idPatient', ''),
+            getattr(patient, 'nom', ''),
+            getattr(patient, 'prenom', ''),
+            getattr(patient, 'dateNaissance', ''),
+            dossier.commentaireGeneral if dossier else '',
+            ' | '.join(analyses)
+        ])
+    ).encode('utf-8')
+
+
+def rendre_dossier_pdf(dossier):
+    """PDF d'un dossier médical : en-tête du dossier puis analyses et résultats"""
+    return document_dossier(instantane_dossier(dossier.pk, sections=('analyses',)))
+
+
+def rendre_resultat_pdf(resultat):
+    """PDF d'un résultat d'analyse"""
+    return document_resultat(resultat)
+
+
+# ===================== INSTANTANÉ D'UN DOSSIER =====================
+
+def noms_champs(modele):
+    """Colonnes exportées d'un modèle (clés étrangères sous leur nom _id)"""
+    return [champ.attname for champ in champs_export(modele)]
+
+
+def _extraire(ligne, prefixe):
+    """Retire de la ligne les valeurs d'une relation jointe (prefixe__champ) et les renvoie sans préfixe"""
+    return {cle[len(prefixe):]: ligne.pop(cle) for cle in [cle for cle in ligne if cle.startswith(prefixe)]}
+
+
+# Parties d'un dossier chargées par instantane_dossier, une requête chacune
+SECTIONS_DOSSIER = ('analyses', 'vaccins', 'infections', 'alertes')
+
+
+def instantane_dossier(dossier_id, sections=SECTIONS_DOSSIER):
+    """
+    Document complet d'un dossier en un nombre fixe de requêtes quel que soit
+    son contenu : dossier et patient (jointure), puis une requête par section
+    (analyses et résultats joints, vaccins, infections, alertes). Les valeurs
+    sont celles des colonnes, sans objet modèle ; l'export JSON et le PDF du
+    dossier sont rendus à partir de lui.
+    Lève DossierMedical.DoesNotExist si le dossier n'existe pas.
+    """
+    dossier = DossierMedical.objects.filter(pk=dossier_id).values(
+        *noms_champs(DossierMedical), *(f'patient__{nom}' for nom in noms_champs(Patient))
+    ).first()
+    if dossier is None:
+        raise DossierMedical.DoesNotExist(f"Dossier médical #{dossier_id} introuvable")
+    instantane = {'dossier': dossier, 'patient': _extraire(dossier, 'patient__')}
+
+    if 'analyses' in sections:
+        analyses = list(Analyse.objects.filter(dossier_id=dossier_id).order_by('idAnalyse').values(
+            *noms_champs(Analyse), *(f'resultatanalyse__{nom}' for nom in noms_champs(ResultatAnalyse))
+        ))
+        for analyse in analyses:
+            resultat = _extraire(analyse, 'resultatanalyse__')
+            analyse['resultat'] = resultat if resultat['idResultatAnalyse'] is not None else None
+        instantane['analyses'] = analyses
+    for section, modele in [('vaccins', Vaccin), ('infections', Infection), ('alertes', Alerte)]:
+        if section in sections:
+            instantane[section] = list(
+                modele.objects.filter(dossier_id=dossier_id).order_by('pk').values(*noms_champs(modele))
+            )
+    return instantane
+
+
+def reponse_instantane(request, instantane, nom_fichier):
+    """
+    Réponse JSON d'un instantané, validée par l'empreinte de son contenu :
+    304 si le client a déjà ce document (If-None-Match)
+    """
+    contenu = json.dumps(instantane, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = f'"{hashlib.sha256(contenu).hexdigest()[:32]}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(contenu, content_type='application/json')
+        response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+    response['ETag'] = etag
+    # Données médicales : jamais en cache partagé, revalidation à chaque ouverture
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# ===================== CACHE DES EXPORTS =====================
+
+# À incrémenter quand la mise en page d'un document change : les entrées
+# rendues avec l'ancienne version ne sont plus jamais servies
+VERSION_RENDU = 1
+
+
+def version_donnees(*valeurs):
+    """
+    Tampon de version (valeurs qui changent avec les données) et date de dernière
+    modification : la plus récente des dates présentes parmi les valeurs
+    """
+    dates = [valeur for valeur in valeurs if hasattr(valeur, 'utctimetuple')]
+    return '|'.join(str(valeur) for valeur in valeurs), max(dates) if dates else None
+
+
+def _version_analyses(analyses, *valeurs):
+    """Version d'un document construit sur un ensemble d'analyses et leurs résultats"""
+    agregats = analyses.aggregate(
+        nb_analyses=Count('idAnalyse'),
+        nb_resultats=Count('resultatanalyse'),
+        analyses_modifiees=Max('date_modification'),
+        resultats_modifies=Max('resultatanalyse__date_modification'),
+    )
+    return version_donnees(
+        *valeurs, agregats['nb_analyses'], agregats['nb_resultats'],
+        agregats['analyses_modifiees'], agregats['resultats_modifies']
+    )
+
+
+def version_patient(patient):
+    """Version de l'export d'un patient : dossier le plus récent et ses analyses"""
+    dossier = patient.dossiermedical_set.order_by('-dateCreation', '-idDossier').values(
+        'idDossier', 'date_modification'
+    ).first()
+    if dossier is None:
+        return version_donnees(patient.idPatient, 'sans dossier')
+    return _version_analyses(
+        Analyse.objects.filter(dossier_id=dossier['idDossier']),
+        patient.idPatient, dossier['idDossier'], dossier['date_modification']
+    )
+
+
+def version_dossier(dossier):
+    """Version de l'export d'un dossier : le dossier, ses analyses et résultats"""
+    return _version_analyses(
+        Analyse.objects.filter(dossier=dossier),
+        dossier.idDossier, dossier.patient_id, dossier.date_modification
+    )
+
+
+def version_resultat(resultat):
+    """Version de l'export d'un résultat d'analyse et de son analyse"""
+    return version_donnees(resultat.idResultatAnalyse, resultat.date_modification, resultat.analyse.date_modification)
+
+
+def cle_export(type_export, objet_id, version):
+    """Clé de contenu d'un document : (type, objet, version des données, version du rendu)"""
+    return hashlib.sha256(f"{type_export}:{objet_id}:{version}:{VERSION_RENDU}".encode()).hexdigest()
+
+
+class CacheExports:
+    """
+    Documents rendus stockés sur disque sous leur clé de contenu. La date
+    d'accès d'un fichier est rafraîchie à chaque lecture ; au-delà de la
+    taille maximale les moins récemment lus sont supprimés (LRU).
+    """
+
+    def __init__(self, repertoire=None, taille_max=None):
+        self.repertoire = repertoire or getattr(
+            settings, 'EXPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache_exports')
+        )
+        self.taille_max = taille_max if taille_max is not None else getattr(
+            settings, 'EXPORT_CACHE_TAILLE_MAX', 200 * 1024 * 1024
+        )
+
+    def chemin(self, cle):
+        return os.path.join(self.repertoire, cle)
+
+    def lire(self, cle):
+        """Contenu en cache ou None"""
+        chemin = self.chemin(cle)
+        try:
+            with open(chemin, 'rb') as fichier:
+                contenu = fichier.read()
+            os.utime(chemin)
+            return contenu
+        except FileNotFoundError:
+            return None
+
+    def ecrire(self, cle, contenu):
+        """Enregistre un document (écriture atomique) puis applique la taille maximale"""
+        os.makedirs(self.repertoire, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=self.repertoire, prefix='.tmp-')
+        try:
+            with os.fdopen(descripteur, 'wb') as fichier:
+                fichier.write(contenu)
+            os.replace(temporaire, self.chemin(cle))
+        except OSError:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            raise
+        self.purger()
+
+    def purger(self):
+        """Supprime les documents les moins récemment lus jusqu'à repasser sous la taille maximale"""
+        entrees = []
+        total = 0
+        with os.scandir(self.repertoire) as fichiers:
+            for entree in fichiers:
+                if entree.is_file() and not entree.name.startswith('.'):
+                    infos = entree.stat()
+                    entrees.append((infos.st_mtime, infos.st_size, entree.path))
+                    total += infos.st_size
+        for _, taille, chemin in sorted(entrees):
+            if total <= self.taille_max:
+                break
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+            total -= taille
+
+
+def document_en_cache(cle, rendre):
+    """Document en cache sous `cle`, rendu par `rendre()` et enregistré s'il est absent"""
+    cache_exports = CacheExports()
+    contenu = cache_exports.lire(cle)
+    if contenu is None:
+        contenu = rendre()
+        try:
+            cache_exports.ecrire(cle, contenu)
+        except OSError as e:
+            logger.warning(f"Cache des exports indisponible : {e}")
+    return contenu
+
+
+def reponse_export_cache(request, type_export, objet_id, version, rendre, nom_fichier, content_type='application/pdf'):
+    """
+    Réponse d'un document mis en cache : 304 si le client a déjà cette version
+    (If-None-Match / If-Modified-Since), sinon le document en cache, rendu par
+    `rendre()` seulement s'il est absent. `version` vient de version_*().
+    """
+    tampon, derniere_modification = version
+    cle = cle_export(type_export, objet_id, tampon)
+    etag = f'"{cle}"'
+    last_modified = timegm(derniere_modification.utctimetuple()) if derniere_modification else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(document_en_cache(cle, rendre), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Données médicales : jamais en cache partagé, revalidation à chaque ouverture
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# ===================== LOTS DE PATIENTS (ZIP) =====================
+
+FORMATS_LOT = ['pdf', 'csv']
+
+# Au-delà, l'export passe par une demande de masse (export-patients-pdf)
+MAX_PATIENTS_LOT = 1000
+
+
+class TamponZip:
+    """Pseudo-fichier non positionnable pour ZipFile : accumule les octets écrits jusqu'à vider()"""
+
+    def __init__(self):
+        self._morceaux = []
+
+    def write(self, octets):
+        self._morceaux.append(bytes(octets))
+        return len(octets)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        octets = b''.join(self._morceaux)
+        self._morceaux = []
+        return octets
+
+
+def document_patient(patient_id, format_lot):
+    """
+    Document d'un patient pour un lot, exécuté dans un processus du pool.
+    Le PDF passe par le cache des exports, comme export-patient-pdf.
+    """
+    abaisser_priorite()
+    patient = Patient.objects.get(pk=patient_id)
+    if format_lot == 'csv':
+        return rendre_patient_csv(patient)
+    tampon, _ = version_patient(patient)
+    return document_en_cache(cle_export('patient', patient_id, tampon), lambda: rendre_patient_pdf(patient))
+
+
+def documents_en_parallele(patient_ids, format_lot, fenetre=None):
+    """
+    (patient_id, contenu, erreur) de chaque patient dans l'ordre où les rendus
+    se terminent. Au plus `fenetre` rendus sont en attente à la fois : seuls
+    les documents terminés et pas encore consommés sont gardés en mémoire.
+    """
+    fenetre = fenetre or 2 * getattr(settings, 'EXPORT_PDF_PROCESSUS', 2)
+    patient_ids = iter(patient_ids)
+    en_cours = {}
+    try:
+        while True:
+            for patient_id in itertools.islice(patient_ids, fenetre - len(en_cours)):
+                en_cours[soumettre_tache(document_patient, patient_id, format_lot)] = patient_id
+            if not en_cours:
+                return
+            termines, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for future in termines:
+                patient_id = en_cours.pop(future)
+                try:
+                    yield patient_id, future.result(), None
+                except Exception as e:
+                    logger.error(f"Lot de patients : patient #{patient_id} en échec : {e}")
+                    yield patient_id, None, str(e)
+    finally:
+        # Client parti : les rendus pas encore commencés sont abandonnés
+        for future in en_cours:
+            future.cancel()
+
+
+def flux_lot_patients(patient_ids, format_lot='pdf'):
+    """
+    Archive ZIP des documents des patients, produite au fil des rendus : chaque
+    document est ajouté dès qu'il est prêt puis envoyé. Les patients en échec
+    sont listés dans erreurs.txt à la fin de l'archive.
+    """
+    tampon = TamponZip()
+    erreurs = []
+    # Les PDF sont déjà compressés
+    compression = zipfile.ZIP_STORED if format_lot == 'pdf' else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(tampon, 'w') as archive:
+        for patient_id, contenu, erreur in documents_en_parallele(patient_ids, format_lot):
+            if erreur is not None:
+                erreurs.append(f"Patient {patient_id} : {erreur}")
+                continue
+            archive.writestr(f"patient_{patient_id}.{format_lot}", contenu, compress_type=compression)
+            yield tampon.vider()
+        if erreurs:
+            archive.writestr('erreurs.txt', '\n'.join(erreurs) + '\n', compress_type=zipfile.ZIP_DEFLATED)
+    yield tampon.vider()
+
+
+# ===================== EXPORT COLONNAIRE (PARQUET) =====================
+
+# Un fichier Parquet par entité du jeu de données de recherche
+ENTITES_PARQUET = {
+    'patients': Patient,
+    'dossiers': DossierMedical,
+    'analyses': Analyse,
+    'resultats': ResultatAnalyse,
+    'infections': Infection,
+    'vaccins': Vaccin,
+}
+
+# Champs internes exclus des exports par entité
+CHAMPS_EXCLUS_EXPORT = {'empreinte_import'}
+
+COMPRESSIONS_PARQUET = ['zstd', 'snappy', 'none']
+
+# Lignes lues en base et écrites par groupe de lignes Parquet
+TAILLE_LOT_PARQUET = 10000
+
+
+def parquet_disponible():
+    return pa is not None
+
+
+def type_arrow(champ):
+    """Type Arrow d'un champ de modèle (clés étrangères : identifiant entier)"""
+    interne = champ.target_field.get_internal_type() if champ.is_relation else champ.get_internal_type()
+    if interne in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+                   'PositiveIntegerField', 'PositiveSmallIntegerField'):
+        return pa.int64()
+    if interne == 'FloatField':
+        return pa.float64()
+    if interne == 'BooleanField':
+        return pa.bool_()
+    if interne == 'DateField':
+        return pa.date32()
+    if interne == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    return pa.string()
+
+
+def champs_export(modele):
+    return [
+        champ for champ in modele._meta.concrete_fields
+        if champ.name not in CHAMPS_EXCLUS_EXPORT
+    ]
+
+
+def ecrire_parquet(modele, destination, compression='zstd', taille_lot=TAILLE_LOT_PARQUET):
+    """
+    Écrit toutes les lignes d'un modèle dans un fichier Parquet typé, par lots
+    lus en pagination par clé. Les colonnes portent le nom des champs
+    (attname pour les clés étrangères : patient_id, dossier_id...).
+    Renvoie le nombre de lignes écrites.
+    """
+    champs = champs_export(modele)
+    colonnes = [champ.attname for champ in champs]
+    schema = pa.schema([pa.field(champ.attname, type_arrow(champ)) for champ in champs])
+    pk = modele._meta.pk.attname
+    queryset = modele.objects.order_by(pk)
+
+    nb_lignes = 0
+    dernier = None
+    with pq.ParquetWriter(destination, schema, compression=None if compression == 'none' else compression) as writer:
+        while True:
+            lot = queryset if dernier is None else queryset.filter(**{f'{pk}__gt': dernier})
+            lignes = list(lot.values_list(*colonnes)[:taille_lot])
+            if not lignes:
+                break
+            writer.write_batch(pa.record_batch(
+                [pa.array(valeurs, type=type_champ) for valeurs, type_champ in zip(zip(*lignes), schema.types)],
+                schema=schema
+            ))
+            nb_lignes += len(lignes)
+            dernier = lignes[-1][colonnes.index(pk)]
+    return nb_lignes
+
+
+def exporter_jeu_recherche(destination, compression='zstd', taille_lot=TAILLE_LOT_PARQUET):
+    """
+    Archive ZIP (non recompressée) contenant un fichier <entité>.parquet par
+    entité de ENTITES_PARQUET. Renvoie {entité: nombre de lignes}.
+    """
+    compteurs = {}
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for nom, modele in ENTITES_PARQUET.items():
+            with tempfile.TemporaryFile() as fichier:
+                compteurs[nom] = ecrire_parquet(modele, fichier, compression, taille_lot)
+                fichier.seek(0)
+                with archive.open(f"{nom}.parquet", 'w', force_zip64=True) as membre:
+                    while bloc := fichier.read(1024 * 1024):
+                        membre.write(bloc)
+    return compteurs
+
+
+# ===================== EXPORT INCRÉMENTAL =====================
+
+# Entités de l'export incrémental (suivies par date_modification et Suppression)
+ENTITES_DELTA = {
+    'patients': Patient,
+    'dossiers': DossierMedical,
+    'analyses': Analyse,
+    'resultats': ResultatAnalyse,
+}
+
+# Recouvrement entre deux exports : une ligne écrite par une transaction longue
+# porte une date antérieure à sa validation, le watermark suivant recule donc
+# d'autant (les lignes reçues deux fois sont à fusionner côté consommateur)
+MARGE_WATERMARK = timedelta(minutes=5)
+
+
+def lots_modifies(modele, depuis, taille_lot=TAILLE_LOT_PARQUET):
+    """Lots de lignes (dictionnaires) d'un modèle créées ou modifiées après `depuis`, par pages de clé"""
+    colonnes = noms_champs(modele)
+    pk = modele._meta.pk.attname
+    queryset = modele.objects.order_by(pk)
+    if depuis is not None:
+        queryset = queryset.filter(date_modification__gt=depuis)
+    dernier = None
+    while True:
+        lot = queryset if dernier is None else queryset.filter(**{f'{pk}__gt': dernier})
+        lignes = list(lot.values(*colonnes)[:taille_lot])
+        if not lignes:
+            return
+        yield lignes
+        dernier = lignes[-1][pk]
+
+
+def lots_suppressions(depuis, taille_lot=TAILLE_LOT_PARQUET):
+    """Lots de suppressions (tombstones) survenues après `depuis`"""
+    suppressions = Suppression.objects.order_by('pk')
+    if depuis is not None:
+        suppressions = suppressions.filter(date_suppression__gt=depuis)
+    dernier = None
+    while True:
+        lot = suppressions if dernier is None else suppressions.filter(pk__gt=dernier)
+        lignes = list(lot.values_list('pk', 'entite', 'objet_id', 'date_suppression')[:taille_lot])
+        if not lignes:
+            return
+        yield [
+            {'entite': entite, 'id': objet_id, 'date_suppression': date_suppression}
+            for _, entite, objet_id, date_suppression in lignes
+        ]
+        dernier = lignes[-1][0]
+
+
+def flux_delta(depuis=None, taille_lot=TAILLE_LOT_PARQUET):
+    """
+    Document JSON produit au fil de l'eau : lignes créées ou modifiées après
+    `depuis` par entité, suppressions survenues depuis (tombstones) et
+    watermark à passer au prochain appel. Sans `depuis`, tout est exporté.
+    """
+    watermark = timezone.now() - MARGE_WATERMARK
+
+    def encoder(valeur):
+        return json.dumps(valeur, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    def tableau(nom, lots):
+        yield ', ' + encoder(nom) + ': ['
+        separateur = ''
+        for lot in lots:
+            yield separateur + ','.join(encoder(ligne) for ligne in lot)
+            separateur = ','
+        yield ']'
+
+    yield '{"depuis": ' + encoder(depuis) + ', "watermark": ' + encoder(watermark)
+    for nom, modele in ENTITES_DELTA.items():
+        yield from tableau(nom, lots_modifies(modele, depuis, taille_lot))
+    yield from tableau('suppressions', lots_suppressions(depuis, taille_lot))
+    yield '}'
@@ -0,0 +1,1256 @@
+"""
+Service d'importation CSV des données médicales (format base.csv)
+Pipeline en masse : préparation des lignes, résolution des dimensions en une
+seule passe, puis écriture de chaque table dans l'ordre des dépendances
+(bulk_create, ou COPY + fusion ensembliste sur PostgreSQL)
+"""
+
+import codecs
+import hashlib
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+import chardet
+import django
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    Patient, Profession, Logement, Residence, Comportement, Alimentation,
+    DossierMedical, Analyse, ResultatAnalyse, Alerte, Vaccin, Infection,
+    ImportJob, RepriseImport
+)
+
+logger = logging.getLogger(__name__)
+
+# Nombre de lignes envoyées par requête INSERT / SELECT ... IN
+TAILLE_LOT = 1000
+
+# Nombre de lignes CSV lues et écrites par morceau (lecture en flux)
+TAILLE_MORCEAU = 5000
+
+# Octets lus en début de fichier pour détecter l'encodage
+TAILLE_ECHANTILLON = 64 * 1024
+
+COLONNES_REQUISES = ['ID', 'Age', 'Sex', 'Place_birth', 'Edu_Level', ' weight', 'height']
+
+# Encodages essayés dans l'ordre (ISO-8859-1 en premier car c'est le plus courant pour les CSV)
+ENCODAGES = ['ISO-8859-1', 'latin-1', 'cp1252', 'windows-1252', 'utf-8']
+
+CHAMPS_RESULTAT = {
+    'cholesterol': 'Cholesterol',
+    'triglyceride': 'Triglyceride',
+    'hdl': 'HDL',
+    'ldl': 'LDL',
+    'creatinine': 'Creatinine',
+    'uree': 'Uree',
+    'proteinurie': 'Proteinurie',
+}
+
+
+def par_lots(valeurs, taille=TAILLE_LOT):
+    """Découpe une liste en lots de taille fixe"""
+    valeurs = list(valeurs)
+    for debut in range(0, len(valeurs), taille):
+        yield valeurs[debut:debut + taille]
+
+def charger_par_lots(queryset, champ, valeurs, *colonnes, taille_lot=TAILLE_LOT):
+    """Charge par lots les lignes dont `champ` est dans `valeurs` (première par pk)"""
+    resultat = {}
+    for lot in par_lots(valeurs, taille_lot):
+        lignes = queryset.filter(**{f'{champ}__in': lot}).order_by('pk').values_list(champ, *colonnes)
+        for ligne in lignes:
+            resultat.setdefault(ligne[0], ligne[1] if len(colonnes) == 1 else ligne[1:])
+    return resultat
+
+
+def completer_champs_obligatoires(modele, valeurs):
+    """Remplace par '' les textes manquants des colonnes NOT NULL du modèle"""
+    for champ in modele._meta.concrete_fields:
+        if champ.name in valeurs and valeurs[champ.name] is None and not champ.null \
+                and champ.get_internal_type() in ('CharField', 'TextField'):
+            valeurs[champ.name] = ''
+    return valeurs
+
+
+def nouvelles_stats():
+    """Dictionnaire de statistiques renvoyé par l'import"""
+    return {
+        'patients_created': 0,
+        'patients_skipped': 0,
+        'patients_updated': 0,
+        'dossiers_created': 0,
+        'analyses_created': 0,
+        'resultats_created': 0,
+        'alertes_created': 0,
+        'vaccins_created': 0,
+        'infections_created': 0,
+        'colonnes': {},
+        'errors': []
+    }
+
+
+# ===================== LECTURE DU FICHIER =====================
+
+def lire_echantillon(fichier, taille=TAILLE_ECHANTILLON):
+    """Lit les premiers octets du fichier puis revient au début"""
+    fichier.seek(0)
+    echantillon = fichier.read(taille)
+    fichier.seek(0)
+    return echantillon
+
+def detecter_encodage(fichier, taille_echantillon=TAILLE_ECHANTILLON):
+    """
+    Détecte l'encodage sur un échantillon borné du fichier (et non le fichier
+    entier). Lève ValueError si aucun encodage candidat ne convient.
+    """
+    echantillon = lire_echantillon(fichier, taille_echantillon)
+
+    encodages = list(ENCODAGES)
+    try:
+        detected = chardet.detect(echantillon)
+        logger.info(f"Chardet détecté: {detected}")
+        if detected['confidence'] > 0.7 and detected['encoding']:
+            if detected['encoding'] not in encodages:
+                encodages.insert(0, detected['encoding'])
+    except Exception as e:
+        logger.info(f"Erreur chardet: {e}")
+
+    for encodage in encodages:
+        try:
+            # Décodeur incrémental : l'échantillon peut couper un caractère multi-octets
+            texte = codecs.getincrementaldecoder(encodage)().decode(echantillon, final=False)
+            pd.read_csv(io.StringIO(texte), sep=';', nrows=0)
+            logger.info(f"✓ Encodage retenu: {encodage}")
+            return encodage
+        except Exception as e:
+            logger.info(f"✗ {encodage}: {str(e)[:50]}...")
+            continue
+
+    raise ValueError("Impossible de lire le fichier CSV. Vérifiez l'encodage du fichier.")
+
+def estimer_nombre_lignes(fichier, taille_echantillon=TAILLE_ECHANTILLON):
+    """Nombre de lignes de données estimé à partir de la taille moyenne d'une ligne de l'échantillon"""
+    echantillon = lire_echantillon(fichier, taille_echantillon)
+    taille = getattr(fichier, 'size', None) or len(echantillon)
+    nb_lignes = echantillon.count(b'\n')
+    if len(echantillon) >= taille or not nb_lignes:
+        return max(nb_lignes - 1, 0)
+    return int(taille * nb_lignes / len(echantillon)) - 1
+
+def empreinte_fichier(fichier, taille_bloc=1024 * 1024):
+    """SHA-256 du contenu du fichier, lu par blocs"""
+    fichier.seek(0)
+    empreinte = hashlib.sha256()
+    for bloc in iter(lambda: fichier.read(taille_bloc), b''):
+        empreinte.update(bloc)
+    fichier.seek(0)
+    return empreinte.hexdigest()
+
+def point_de_reprise(fichier, taille_morceau=TAILLE_MORCEAU):
+    """
+    RepriseImport du fichier (identifié par son empreinte). Un point créé
+    avec une autre taille de morceau n'est pas réutilisable : il repart de zéro.
+    """
+    reprise, _ = RepriseImport.objects.get_or_create(
+        empreinte_fichier=empreinte_fichier(fichier),
+        defaults={'taille_morceau': taille_morceau}
+    )
+    if reprise.taille_morceau != taille_morceau:
+        reprise.taille_morceau = taille_morceau
+        reprise.morceaux_valides = 0
+        reprise.lignes_validees = 0
+        reprise.stats = {}
+        reprise.save()
+    return reprise
+
+def lire_csv_par_morceaux(fichier, encodage, taille_morceau=TAILLE_MORCEAU):
+    """
+    Générateur de DataFrames de `taille_morceau` lignes lus directement sur le
+    fichier binaire : la mémoire reste constante quelle que soit sa taille.
+    Lève ValueError dès le premier morceau si des colonnes requises manquent.
+    """
+    fichier.seek(0)
+    texte = io.TextIOWrapper(fichier, encoding=encodage, newline='')
+    try:
+        lecteur = pd.read_csv(texte, sep=';', chunksize=taille_morceau)
+        for numero, df in enumerate(lecteur):
+            if numero == 0:
+                manquantes = colonnes_manquantes(df)
+                if manquantes:
+                    raise ValueError(f"Colonnes manquantes: {', '.join(manquantes)}")
+            yield df
+    finally:
+        # Ne pas fermer le fichier sous-jacent avec l'enveloppe texte
+        if not texte.closed:
+            texte.detach()
+
+def lire_entete(fichier, encodage):
+    """DataFrame vide portant les colonnes du fichier"""
+    fichier.seek(0)
+    texte = io.TextIOWrapper(fichier, encoding=encodage, newline='')
+    try:
+        return pd.read_csv(texte, sep=';', nrows=0)
+    finally:
+        texte.detach()
+        fichier.seek(0)
+
+def colonnes_manquantes(df):
+    """Colonnes requises absentes du fichier"""
+    return [col for col in COLONNES_REQUISES if col not in df.columns]
+
+
+# ===================== SCHÉMA DES COLONNES =====================
+
+# Valeurs textuelles considérées comme vraies (booléens) / masculines (sexe)
+VALEURS_VRAIES = ['true', '1', 'yes', 'oui', 'vrai']
+VALEURS_MASCULINES = ['m', 'male', '1', 'homme']
+
+# Colonne nettoyée -> type ; chaque colonne est convertie en une seule opération pandas
+SCHEMA_COLONNES = {
+    'ID': 'texte',
+    'Sex': 'sexe',
+    'Place_birth': 'texte',
+    'Edu_Level': 'texte',
+    'weight': 'reel',
+    'height': 'reel',
+    'Current_resid': 'texte',
+    'Job': 'texte',
+    'Job_type': 'texte',
+    'Working_Env': 'texte',
+    'Outdoor_Work_type': 'texte',
+    'Occup_if_jobless': 'texte',
+    'Incomes': 'texte',
+    'Freq_Incomes': 'texte',
+    'Housing_type': 'texte',
+    'Nr_people_house': 'entier',
+    'Wall_Covered': 'entier',
+    'House_Ground_Covered': 'entier',
+    'Toilet_Location': 'entier',
+    'Toilet_Location_interieure': 'booleen',
+    'Eating_Location': 'texte',
+    'Eating_Man': 'texte',
+    'Wash_Hand_When_Eating': 'texte',
+    'Soab_Wash_Hand': 'texte',
+    'Wash_Hand_Child': 'texte',
+    'Hand_Antisep_Use': 'texte',
+    'Eating_way': 'texte',
+    'Gluc_mM_L': 'reel',
+    **{colonne: 'reel' for colonne in CHAMPS_RESULTAT.values()},
+    'Diabetes': 'texte',
+    'AP_Sys_mmHg': 'reel',
+    'Vacc_Received': 'texte',
+    'Vacc_Program': 'texte',
+    'Last_Vac_year': 'entier',
+    'Cur_Infection1': 'texte',
+    'Cur_Infection1_type': 'texte',
+}
+
+# Colonnes nettoyées lues dans une autre colonne du fichier
+COLONNES_SOURCE = {
+    'Toilet_Location_interieure': 'Toilet_Location',
+}
+
+
+def convertir_texte(serie):
+    """Texte sans espaces en bordure ; vide et NaN deviennent NA"""
+    texte = serie.astype('string').str.strip()
+    return texte.mask(texte == '')
+
+def est_numerique(serie):
+    """Colonne déjà typée numériquement par pandas"""
+    return pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie)
+
+def valeurs_vides(serie):
+    """Masque des cellules absentes ou blanches"""
+    return serie.isna() if est_numerique(serie) else convertir_texte(serie).isna()
+
+def convertir_reel(serie):
+    """Équivalent vectorisé de float(valeur), NA si non convertible"""
+    if est_numerique(serie):
+        return serie.astype('float64')
+    texte = convertir_texte(serie)
+    return pd.to_numeric(texte.astype(object).where(texte.notna(), None), errors='coerce')
+
+def convertir_entier(serie):
+    """Équivalent vectorisé de int(float(valeur)) (troncature vers zéro)"""
+    return np.trunc(convertir_reel(serie)).astype('Int64')
+
+def convertir_booleen(serie):
+    """Nombre non nul, ou texte parmi VALEURS_VRAIES"""
+    if est_numerique(serie):
+        return (serie != 0).astype('boolean').mask(serie.isna())
+    texte = convertir_texte(serie)
+    return texte.str.lower().isin(VALEURS_VRAIES).astype('boolean').mask(texte.isna())
+
+def convertir_sexe(serie):
+    """True pour un homme, False pour une femme"""
+    texte = convertir_texte(serie)
+    return texte.str.lower().isin(VALEURS_MASCULINES).astype('boolean').mask(texte.isna())
+
+CONVERTISSEURS = {
+    'texte': convertir_texte,
+    'reel': convertir_reel,
+    'entier': convertir_entier,
+    'booleen': convertir_booleen,
+    'sexe': convertir_sexe,
+}
+
+
+def nettoyer_colonnes(df, schema=SCHEMA_COLONNES, masques=None):
+    """
+    Convertit les colonnes du schéma présentes dans `df`, colonne par colonne.
+    Retourne le DataFrame nettoyé (valeurs manquantes à None) et, pour chaque
+    colonne, le nombre de valeurs vides (`nuls`) et non convertibles (`invalides`).
+    Si `masques` est un dict, il reçoit pour chaque colonne le masque des
+    cellules non convertibles.
+    """
+    colonnes = {}
+    rapport = {}
+    for nom, type_colonne in schema.items():
+        source = COLONNES_SOURCE.get(nom, nom)
+        if source not in df.columns:
+            continue
+        serie = df[source]
+        propre = CONVERTISSEURS[type_colonne](serie)
+        vides = valeurs_vides(serie)
+        invalides = propre.isna() & ~vides
+        colonnes[nom] = propre
+        rapport[nom] = {'nuls': int(vides.sum()), 'invalides': int(invalides.sum())}
+        if masques is not None:
+            masques[nom] = invalides
+
+    propre = pd.DataFrame(colonnes, index=df.index)
+    return propre.astype(object).where(propre.notna(), None), rapport
+
+def cumuler_rapport(total, rapport):
+    """Ajoute le rapport d'un morceau au rapport cumulé de l'import"""
+    for nom, compteurs in rapport.items():
+        cumul = total.setdefault(nom, {'nuls': 0, 'invalides': 0})
+        cumul['nuls'] += compteurs['nuls']
+        cumul['invalides'] += compteurs['invalides']
+    return total
+
+
+# ===================== PRÉPARATION D'UNE LIGNE =====================
+
+def valeurs_profession(row):
+    """Clé naturelle et valeurs par défaut d'une profession"""
+    nom_profession = row.get('Job')
+    if not nom_profession:
+        return None
+    return nom_profession, {
+        'typeProfession': row.get('Job_type'),
+        'environnementTravail': row.get('Working_Env'),
+        'travailleDehors': row.get('Outdoor_Work_type'),
+        'travailleSansEmploi': row.get('Occup_if_jobless'),
+        'situationSansEmploi': row.get('Occup_if_jobless'),
+        'revenu': row.get('Incomes'),
+        'freqRevenu': row.get('Freq_Incomes')
+    }
+
+def valeurs_residence(row):
+    """Clé naturelle et valeurs par défaut d'une résidence"""
+    pays = row.get('Place_birth')
+    if not pays:
+        return None
+    residence_actuelle = row.get('Current_resid')
+    return pays, {
+        'ville': residence_actuelle,
+        'quartier': residence_actuelle,
+        'adresseComplete': f"{residence_actuelle}, {pays}"
+    }
+
+def valeurs_logement(row):
+    """Clé naturelle et valeurs par défaut d'un logement"""
+    type_logement = row.get('Housing_type')
+    if not type_logement:
+        return None
+    return type_logement, {
+        'nombrePersonnesFoyer': row.get('Nr_people_house') or 1,
+        'nbMursMaisonCouverts': row.get('Wall_Covered') or 0,
+        'nbSolsMaisonCouverts': row.get('House_Ground_Covered') or 0,
+        'nbToilettesMaison': row.get('Toilet_Location') or 0,
+        'toilettesInterieures': row.get('Toilet_Location_interieure') or False
+    }
+
+def valeurs_comportement(row):
+    """Clé naturelle et valeurs par défaut d'un comportement"""
+    lieu_repas = row.get('Eating_Location')
+    if not lieu_repas:
+        return None
+    return lieu_repas, {
+        'mangeAvecLesMains': row.get('Eating_Man'),
+        'laveLesMainsAvantDeManger': row.get('Wash_Hand_When_Eating'),
+        'utiliseDuSavon': row.get('Soab_Wash_Hand'),
+        'laveLesMainsDesEnfants': row.get('Wash_Hand_Child'),
+        'utiliseGelHydroalcoolique': row.get('Hand_Antisep_Use')
+    }
+
+def valeurs_alimentation(row):
+    """Clé naturelle d'une alimentation"""
+    type_repas = row.get('Eating_way')
+    if not type_repas:
+        return None
+    return type_repas, {}
+
+def valeurs_patient(row):
+    """Champs du patient (hors clés étrangères)"""
+    return {
+        'sexe': row.get('Sex'),
+        # Colonne absente du fichier : 0.0 (comportement historique de l'import)
+        'poids': row.get('weight', 0.0),
+        'taille': row.get('height', 0.0),
+        'lieuNaissance': row.get('Place_birth'),
+        'niveauEtude': row.get('Edu_Level'),
+    }
+
+def valeurs_resultat(row):
+    """Champs du résultat d'analyse, None si aucune glycémie"""
+    glycemie = row.get('Gluc_mM_L')
+    if glycemie is None:
+        return None
+    valeurs = {'glycemie': glycemie}
+    for champ, colonne in CHAMPS_RESULTAT.items():
+        valeurs[champ] = row.get(colonne) or 0
+    return valeurs
+
+def valeurs_alertes(row):
+    """Liste des (typeAlerte, message) à créer pour la ligne"""
+    alertes = []
+    if row.get('Diabetes'):
+        alertes.append(('Diabète', 'Patient diagnostiqué avec diabète'))
+    ap_sys = row.get('AP_Sys_mmHg')
+    if ap_sys and ap_sys > 140:
+        alertes.append(('Hypertension', f'Pression artérielle élevée: {ap_sys} mmHg'))
+    return alertes
+
+def valeurs_vaccin(row):
+    """Nom et valeurs par défaut du vaccin reçu"""
+    vaccin_recu = row.get('Vacc_Received')
+    if not vaccin_recu:
+        return None
+    return vaccin_recu, {
+        'typeVaccination': row.get('Vacc_Program'),
+        'dose': row.get('Last_Vac_year') or 1
+    }
+
+def valeurs_infection(row):
+    """Nom et valeurs par défaut de l'infection actuelle"""
+    infection_actuelle = row.get('Cur_Infection1')
+    if not infection_actuelle:
+        return None
+    return infection_actuelle, {
+        'typeInfection': row.get('Cur_Infection1_type')
+    }
+
+def empreinte_ligne(ligne):
+    """SHA-256 des valeurs nettoyées d'une ligne (indépendant de la mise en forme du fichier)"""
+    contenu = json.dumps(ligne, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+def preparer_ligne(row):
+    """
+    Extrait d'une ligne nettoyée (voir nettoyer_colonnes) toutes les valeurs à
+    insérer, sans accès base.
+    Retourne None si la ligne n'a pas d'identifiant patient.
+    """
+    id_code = row.get('ID')
+    if not id_code:
+        return None
+    ligne = {
+        'id_code': id_code,
+        'profession': valeurs_profession(row),
+        'residence': valeurs_residence(row),
+        'logement': valeurs_logement(row),
+        'comportement': valeurs_comportement(row),
+        'alimentation': valeurs_alimentation(row),
+        'patient': valeurs_patient(row),
+        'resultat': valeurs_resultat(row),
+        'alertes': valeurs_alertes(row),
+        'vaccin': valeurs_vaccin(row),
+        'infection': valeurs_infection(row),
+    }
+    ligne['empreinte'] = empreinte_ligne(ligne)
+    return ligne
+
+def preparer_morceau(df, nb_exemples=0):
+    """
+    Nettoie puis prépare toutes les lignes d'un DataFrame, sans accès base
+    (exécutable dans un autre processus). L'index du DataFrame donne le
+    numéro des lignes dans le fichier.
+    Retourne (lignes, rapport des colonnes, erreurs, nombre de lignes sans ID,
+    jusqu'à `nb_exemples` lignes contenant des valeurs non convertibles).
+    """
+    masques = {} if nb_exemples else None
+    propre, rapport = nettoyer_colonnes(df, masques=masques)
+    lignes = []
+    erreurs = []
+    sans_id = 0
+    for index, row in zip(df.index, propre.to_dict('records')):
+        try:
+            ligne = preparer_ligne(row)
+        except Exception as e:
+            erreurs.append(f"Ligne {index + 1}: {str(e)}")
+            continue
+        if ligne is None:
+            sans_id += 1
+            continue
+        lignes.append(ligne)
+    return lignes, rapport, erreurs, sans_id, exemples_invalides(df, masques, nb_exemples)
+
+def exemples_invalides(df, masques, nb_exemples):
+    """Premières lignes ayant au moins une valeur non convertible, avec les valeurs brutes fautives"""
+    if not masques:
+        return []
+    masques = pd.DataFrame(masques, index=df.index)
+    exemples = []
+    for index, ligne in masques[masques.any(axis=1)].head(nb_exemples).iterrows():
+        exemples.append({
+            'ligne': int(index) + 1,
+            'id': None if 'ID' not in df.columns or pd.isna(df.at[index, 'ID']) else str(df.at[index, 'ID']),
+            'valeurs': {
+                nom: str(df.at[index, COLONNES_SOURCE.get(nom, nom)])
+                for nom in ligne.index[ligne.to_numpy(dtype=bool)]
+            },
+        })
+    return exemples
+
+def numeroter(df, decalage):
+    """Réindexe le morceau par numéro de ligne dans le fichier (à partir de 0)"""
+    return df.set_axis(range(decalage, decalage + len(df)))
+
+def repartir_par_patient(df, nb_parts):
+    """
+    Découpe un morceau en `nb_parts` sous-ensembles selon le hachage de l'ID :
+    toutes les lignes d'un même patient restent dans la même part, dans
+    l'ordre du fichier.
+    """
+    if nb_parts <= 1 or 'ID' not in df.columns:
+        return [df]
+    parts = pd.util.hash_pandas_object(df['ID'].astype('string').str.strip(), index=False) % nb_parts
+    return [part for _, part in df.groupby(parts.to_numpy(), sort=True)]
+
+
+def fusionner_preparations(parts):
+    """Regroupe les préparations des parts d'un même morceau (parts dans l'ordre donné)"""
+    lignes, rapport, erreurs, sans_id, exemples = [], {}, [], 0, []
+    for lignes_part, rapport_part, erreurs_part, sans_id_part, exemples_part in parts:
+        lignes.extend(lignes_part)
+        cumuler_rapport(rapport, rapport_part)
+        erreurs.extend(erreurs_part)
+        sans_id += sans_id_part
+        exemples.extend(exemples_part)
+    return lignes, rapport, erreurs, sans_id, exemples
+
+def preparations(morceaux, processus=1, nb_exemples=0, debut=0):
+    """
+    (nombre de lignes, préparation) de chaque morceau, dans l'ordre du
+    fichier ; `debut` est le numéro de la première ligne du premier morceau.
+    Avec `processus` > 1, chaque morceau est réparti par patient sur un pool
+    de processus ; au plus deux morceaux sont en attente pour borner la
+    mémoire tout en occupant les processus pendant l'écriture.
+    """
+    decalage = debut
+    if processus <= 1:
+        for df in morceaux:
+            yield len(df), preparer_morceau(numeroter(df, decalage), nb_exemples)
+            decalage += len(df)
+        return
+
+    # spawn : l'import peut tourner dans un thread du serveur, fork n'y est pas sûr
+    pool = ProcessPoolExecutor(
+        max_workers=processus,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup
+    )
+    try:
+        en_attente = deque()
+        for df in morceaux:
+            parts = repartir_par_patient(numeroter(df, decalage), processus)
+            en_attente.append((len(df), [pool.submit(preparer_morceau, part, nb_exemples) for part in parts]))
+            decalage += len(df)
+            while len(en_attente) > 2:
+                nb_lignes, futures = en_attente.popleft()
+                yield nb_lignes, fusionner_preparations(future.result() for future in futures)
+        while en_attente:
+            nb_lignes, futures = en_attente.popleft()
+            yield nb_lignes, fusionner_preparations(future.result() for future in futures)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ===================== IMPORT EN MASSE =====================
+
+# Champs du patient réécrits par un import en mode mise à jour
+CHAMPS_PATIENT = [
+    'sexe', 'poids', 'taille', 'lieuNaissance', 'niveauEtude',
+    'profession', 'comportement', 'logement', 'alimentation', 'residence',
+    'empreinte_import',
+]
+
+# Dimension -> (modèle, champ de clé naturelle)
+DIMENSIONS = {
+    'profession': (Profession, 'nomProfession'),
+    'residence': (Residence, 'pays'),
+    'logement': (Logement, 'typeLogement'),
+    'comportement': (Comportement, 'lieuRepas'),
+    'alimentation': (Alimentation, 'typeRepas'),
+}
+
+
+class ResolveurDimensions:
+    """
+    Cache mémoire des tables de dimensions, indexé par clé naturelle.
+    Chaque table est préchargée une fois (une requête), puis seules les valeurs
+    absentes sont créées, par lots : le nombre de requêtes dépend du nombre de
+    valeurs distinctes et non du nombre de lignes importées.
+    """
+
+    def __init__(self, taille_lot=TAILLE_LOT):
+        self.taille_lot = taille_lot
+        self.cache = {}
+
+    def precharger(self, nom):
+        """Charge {clé naturelle: pk} de toute la table (première ligne par pk)"""
+        if nom not in self.cache:
+            modele, champ_cle = DIMENSIONS[nom]
+            objets = {}
+            for cle, pk in modele.objects.order_by('pk').values_list(champ_cle, 'pk').iterator():
+                objets.setdefault(cle, pk)
+            self.cache[nom] = objets
+        return self.cache[nom]
+
+    def get(self, nom, valeurs):
+        """pk d'une dimension à partir du couple (clé, defaults) d'une ligne"""
+        if valeurs is None:
+            return None
+        return self.precharger(nom).get(valeurs[0])
+
+    def resoudre(self, lignes):
+        """Crée en masse les valeurs de dimensions absentes du cache"""
+        for nom, (modele, champ_cle) in DIMENSIONS.items():
+            objets = self.precharger(nom)
+            manquantes = {}
+            for ligne in lignes:
+                if ligne[nom] is not None and ligne[nom][0] not in objets:
+                    cle, defaults = ligne[nom]
+                    manquantes.setdefault(cle, defaults)
+            if not manquantes:
+                continue
+            modele.objects.bulk_create([
+                modele(**completer_champs_obligatoires(modele, {champ_cle: cle, **defaults}))
+                for cle, defaults in manquantes.items()
+            ], batch_size=self.taille_lot)
+            for lot in par_lots(manquantes, self.taille_lot):
+                for cle, pk in modele.objects.filter(**{f'{champ_cle}__in': lot}).order_by('pk').values_list(champ_cle, 'pk'):
+                    objets.setdefault(cle, pk)
+            logger.info(f"Dimension {nom} : {len(manquantes)} valeurs créées")
+
+    def invalider(self):
+        """Vide le cache (après un rollback, les pk créés ne sont plus valides)"""
+        self.cache = {}
+
+
+# ===================== CHARGEURS =====================
+
+class ChargeurORM:
+    """Écriture par bulk_create / bulk_update (toutes bases, dont SQLite)"""
+
+    def __init__(self, taille_lot=TAILLE_LOT):
+        self.taille_lot = taille_lot
+
+    def inserer(self, modele, objets, cle=None):
+        """
+        Insère les objets ; si `cle` (attname) est donnée, retourne
+        {valeur de la clé: pk} des lignes insérées.
+        """
+        modele.objects.bulk_create(objets, batch_size=self.taille_lot)
+        if cle is None:
+            return {}
+        return charger_par_lots(modele.objects, cle, [getattr(objet, cle) for objet in objets], 'pk', taille_lot=self.taille_lot)
+
+    def mettre_a_jour(self, modele, objets, champs):
+        """Réécrit les `champs` des objets (pk renseigné)"""
+        if objets and champs:
+            champs = champs_horodates(modele, champs)
+            # bulk_update n'appelle pas pre_save : les dates auto_now sont posées ici
+            for champ in modele._meta.concrete_fields:
+                if getattr(champ, 'auto_now', False):
+                    for objet in objets:
+                        champ.pre_save(objet, False)
+            modele.objects.bulk_update(objets, champs, batch_size=self.taille_lot)
+
+
+class ChargeurCopyPostgres(ChargeurORM):
+    """
+    Chemin rapide PostgreSQL pour les tables volumineuses : les lignes sont
+    envoyées par COPY FROM STDIN dans une table temporaire, puis fusionnées
+    dans la table cible en une requête (INSERT ... SELECT / UPDATE ... FROM).
+    Les autres modèles passent par l'ORM.
+    """
+
+    # Modèle -> champ de fusion (une seule ligne cible par valeur)
+    CLES_FUSION = {
+        Patient: 'id_code',
+        DossierMedical: 'patient',
+        Analyse: 'dossier',
+        ResultatAnalyse: 'analyse',
+    }
+
+    def inserer(self, modele, objets, cle=None):
+        if modele not in self.CLES_FUSION or not objets:
+            return super().inserer(modele, objets, cle)
+
+        champs = [champ for champ in modele._meta.concrete_fields if not champ.primary_key]
+        table = connection.ops.quote_name(modele._meta.db_table)
+        colonnes = ', '.join(connection.ops.quote_name(champ.column) for champ in champs)
+        fusion = connection.ops.quote_name(modele._meta.get_field(self.CLES_FUSION[modele]).column)
+        retour = connection.ops.quote_name(modele._meta.get_field(cle).column) if cle else fusion
+        pk = connection.ops.quote_name(modele._meta.pk.column)
+
+        with connection.cursor() as cursor:
+            temporaire = self._copier(cursor, modele, champs, objets, add=True)
+            cursor.execute(
+                f"INSERT INTO {table} ({colonnes}) "
+                f"SELECT {colonnes} FROM {temporaire} s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{fusion} = s.{fusion}) "
+                f"RETURNING {retour}, {pk}"
+            )
+            resultat = dict(cursor.fetchall())
+            cursor.execute(f"DROP TABLE {temporaire}")
+        return resultat if cle else {}
+
+    def mettre_a_jour(self, modele, objets, champs):
+        if modele not in self.CLES_FUSION or not objets or not champs:
+            return super().mettre_a_jour(modele, objets, champs)
+
+        champs = [modele._meta.pk] + [modele._meta.get_field(nom) for nom in champs_horodates(modele, champs)]
+        table = connection.ops.quote_name(modele._meta.db_table)
+        pk = connection.ops.quote_name(modele._meta.pk.column)
+        affectations = ', '.join(
+            f"{connection.ops.quote_name(champ.column)} = s.{connection.ops.quote_name(champ.column)}"
+            for champ in champs[1:]
+        )
+
+        with connection.cursor() as cursor:
+            temporaire = self._copier(cursor, modele, champs, objets, add=False)
+            cursor.execute(f"UPDATE {table} t SET {affectations} FROM {temporaire} s WHERE t.{pk} = s.{pk}")
+            cursor.execute(f"DROP TABLE {temporaire}")
+
+    def _copier(self, cursor, modele, champs, objets, add):
+        """Crée une table temporaire aux colonnes `champs` et la remplit par COPY"""
+        temporaire = connection.ops.quote_name(f"import_{modele._meta.db_table}")
+        colonnes = ', '.join(connection.ops.quote_name(champ.column) for champ in champs)
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {temporaire} ON COMMIT DROP AS "
+            f"SELECT {colonnes} FROM {connection.ops.quote_name(modele._meta.db_table)} WITH NO DATA"
+        )
+        # Connexion réelle résolue une fois (le proxy `connection` coûte à chaque valeur)
+        base = cursor.db
+        donnees = io.StringIO()
+        for objet in objets:
+            donnees.write('\t'.join([
+                valeur_copy(champ.get_db_prep_save(champ.pre_save(objet, add), base))
+                for champ in champs
+            ]))
+            donnees.write('\n')
+        donnees.seek(0)
+        cursor.copy_expert(f"COPY {temporaire} ({colonnes}) FROM STDIN", donnees)
+        return temporaire
+
+
+def champs_horodates(modele, champs):
+    """Champs mis à jour complétés des dates auto_now du modèle (date_modification)"""
+    return list(champs) + [
+        champ.name for champ in modele._meta.concrete_fields
+        if getattr(champ, 'auto_now', False) and champ.name not in champs
+    ]
+
+def valeur_copy(valeur):
+    """Valeur au format texte de COPY (NULL = \\N, caractères spéciaux échappés)"""
+    if valeur is None:
+        return '\\N'
+    if isinstance(valeur, bool):
+        return 't' if valeur else 'f'
+    return (str(valeur).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def choisir_chargeur(taille_lot=TAILLE_LOT):
+    """COPY sur PostgreSQL (désactivable par IMPORT_CSV_COPY), ORM sinon"""
+    if connection.vendor == 'postgresql' and getattr(settings, 'IMPORT_CSV_COPY', True):
+        return ChargeurCopyPostgres(taille_lot)
+    return ChargeurORM(taille_lot)
+
+
+class ImportateurCSV:
+    """
+    Importe un DataFrame au format base.csv en masse.
+    Chaque table est écrite par lots de `taille_lot` lignes, dans l'ordre des
+    dépendances, à l'intérieur d'une seule transaction : le nombre de requêtes
+    dépend du nombre de lots et non plus du nombre de lignes.
+
+    Avec `mise_a_jour=True`, les patients existants dont l'empreinte de ligne a
+    changé sont mis à jour (ainsi que leurs résultats, alertes, vaccins et
+    infections) ; les lignes inchangées ne sont pas réécrites.
+
+    Avec `processus` > 1, la préparation des lignes (nettoyage, conversion)
+    est répartie par patient sur un pool de processus ; l'écriture reste
+    faite par ce seul objet, dans l'ordre du fichier.
+    """
+
+    def __init__(self, taille_lot=TAILLE_LOT, resolveur=None, rappel_progression=None, mise_a_jour=False,
+                 chargeur=None, processus=None):
+        self.taille_lot = taille_lot
+        self.processus = processus or getattr(settings, 'IMPORT_CSV_PROCESSUS', 1)
+        self.chargeur = chargeur or choisir_chargeur(taille_lot)
+        self.mise_a_jour = mise_a_jour
+        self.resolveur = resolveur or ResolveurDimensions(taille_lot)
+        self.rappel_progression = rappel_progression
+        self.stats = nouvelles_stats()
+        self.aujourdhui = timezone.now().date()
+
+    def importer(self, df):
+        """Importe toutes les lignes du DataFrame et retourne les statistiques"""
+        return self.importer_morceaux(
+            df.iloc[debut:debut + TAILLE_MORCEAU] for debut in range(0, len(df), TAILLE_MORCEAU)
+        )
+
+    def importer_morceaux(self, morceaux, reprise=None):
+        """
+        Importe une suite de DataFrames (lecture en flux) ; seul le morceau
+        courant est gardé en mémoire.
+        Sans `reprise`, tout l'import tient dans une seule transaction. Avec un
+        RepriseImport, chaque morceau est validé dans sa propre transaction
+        avec le point de reprise : après une interruption, les morceaux déjà
+        validés sont sautés et les statistiques reprennent où elles étaient.
+        """
+        self.lignes_lues = 0
+        if reprise is not None and reprise.morceaux_valides:
+            self.stats.update(reprise.stats)
+            self.lignes_lues = reprise.lignes_validees
+            morceaux = itertools.islice(morceaux, reprise.morceaux_valides, None)
+            logger.info(f"Reprise de l'import au morceau {reprise.morceaux_valides} (ligne {reprise.lignes_validees})")
+
+        try:
+            if reprise is None:
+                with transaction.atomic():
+                    for nb_lignes, preparation in preparations(morceaux, self.processus, debut=self.lignes_lues):
+                        self._importer_morceau(nb_lignes, preparation)
+            else:
+                for nb_lignes, preparation in preparations(morceaux, self.processus, debut=self.lignes_lues):
+                    with transaction.atomic():
+                        self._importer_morceau(nb_lignes, preparation)
+                        self._valider_morceau(reprise)
+                reprise.delete()
+        except Exception:
+            self.resolveur.invalider()
+            raise
+
+        logger.info(f"Import CSV terminé : {self.lignes_lues} lignes lues, {self.stats['patients_created']} patients créés")
+        return self.stats
+
+    def _importer_morceau(self, nb_lignes, preparation):
+        """Écrit un morceau préparé et publie la progression"""
+        self._ecrire(self._integrer(preparation))
+        self.lignes_lues += nb_lignes
+        if self.rappel_progression:
+            self.rappel_progression(self.lignes_lues, self.stats)
+
+    def _valider_morceau(self, reprise):
+        """
+        Avance le point de reprise dans la transaction du morceau. La mise à
+        jour est conditionnée au nombre de morceaux attendu : deux imports
+        concurrents du même fichier ne peuvent pas valider le même morceau.
+        """
+        avances = RepriseImport.objects.filter(pk=reprise.pk, morceaux_valides=reprise.morceaux_valides).update(
+            morceaux_valides=reprise.morceaux_valides + 1,
+            lignes_validees=self.lignes_lues,
+            stats=self.stats,
+            date_modification=timezone.now()
+        )
+        if not avances:
+            raise RuntimeError("Le point de reprise a été modifié par un autre import du même fichier")
+        reprise.morceaux_valides += 1
+        reprise.lignes_validees = self.lignes_lues
+
+    def _ecrire(self, lignes):
+        """Écrit les lignes préparées, table par table"""
+        self.resolveur.resoudre(lignes)
+        patients = self.creer_patients(lignes)
+        # Seuls les patients créés ou modifiés sont propagés aux tables enfants
+        lignes = [ligne for ligne in lignes if ligne['id_code'] in patients]
+        dossiers = self._creer_dossiers(patients)
+        analyses = self._creer_analyses(dossiers)
+        self._creer_resultats(lignes, dossiers, analyses)
+        self._creer_alertes(lignes, dossiers)
+        self._creer_enfants(lignes, dossiers, 'vaccin', Vaccin, 'nomVaccin', 'vaccins_created')
+        self._creer_enfants(lignes, dossiers, 'infection', Infection, 'nomInfection', 'infections_created')
+
+    def preparer_lignes(self, df, decalage=0):
+        """Nettoie les colonnes du DataFrame puis convertit chaque ligne en valeurs prêtes à insérer"""
+        return self._integrer(preparer_morceau(numeroter(df, decalage)))
+
+    def _integrer(self, preparation):
+        """Reporte les compteurs d'une préparation dans les statistiques ; retourne ses lignes"""
+        lignes, rapport, erreurs, sans_id, _ = preparation
+        cumuler_rapport(self.stats['colonnes'], rapport)
+        self.stats['errors'].extend(erreurs)
+        self.stats['patients_skipped'] += sans_id
+        return lignes
+
+    def _charger(self, queryset, champ, valeurs, *colonnes):
+        return charger_par_lots(queryset, champ, valeurs, *colonnes, taille_lot=self.taille_lot)
+
+    def creer_patients(self, lignes):
+        """
+        Crée les patients absents (et met à jour les patients modifiés en mode
+        mise à jour) ; retourne {id_code: idPatient} des patients à propager.
+        """
+        premieres = {}
+        for ligne in lignes:
+            if ligne['id_code'] in premieres:
+                self.stats['patients_skipped'] += 1
+                continue
+            premieres[ligne['id_code']] = ligne
+
+        existants = self._charger(Patient.objects, 'id_code', premieres.keys(), 'pk', 'empreinte_import')
+
+        patients = {}
+        nouveaux = []
+        modifies = []
+        for id_code, ligne in premieres.items():
+            if id_code in existants:
+                patient_id, empreinte = existants[id_code]
+                if not self.mise_a_jour:
+                    patients[id_code] = patient_id
+                    self.stats['patients_skipped'] += 1
+                elif empreinte == ligne['empreinte']:
+                    self.stats['patients_skipped'] += 1
+                else:
+                    patients[id_code] = patient_id
+                    modifies.append(self._patient(ligne, pk=patient_id))
+                continue
+            nouveaux.append(self._patient(ligne))
+
+        patients.update(self.chargeur.inserer(Patient, nouveaux, 'id_code'))
+        self.stats['patients_created'] += len(nouveaux)
+        self.chargeur.mettre_a_jour(Patient, modifies, CHAMPS_PATIENT)
+        self.stats['patients_updated'] += len(modifies)
+        return patients
+
+    def _patient(self, ligne, pk=None):
+        """Instance Patient (non sauvegardée) d'une ligne préparée"""
+        cles_etrangeres = {f'{nom}_id': self.resolveur.get(nom, ligne[nom]) for nom in DIMENSIONS}
+        return Patient(
+            pk=pk, id_code=ligne['id_code'], empreinte_import=ligne['empreinte'],
+            **ligne['patient'], **cles_etrangeres
+        )
+
+    def _creer_dossiers(self, patients):
+        """Un dossier médical par patient ; retourne {id_code: idDossier}"""
+        existants = self._charger(DossierMedical.objects, 'patient_id', patients.values(), 'pk')
+        nouveaux = [
+            DossierMedical(
+                patient_id=patient_id,
+                dateCreation=self.aujourdhui,
+                commentaireGeneral=f"Dossier créé automatiquement pour le patient {id_code}"
+            )
+            for id_code, patient_id in patients.items() if patient_id not in existants
+        ]
+        existants.update(self.chargeur.inserer(DossierMedical, nouveaux, 'patient_id'))
+        self.stats['dossiers_created'] += len(nouveaux)
+        return {id_code: existants[patient_id] for id_code, patient_id in patients.items()}
+
+    def _creer_analyses(self, dossiers):
+        """Une analyse générale par dossier ; retourne {idDossier: idAnalyse}"""
+        existantes = self._charger(Analyse.objects, 'dossier_id', dossiers.values(), 'pk')
+        nouvelles = [
+            Analyse(dossier_id=dossier_id, typeAnalyse='Analyse générale', dateAnalyse=self.aujourdhui)
+            for dossier_id in set(dossiers.values()) if dossier_id not in existantes
+        ]
+        existantes.update(self.chargeur.inserer(Analyse, nouvelles, 'dossier_id'))
+        self.stats['analyses_created'] += len(nouvelles)
+        return existantes
+
+    def _creer_resultats(self, lignes, dossiers, analyses):
+        """Un résultat par analyse, issu de la première ligne qui en contient"""
+        valeurs = {}
+        for ligne in lignes:
+            if ligne['resultat'] is not None:
+                analyse_id = analyses[dossiers[ligne['id_code']]]
+                valeurs.setdefault(analyse_id, ligne['resultat'])
+
+        existants = self._charger(ResultatAnalyse.objects, 'analyse_id', valeurs.keys(), 'pk')
+        nouveaux = [
+            ResultatAnalyse(analyse_id=analyse_id, **champs)
+            for analyse_id, champs in valeurs.items() if analyse_id not in existants
+        ]
+        self.chargeur.inserer(ResultatAnalyse, nouveaux)
+        self.stats['resultats_created'] += len(nouveaux)
+
+        if self.mise_a_jour:
+            self.chargeur.mettre_a_jour(ResultatAnalyse, [
+                ResultatAnalyse(pk=existants[analyse_id], analyse_id=analyse_id, **champs)
+                for analyse_id, champs in valeurs.items() if analyse_id in existants
+            ], ['glycemie', *CHAMPS_RESULTAT])
+
+    def _existants_par_dossier(self, modele, champ_nom, dossier_ids):
+        """{(dossier_id, nom): pk} des lignes déjà présentes en base (première par pk)"""
+        existants = {}
+        for lot in par_lots(set(dossier_ids), self.taille_lot):
+            lignes = modele.objects.filter(dossier_id__in=lot).order_by('pk').values_list('dossier_id', champ_nom, 'pk')
+            for dossier_id, nom, pk in lignes:
+                existants.setdefault((dossier_id, nom), pk)
+        return existants
+
+    def _creer_alertes(self, lignes, dossiers):
+        """Alertes diabète / hypertension, une par type et par dossier"""
+        valeurs = {}
+        for ligne in lignes:
+            dossier_id = dossiers[ligne['id_code']]
+            for type_alerte, message in ligne['alertes']:
+                valeurs.setdefault((dossier_id, type_alerte), message)
+
+        existantes = self._existants_par_dossier(Alerte, 'typeAlerte', [cle[0] for cle in valeurs])
+        nouvelles = [
+            Alerte(dossier_id=dossier_id, typeAlerte=type_alerte, message=message, dateAlerte=self.aujourdhui)
+            for (dossier_id, type_alerte), message in valeurs.items()
+            if (dossier_id, type_alerte) not in existantes
+        ]
+        self.chargeur.inserer(Alerte, nouvelles)
+        self.stats['alertes_created'] += len(nouvelles)
+
+        if self.mise_a_jour:
+            self.chargeur.mettre_a_jour(Alerte, [
+                Alerte(pk=existantes[cle], message=message)
+                for cle, message in valeurs.items() if cle in existantes
+            ], ['message'])
+
+    def _creer_enfants(self, lignes, dossiers, cle_ligne, modele, champ_nom, cle_stat):
+        """Vaccins / infections, un par nom et par dossier"""
+        valeurs = {}
+        for ligne in lignes:
+            if ligne[cle_ligne] is not None:
+                nom, defaults = ligne[cle_ligne]
+                valeurs.setdefault((dossiers[ligne['id_code']], nom), defaults)
+
+        existants = self._existants_par_dossier(modele, champ_nom, [cle[0] for cle in valeurs])
+        nouveaux = [
+            modele(dossier_id=dossier_id, **{champ_nom: nom}, **defaults)
+            for (dossier_id, nom), defaults in valeurs.items()
+            if (dossier_id, nom) not in existants
+        ]
+        self.chargeur.inserer(modele, nouveaux)
+        self.stats[cle_stat] += len(nouveaux)
+
+        if self.mise_a_jour:
+            modifies = [(existants[cle], defaults) for cle, defaults in valeurs.items() if cle in existants]
+            self.chargeur.mettre_a_jour(
+                modele, [modele(pk=pk, **defaults) for pk, defaults in modifies],
+                list(modifies[0][1]) if modifies else []
+            )
+
+
+# ===================== VALIDATION À BLANC =====================
+
+# Nombre maximal d'exemples de lignes invalides et d'erreurs renvoyés
+NB_EXEMPLES_VALIDATION = 20
+
+def valider_csv(fichier, processus=None, nb_exemples=NB_EXEMPLES_VALIDATION, taille_lot=TAILLE_LOT):
+    """
+    Passe le fichier entier dans l'étape de lecture et de nettoyage de
+    l'import, sans rien écrire en base. Retourne l'encodage détecté, les
+    compteurs par colonne, des exemples de lignes invalides et une estimation
+    des insertions (seule lecture : les patients déjà présents).
+    Lève ValueError si le fichier est illisible.
+    """
+    encodage = detecter_encodage(fichier)
+    processus = processus or getattr(settings, 'IMPORT_CSV_PROCESSUS', 1)
+
+    manquantes = colonnes_manquantes(lire_entete(fichier, encodage))
+    if manquantes:
+        return {
+            'valide': False,
+            'encodage': encodage,
+            'message': f"Colonnes manquantes: {', '.join(manquantes)}",
+            'colonnes_manquantes': manquantes,
+        }
+
+    rapport = {}
+    erreurs = []
+    exemples = []
+    nb_lignes = 0
+    sans_id = 0
+    doublons = 0
+    # id_code -> ce que l'import créerait pour le patient (mêmes règles de dédoublonnage)
+    patients = {}
+    morceaux = lire_csv_par_morceaux(fichier, encodage)
+    for nb, (lignes, rapport_part, erreurs_part, sans_id_part, exemples_part) in preparations(morceaux, processus, nb_exemples):
+        nb_lignes += nb
+        sans_id += sans_id_part
+        cumuler_rapport(rapport, rapport_part)
+        erreurs.extend(erreurs_part)
+        exemples.extend(exemples_part)
+        for ligne in lignes:
+            if ligne['id_code'] in patients:
+                doublons += 1
+            prevu = patients.setdefault(ligne['id_code'], {
+                'resultats': set(), 'alertes': set(), 'vaccins': set(), 'infections': set()
+            })
+            if ligne['resultat'] is not None:
+                prevu['resultats'].add(True)
+            prevu['alertes'].update(type_alerte for type_alerte, _ in ligne['alertes'])
+            if ligne['vaccin'] is not None:
+                prevu['vaccins'].add(ligne['vaccin'][0])
+            if ligne['infection'] is not None:
+                prevu['infections'].add(ligne['infection'][0])
+
+    existants = set(charger_par_lots(Patient.objects, 'id_code', patients.keys(), 'pk', taille_lot=taille_lot))
+    nouveaux = [valeurs for id_code, valeurs in patients.items() if id_code not in existants]
+    # En multi-processus les parts arrivent par patient et non dans l'ordre du fichier
+    exemples.sort(key=lambda exemple: exemple['ligne'])
+
+    return {
+        'valide': not erreurs,
+        'encodage': encodage,
+        'lignes': nb_lignes,
+        'lignes_sans_id': sans_id,
+        'doublons': doublons,
+        'patients_existants': len(existants),
+        'colonnes': rapport,
+        'exemples_invalides': exemples[:nb_exemples],
+        'nb_erreurs': len(erreurs),
+        'erreurs': erreurs[:nb_exemples],
+        'insertions_estimees': {
+            'patients': len(nouveaux),
+            'dossiers': len(nouveaux),
+            'analyses': len(nouveaux),
+            **{table: sum(len(prevu[table]) for prevu in nouveaux) for table in ('resultats', 'alertes', 'vaccins', 'infections')},
+        },
+    }
+
+
+# ===================== IMPORTS EN ARRIÈRE-PLAN =====================
+
+_executeur = None
+
+def _get_executeur():
+    """Pool de threads partagé par le processus (créé à la première utilisation)"""
+    global _executeur
+    if _executeur is None:
+        _executeur = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMPORT_CSV_WORKERS', 2),
+            thread_name_prefix='import-csv'
+        )
+    return _executeur
+
+def cle_progression(job_id):
+    """Clé de cache de la progression d'un import en cours"""
+    return f"import_job_{job_id}"
+
+def soumettre_import(job):
+    """Planifie l'exécution d'un ImportJob une fois la transaction courante validée"""
+    transaction.on_commit(lambda: _get_executeur().submit(executer_import, job.pk))
+
+def imports_interrompus():
+    """
+    Imports pouvant être repris : en échec, ou encore en cours sans morceau
+    validé depuis IMPORT_INACTIVITE_MAX secondes (processus mort)
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_INACTIVITE_MAX', 900))
+    return ImportJob.objects.filter(
+        Q(statut='ECHEC')
+        | Q(statut='EN_COURS', date_progression__lt=limite)
+        | Q(statut='EN_COURS', date_progression__isnull=True, date_debut__lt=limite)
+    )
+
+def relancer_import(job):
+    """
+    Replanifie un import interrompu ; il reprendra après le dernier morceau
+    validé. Renvoie False si l'import n'est pas interrompu (toujours actif,
+    ou déjà relancé par une autre requête).
+    """
+    # Mise à jour conditionnelle : deux relances simultanées ne lancent qu'un import
+    if not imports_interrompus().filter(pk=job.pk).update(statut='EN_ATTENTE', message=None, date_fin=None):
+        return False
+    job.statut = 'EN_ATTENTE'
+    job.message = None
+    job.date_fin = None
+    soumettre_import(job)
+    return True
+
+def progression_import(job):
+    """
+    État d'un import. Tant qu'il tourne, la progression est lue dans le cache
+    (mise à jour à chaque morceau, avant la validation de sa transaction).
+    """
+    etat = {
+        'lignes_total': job.lignes_total,
+        'lignes_traitees': job.lignes_traitees,
+        'stats': job.stats,
+        'erreurs': job.erreurs,
+    }
+    if job.statut == 'EN_COURS':
+        etat.update(cache.get(cle_progression(job.pk)) or {})
+    return etat
+
+def executer_import(job_id):
+    """Exécute un ImportJob dans un thread du pool"""
+    close_old_connections()
+    try:
+        job = ImportJob.objects.get(pk=job_id)
+        job.statut = 'EN_COURS'
+        job.date_debut = job.date_progression = timezone.now()
+        job.save(update_fields=['statut', 'date_debut', 'date_progression'])
+
+        def publier(lignes_traitees, stats):
+            cache.set(cle_progression(job_id), {
+                'lignes_traitees': lignes_traitees,
+                'stats': {cle: valeur for cle, valeur in stats.items() if cle != 'errors'},
+                'erreurs': stats['errors'][:10],
+            }, timeout=24 * 3600)
+            # Validé avec le morceau : reste exact si le processus meurt ensuite
+            ImportJob.objects.filter(pk=job_id).update(lignes_traitees=lignes_traitees, date_progression=timezone.now())
+
+        with job.fichier.open('rb') as fichier:
+            job.encodage = detecter_encodage(fichier)
+            job.lignes_total = estimer_nombre_lignes(fichier)
+            reprise = point_de_reprise(fichier)
+            if reprise.morceaux_valides:
+                job.message = f"Reprise après {reprise.lignes_validees} lignes déjà importées"
+            job.save(update_fields=['encodage', 'lignes_total', 'message'])
+
+            importateur = ImportateurCSV(rappel_progression=publier, mise_a_jour=job.mise_a_jour)
+            stats = importateur.importer_morceaux(lire_csv_par_morceaux(fichier, job.encodage), reprise=reprise)
+
+        job.statut = 'TERMINE'
+        job.lignes_total = importateur.lignes_lues
+        job.lignes_traitees = importateur.lignes_lues
+        job.stats = {cle: valeur for cle, valeur in stats.items() if cle != 'errors'}
+        job.erreurs = stats['errors']
+        job.message = "Import complet terminé avec succès!"
+        job.date_fin = timezone.now()
+        job.save()
+        job.fichier.delete(save=False)
+        logger.info(f"ImportJob #{job_id} terminé : {job.stats}")
+
+    except Exception as e:
+        logger.error(f"ImportJob #{job_id} en échec : {e}")
+        ImportJob.objects.filter(pk=job_id).update(
+            statut='ECHEC',
+            message=f"Erreur lors de l'importation : {str(e)}",
+            date_fin=timezone.now()
+        )
+    finally:
+        cache.delete(cle_progression(job_id))
+        connection.close()
@@ -0,0 +1,355 @@
+"""
+Chaîne d'empreintes des tables d'audit (Acces, AuditConformite)
+Chaque ligne reçoit un rang, sa position dans la chaîne de sa table, et une
+empreinte SHA-256 de son contenu et de l'empreinte du rang précédent. Le
+dernier maillon de chaque chaîne est gardé dans ChaineAudit et verrouillé le
+temps de chaîner un lot : les écrivains concurrents s'enchaînent l'un après
+l'autre (le journal d'audit chaîne ses lots entiers en une fois).
+
+L'archivage des mois anciens retire le début de la chaîne : ChaineAudit garde
+le rang et l'empreinte de la dernière ligne archivée, à partir desquels la
+première ligne restante est vérifiée. Les quelques lignes archivées de rang
+supérieur (lots écrits à cheval sur deux mois) y sont notées une à une.
+
+La vérification parcourt la chaîne par tranches de rangs, en parallèle, chaque
+tranche étant lue par lots (pagination sur rang) : la mémoire ne dépend pas du
+nombre de lignes. Elle signale les lignes modifiées (empreinte recalculée
+différente), les rangs manquants ou en double (suppression, insertion) et une
+fin de chaîne qui ne correspond plus au dernier maillon.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone as tz
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Min
+from .models import Acces, AuditConformite, ChaineAudit
+
+logger = logging.getLogger(__name__)
+
+EMPREINTE_INITIALE = '0' * 64
+
+MODELES_CHAINES = [Acces, AuditConformite]
+
+# Table -> champ de date : les lignes existantes sont chaînées dans l'ordre où l'archivage les retire
+CHAMPS_DATE = {
+    'api_acces': 'dateAcces',
+    'api_auditconformite': 'date_action',
+}
+
+# Lignes lues par aller-retour avec la base pendant la vérification
+TAILLE_LOT_VERIFICATION = 5000
+# Rangs au plus par tranche confiée à un processus
+TAILLE_TRANCHE = 1_000_000
+# Anomalies détaillées au plus par tranche (toutes sont comptées)
+MAX_ANOMALIES = 100
+
+
+# ===================== EMPREINTES =====================
+
+def champs_chaines(modele):
+    """Champs couverts par l'empreinte : tous sauf l'identifiant (attribué par la base) et l'empreinte"""
+    return [champ for champ in modele._meta.concrete_fields if not champ.primary_key and champ.attname != 'empreinte']
+
+
+def valeur_enregistree(champ, valeur):
+    """
+    Valeur telle que la base la rendra à la relecture (adresse IP normalisée,
+    nombre converti, JSON resérialisé) : l'empreinte calculée avant l'insertion
+    est celle que la vérification recalcule
+    """
+    if isinstance(champ, models.JSONField):
+        return None if valeur is None else json.loads(json.dumps(valeur, cls=champ.encoder))
+    return champ.to_python(champ.get_prep_value(valeur))
+
+
+def _valeur(valeur):
+    # Dates en UTC : même texte avant l'insertion et à la relecture
+    if isinstance(valeur, datetime):
+        return valeur.astimezone(tz.utc).isoformat()
+    # jsonb relit 1.5e10 en 15000000000 : un réel entier est haché comme un entier
+    if isinstance(valeur, float) and valeur.is_integer():
+        return int(valeur)
+    if isinstance(valeur, dict):
+        return {cle: _valeur(v) for cle, v in valeur.items()}
+    if isinstance(valeur, (list, tuple)):
+        return [_valeur(v) for v in valeur]
+    return valeur
+
+
+def calculer_empreinte(precedente, valeurs):
+    """Empreinte d'une ligne ({champ: valeur}, indépendant de l'ordre des champs du modèle)"""
+    contenu = json.dumps(_valeur(valeurs), ensure_ascii=False,
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256((precedente + contenu).encode('utf-8')).hexdigest()
+
+
+def chainer(modele, objets, chaines=ChaineAudit):
+    """
+    Attribue rang et empreinte à des lignes, à la suite de la chaîne de leur
+    table. À appeler dans une transaction : le dernier maillon reste verrouillé
+    jusqu'à sa fin, l'écrivain suivant chaîne après ces lignes. `chaines` est
+    le modèle ChaineAudit (modèle historique dans une migration).
+    """
+    champs = champs_chaines(modele)
+    maillon, _ = chaines.objects.select_for_update().get_or_create(table=modele._meta.db_table)
+    rang, empreinte = maillon.rang, maillon.empreinte or EMPREINTE_INITIALE
+    for objet in objets:
+        rang += 1
+        objet.rang = rang
+        empreinte = calculer_empreinte(
+            empreinte, {champ.attname: valeur_enregistree(champ, getattr(objet, champ.attname)) for champ in champs}
+        )
+        objet.empreinte = empreinte
+    maillon.rang, maillon.empreinte = rang, empreinte
+    maillon.save(update_fields=['rang', 'empreinte'])
+
+
+def inserer_chaine(modele, objets, taille_lot=None):
+    """
+    Insère des lignes d'audit chaînées, en un lot : le dernier maillon n'est
+    verrouillé qu'une fois par lot. Les dates auto_now d'un modèle n'étant
+    fixées qu'à l'insertion, ses lignes sont alors chaînées juste après.
+    """
+    automatiques = any(
+        getattr(champ, 'auto_now', False) or getattr(champ, 'auto_now_add', False)
+        for champ in modele._meta.concrete_fields
+    )
+    with transaction.atomic():
+        if automatiques:
+            modele.objects.bulk_create(objets, batch_size=taille_lot)
+            chainer(modele, objets)
+            _ecrire_rangs(modele, objets)
+        else:
+            chainer(modele, objets)
+            modele.objects.bulk_create(objets, batch_size=taille_lot)
+    return objets
+
+
+def sceller(modele, taille_lot=2000, chaines=ChaineAudit):
+    """
+    Chaîne, par date puis identifiant, les lignes qui ne le sont pas encore
+    (antérieures à la chaîne ou écrites sans passer par l'ORM). Renvoie leur nombre.
+    """
+    ordre = [CHAMPS_DATE[modele._meta.db_table], 'pk']
+    a_chainer = modele.objects.filter(empreinte__isnull=True).order_by(*ordre).values_list('pk', flat=True)
+    total = 0
+    ids = []
+    for pk in a_chainer.iterator(chunk_size=taille_lot):
+        ids.append(pk)
+        if len(ids) == taille_lot:
+            total += _sceller_lot(modele, ids, ordre, chaines)
+            ids = []
+    if ids:
+        total += _sceller_lot(modele, ids, ordre, chaines)
+    return total
+
+
+def _sceller_lot(modele, ids, ordre, chaines):
+    with transaction.atomic():
+        # Verrou d'abord : une ligne chaînée entre-temps par un autre scellement est écartée
+        chaines.objects.select_for_update().get_or_create(table=modele._meta.db_table)
+        lot = list(modele.objects.filter(pk__in=ids, empreinte__isnull=True).order_by(*ordre))
+        chainer(modele, lot, chaines)
+        _ecrire_rangs(modele, lot)
+    return len(lot)
+
+
+def _ecrire_rangs(modele, lot):
+    """
+    Écrit rang et empreinte de lignes déjà insérées. Sur PostgreSQL en une
+    requête UPDATE ... FROM (VALUES ...) (bulk_update construit un CASE par
+    ligne) ; la date, clé de partition, limite chaque ligne à sa partition.
+    """
+    if not lot:
+        return
+    if connection.vendor != 'postgresql':
+        modele.objects.bulk_update(lot, ['rang', 'empreinte'])
+        return
+    q = connection.ops.quote_name
+    champ_date = modele._meta.get_field(CHAMPS_DATE[modele._meta.db_table])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {q(modele._meta.db_table)} AS t SET rang = v.rang, empreinte = v.empreinte "
+            f"FROM (VALUES {', '.join(['(%s, %s::timestamptz, %s::bigint, %s)'] * len(lot))}) AS v (id, date, rang, empreinte) "
+            f"WHERE t.id = v.id AND t.{q(champ_date.column)} = v.date",
+            [valeur for objet in lot for valeur in (objet.pk, getattr(objet, champ_date.attname), objet.rang, objet.empreinte)]
+        )
+
+
+# ===================== ARCHIVAGE =====================
+
+def noter_archivage(modele, archivees):
+    """
+    Enregistre dans ChaineAudit, avant leur suppression, les lignes qu'un
+    archivage retire (filtre Q) : rang et empreinte de la dernière ligne du
+    début de chaîne archivé, et lignes archivées de rang supérieur à la
+    première ligne restante.
+    """
+    table = modele._meta.db_table
+    with transaction.atomic():
+        maillon, _ = ChaineAudit.objects.select_for_update().get_or_create(table=table)
+        chainees = modele.objects.filter(rang__isnull=False)
+        premiere_restante = chainees.exclude(archivees).aggregate(rang=Min('rang'))['rang']
+        fin_archivee = maillon.rang if premiere_restante is None else premiere_restante - 1
+
+        isolees = dict(maillon.rangs_archives)
+        isolees.update(
+            (str(rang), empreinte)
+            for rang, empreinte in chainees.filter(archivees, rang__gt=max(fin_archivee, maillon.rang_archive))
+            .values_list('rang', 'empreinte')
+        )
+        if fin_archivee > maillon.rang_archive:
+            empreinte = chainees.filter(archivees, rang=fin_archivee).values_list('empreinte', flat=True).first()
+            if empreinte is None:
+                empreinte = isolees.get(str(fin_archivee))
+            if empreinte is not None:
+                maillon.rang_archive, maillon.empreinte_archive = fin_archivee, empreinte
+            else:
+                # Rang déjà absent de la table : la vérification le signalera comme manquant
+                logger.warning(f"Chaîne {table} : rang {fin_archivee} introuvable, début archivé inchangé")
+        maillon.rangs_archives = {
+            rang: empreinte for rang, empreinte in isolees.items() if int(rang) > maillon.rang_archive
+        }
+        maillon.save(update_fields=['rang_archive', 'empreinte_archive', 'rangs_archives'])
+
+
+# ===================== VÉRIFICATION =====================
+
+def _manquants(debut, fin, isolees):
+    """Rangs debut..fin absents de la table et non archivés"""
+    return fin - debut + 1 - sum(1 for rang in isolees if debut <= rang <= fin)
+
+
+def verifier_tranche(label, debut, fin, precedente=None, isolees=None, taille_lot=TAILLE_LOT_VERIFICATION):
+    """
+    Vérifie les rangs debut..fin de la chaîne d'un modèle ('api.Acces').
+    `precedente` est l'empreinte du rang debut - 1 pour la première tranche ;
+    pour les suivantes elle est relue en base. `isolees` donne l'empreinte des
+    rangs de la tranche archivés hors du début de chaîne.
+    """
+    modele = apps.get_model(label)
+    champs = [champ.attname for champ in champs_chaines(modele)]
+    position_rang = champs.index('rang')
+    isolees = isolees or {}
+    resultat = {'debut': debut, 'fin': fin, 'lignes': 0, 'nb_anomalies': 0, 'anomalies': [], 'derniere': None}
+
+    def signaler(rang, message):
+        resultat['nb_anomalies'] += 1
+        if len(resultat['anomalies']) < MAX_ANOMALIES:
+            resultat['anomalies'].append((rang, message))
+
+    try:
+        if precedente is None:
+            precedente = modele.objects.filter(rang=debut - 1).values_list('empreinte', flat=True).first()
+            precedente = precedente or isolees.get(debut - 1)
+            if precedente is None:
+                signaler(debut - 1, "rang manquant")
+
+        attendu = debut
+        dernier = None  # (rang, pk) de la dernière ligne lue
+        while True:
+            lignes = modele.objects.filter(rang__gte=debut, rang__lte=fin)
+            if dernier is not None:
+                lignes = lignes.filter(rang__gte=dernier[0]).exclude(rang=dernier[0], pk__lte=dernier[1])
+            lot = list(lignes.order_by('rang', 'pk').values_list('pk', 'empreinte', *champs)[:taille_lot])
+            if not lot:
+                break
+            for pk, empreinte, *valeurs in lot:
+                rang = valeurs[position_rang]
+                if rang < attendu:
+                    signaler(rang, "rang en double")
+                elif rang > attendu:
+                    if _manquants(attendu, rang - 1, isolees):
+                        signaler(attendu, f"rangs {attendu} à {rang - 1} manquants")
+                    precedente = isolees.get(rang - 1, precedente)
+                if precedente is not None and calculer_empreinte(precedente, dict(zip(champs, valeurs))) != empreinte:
+                    signaler(rang, f"empreinte invalide (id {pk})")
+                # La suite est vérifiée à partir de l'empreinte enregistrée : une ligne
+                # modifiée est signalée seule, sans invalider toutes les suivantes
+                precedente = empreinte
+                attendu = max(attendu, rang + 1)
+                resultat['lignes'] += 1
+                resultat['derniere'] = (rang, empreinte)
+            dernier = (lot[-1][2 + position_rang], lot[-1][0])
+
+        if attendu <= fin:
+            if _manquants(attendu, fin, isolees):
+                signaler(attendu, f"rangs {attendu} à {fin} manquants")
+            elif fin in isolees:
+                resultat['derniere'] = (fin, isolees[fin])
+        return resultat
+    finally:
+        connection.close()
+
+
+def tranches(debut, fin, processus):
+    """Découpe debut..fin en au moins `processus` tranches d'au plus TAILLE_TRANCHE rangs"""
+    nombre = max(processus, -(-(fin - debut + 1) // TAILLE_TRANCHE))
+    taille = max(1, -(-(fin - debut + 1) // nombre))
+    return [(rang, min(rang + taille - 1, fin)) for rang in range(debut, fin + 1, taille)]
+
+
+def verifier_chaine(modele, processus=None, taille_lot=TAILLE_LOT_VERIFICATION):
+    """
+    Vérifie la chaîne d'une table d'audit, de la première ligne qui suit le
+    début archivé jusqu'au dernier maillon enregistré au début de la
+    vérification (les lignes chaînées ensuite sont laissées à la suivante)
+    """
+    processus = processus or getattr(settings, 'AUDIT_VERIFICATION_PROCESSUS', 2)
+    table = modele._meta.db_table
+    maillon = ChaineAudit.objects.filter(table=table).first() or ChaineAudit(table=table)
+    debut, fin = maillon.rang_archive + 1, maillon.rang
+    isolees = {int(rang): empreinte for rang, empreinte in maillon.rangs_archives.items()}
+    rapport = {
+        'table': table,
+        'archivees': maillon.rang_archive,
+        'debut': debut,
+        'fin': fin,
+        'non_chainees': modele.objects.filter(empreinte__isnull=True).count(),
+        'lignes': 0,
+        'nb_anomalies': 0,
+        'anomalies': [],
+    }
+    if debut > fin:
+        # Chaîne vide ou entièrement archivée
+        if maillon.rang and maillon.empreinte_archive != maillon.empreinte:
+            rapport['nb_anomalies'] += 1
+            rapport['anomalies'].append((maillon.rang, "fin de chaîne différente du dernier maillon"))
+        return rapport
+
+    arguments = [
+        (
+            modele._meta.label, tranche_debut, tranche_fin,
+            (maillon.empreinte_archive or EMPREINTE_INITIALE) if tranche_debut == debut else None,
+            {rang: empreinte for rang, empreinte in isolees.items() if tranche_debut - 1 <= rang <= tranche_fin},
+            taille_lot,
+        )
+        for tranche_debut, tranche_fin in tranches(debut, fin, processus)
+    ]
+    if processus <= 1:
+        resultats = [verifier_tranche(*args) for args in arguments]
+    else:
+        # spawn : la commande peut être lancée depuis un processus déjà multithreadé
+        with ProcessPoolExecutor(
+            max_workers=processus,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        ) as pool:
+            resultats = list(pool.map(verifier_tranche, *zip(*arguments)))
+
+    for resultat in resultats:
+        rapport['lignes'] += resultat['lignes']
+        rapport['nb_anomalies'] += resultat['nb_anomalies']
+        rapport['anomalies'].extend(resultat['anomalies'][:MAX_ANOMALIES - len(rapport['anomalies'])])
+    derniere = resultats[-1]['derniere']
+    if derniere is not None and derniere != (maillon.rang, maillon.empreinte):
+        rapport['nb_anomalies'] += 1
+        rapport['anomalies'].append((maillon.rang, "fin de chaîne différente du dernier maillon"))
+    return rapport
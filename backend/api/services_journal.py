@@ -0,0 +1,249 @@
+"""
+Écriture différée du journal des accès (table Acces)
+log_audit ne fait plus qu'ajouter l'accès à une file en mémoire : un thread
+d'arrière-plan l'enregistre par lots (bulk_create) tous les AUDIT_TAILLE_LOT
+accès ou toutes les AUDIT_DELAI_MS millisecondes, puis vérifie les règles
+d'alerte hors du chemin de la requête.
+
+Chaque accès est d'abord ajouté à un segment de journal local (une ligne JSON,
+fichier en ajout seul) supprimé une fois son lot en base : après un arrêt
+brutal ou une base indisponible, les segments restants sont rejoués. Un arrêt
+entre l'insertion d'un lot et la suppression de son segment le fait rejouer
+une seconde fois : aucun accès n'est perdu, un lot peut être en double.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Acces, Utilisateur
+from .services import verifier_et_declencher_alerte
+from .services_activite import incrementer_activite
+from .services_integrite import inserer_chaine
+
+logger = logging.getLogger(__name__)
+
+# Segment en cours d'écriture, lot en cours d'envoi, segment en attente de rejeu
+SUFFIXE_ECRITURE = '.ecriture'
+SUFFIXE_ENVOI = '.envoi'
+SUFFIXE_A_REJOUER = '.jsonl'
+
+
+def ecrire_acces(acces, taille_lot=None):
+    """
+    Écrit des accès (instances Acces non enregistrées) en un lot, dans une
+    transaction : compteurs horaires, chaîne d'empreintes, insertion. Seul
+    chemin d'écriture des accès, lots du journal comme écritures immédiates.
+    """
+    # Compteurs puis chaîne : tous les écrivains prennent leurs verrous dans le même ordre
+    with transaction.atomic():
+        incrementer_activite(acces)
+        inserer_chaine(Acces, acces, taille_lot)
+    return acces
+
+
+def _processus_actif(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JournalAudit:
+    """
+    File des accès à enregistrer, partagée par les threads du processus.
+    Les accès sont écrits dans un segment local avant d'entrer dans la file ;
+    à chaque vidage le segment est fermé, son lot inséré en base puis le
+    segment supprimé. Un lot en échec laisse son segment pour être rejoué.
+    """
+
+    def __init__(self, repertoire, taille_lot=200, delai_ms=500):
+        self.repertoire = repertoire
+        self.taille_lot = taille_lot
+        self.delai = delai_ms / 1000
+        self._verrou = threading.Lock()
+        self._plein = threading.Event()
+        self._lot = []
+        self._segment = None
+        self._numero_segment = 0
+        self._thread = None
+        self._pid = None
+        self._reprise = True
+
+    # ----- côté requête -----
+
+    def enregistrer(self, utilisateur, type_acces, donnees_concernees, regle=None, alertes=True):
+        """
+        Ajoute un accès à la file (quelques microsecondes, aucune requête SQL).
+        Avec alertes=False, les règles d'alerte ne sont pas vérifiées pour cet accès.
+        """
+        evenement = {
+            'date': timezone.now().isoformat(),
+            'utilisateur': getattr(utilisateur, 'pk', None),
+            'type': type_acces,
+            'donnees': None if donnees_concernees is None else str(donnees_concernees),
+            'regle': getattr(regle, 'pk', regle),
+        }
+        if not alertes:
+            evenement['alertes'] = False
+        ligne = json.dumps(evenement, ensure_ascii=False) + '\n'
+        with self._verrou:
+            self._demarrer()
+            if self._segment is None:
+                self._numero_segment += 1
+                self._segment = open(self._chemin_segment(SUFFIXE_ECRITURE), 'a', encoding='utf-8')
+            self._segment.write(ligne)
+            self._segment.flush()
+            self._lot.append(evenement)
+            taille = len(self._lot)
+        if taille >= self.taille_lot:
+            self._plein.set()
+
+    def vider(self):
+        """Enregistre immédiatement les accès en attente"""
+        with self._verrou:
+            if self._segment is None:
+                return 0
+            lot, self._lot = self._lot, []
+            self._segment.close()
+            self._segment = None
+            envoi = self._chemin_segment(SUFFIXE_ENVOI)
+            os.replace(self._chemin_segment(SUFFIXE_ECRITURE), envoi)
+        try:
+            self._inserer(lot)
+        except Exception as e:
+            logger.error(f"Journal d'audit : {len(lot)} accès non enregistrés, rejoués plus tard : {e}")
+            os.replace(envoi, envoi[:-len(SUFFIXE_ENVOI)] + SUFFIXE_A_REJOUER)
+            self._reprise = True
+            connection.close()
+            return 0
+        os.remove(envoi)
+        return len(lot)
+
+    # ----- côté thread -----
+
+    def _chemin_segment(self, suffixe):
+        return os.path.join(self.repertoire, f"{self._pid}-{self._numero_segment}{suffixe}")
+
+    def _demarrer(self):
+        """Démarre le thread d'écriture (une fois par processus, y compris après un fork)"""
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        os.makedirs(self.repertoire, exist_ok=True)
+        self._pid = os.getpid()
+        self._lot = []
+        self._segment = None
+        self._thread = threading.Thread(target=self._boucle, name='journal-audit', daemon=True)
+        self._thread.start()
+
+    def _boucle(self):
+        while True:
+            self._plein.wait(self.delai)
+            self._plein.clear()
+            try:
+                if self._reprise:
+                    self.rejouer()
+                self.vider()
+            except Exception as e:
+                logger.error(f"Journal d'audit : {e}")
+
+    def _inserer(self, lot):
+        """Insère un lot d'accès chaînés et leurs compteurs horaires, puis applique les règles d'alerte"""
+        acces = [
+            Acces(
+                dateAcces=parse_datetime(evenement['date']),
+                utilisateur_id=evenement['utilisateur'],
+                typeAcces=evenement['type'],
+                donnees_concernees=evenement['donnees'],
+                regle_id=evenement['regle'],
+            )
+            for evenement in lot
+        ]
+        ecrire_acces(acces, self.taille_lot)
+        utilisateurs = Utilisateur.objects.in_bulk({evenement['utilisateur'] for evenement in lot} - {None})
+        for evenement in lot:
+            # Sans indicateur (segments écrits avant son ajout) : règles vérifiées
+            if not evenement.get('alertes', True):
+                continue
+            try:
+                verifier_et_declencher_alerte(
+                    evenement['type'], utilisateurs.get(evenement['utilisateur']), evenement['donnees']
+                )
+            except Exception as e:
+                logger.error(f"Journal d'audit : règle d'alerte non vérifiée pour {evenement['type']} : {e}")
+
+    def rejouer(self):
+        """
+        Enregistre les segments laissés par un lot en échec ou par un processus
+        arrêté. Chaque segment est réservé par renommage avant d'être rejoué.
+        """
+        self._reprise = False
+        rejoues = 0
+        for nom in sorted(os.listdir(self.repertoire)):
+            chemin = os.path.join(self.repertoire, nom)
+            base, suffixe = os.path.splitext(nom)
+            if suffixe.startswith('.rejeu-'):
+                # Rejeu interrompu : le segment appartient au processus qui le rejouait
+                pid = suffixe[len('.rejeu-'):]
+                base = os.path.splitext(base)[0]
+            else:
+                pid = base.split('-')[0]
+            if suffixe == SUFFIXE_A_REJOUER or (
+                pid.isdigit() and int(pid) != os.getpid() and not _processus_actif(int(pid))
+            ):
+                reserve = os.path.join(self.repertoire, f"{base}{SUFFIXE_A_REJOUER}.rejeu-{os.getpid()}")
+                try:
+                    os.replace(chemin, reserve)
+                except FileNotFoundError:
+                    continue  # réservé par un autre processus
+                try:
+                    with open(reserve, encoding='utf-8') as fichier:
+                        # Une dernière ligne tronquée (arrêt pendant l'écriture) est ignorée
+                        lot = []
+                        for ligne in fichier:
+                            try:
+                                lot.append(json.loads(ligne))
+                            except ValueError:
+                                logger.warning(f"Journal d'audit : ligne illisible ignorée dans {nom}")
+                    self._inserer(lot)
+                except Exception:
+                    os.replace(reserve, os.path.join(self.repertoire, base + SUFFIXE_A_REJOUER))
+                    self._reprise = True
+                    raise
+                os.remove(reserve)
+                rejoues += len(lot)
+        if rejoues:
+            logger.info(f"Journal d'audit : {rejoues} accès rejoués")
+        return rejoues
+
+
+_journal = None
+
+
+def journal_audit():
+    """Journal des accès du processus (créé à la première utilisation)"""
+    global _journal
+    if _journal is None:
+        _journal = JournalAudit(
+            getattr(settings, 'AUDIT_JOURNAL_DIR', os.path.join(settings.BASE_DIR, 'journal_audit')),
+            taille_lot=getattr(settings, 'AUDIT_TAILLE_LOT', 200),
+            delai_ms=getattr(settings, 'AUDIT_DELAI_MS', 500),
+        )
+    return _journal
+
+
+@atexit.register
+def _vider_a_l_arret():
+    if _journal is not None and _journal._pid == os.getpid():
+        try:
+            _journal.vider()
+        except Exception as e:
+            logger.error(f"Journal d'audit : vidage à l'arrêt impossible : {e}")
@@ -0,0 +1,312 @@
+"""
+Partitionnement mensuel et archivage des tables d'audit (Acces, AuditConformite)
+Sur PostgreSQL, chaque table est partitionnée par mois sur sa date (une
+partition <table>_pAAAA_MM par mois, plus une partition par défaut pour les
+dates hors des mois créés) : les requêtes sur une fenêtre récente ne lisent que
+les partitions concernées. La clé primaire devient (id, date), l'unicité de id
+restant assurée par sa séquence.
+
+L'archivage exporte chaque mois antérieur à la rétention dans un fichier CSV
+compressé (<table>_pAAAA_MM.csv.gz, avec en-tête) puis détache et supprime sa
+partition. Sur SQLite les tables restent simples : les lignes anciennes sont
+archivées de la même façon, mois par mois, puis supprimées. Les rangs retirés
+de la chaîne d'empreintes sont notés au préalable (services_integrite).
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+from datetime import datetime, timezone as tz
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Acces, AuditConformite
+from .services_integrite import noter_archivage
+
+logger = logging.getLogger(__name__)
+
+# Modèle -> champ de date servant de clé de partition
+TABLES_PARTITIONNEES = {
+    Acces: 'dateAcces',
+    AuditConformite: 'date_action',
+}
+
+
+# ===================== MOIS =====================
+
+def debut_mois(date):
+    return datetime(date.year, date.month, 1, tzinfo=tz.utc)
+
+
+def mois_suivant(debut, n=1):
+    mois = debut.month - 1 + n
+    return datetime(debut.year + mois // 12, mois % 12 + 1, 1, tzinfo=tz.utc)
+
+
+def nom_partition(table, debut):
+    return f"{table}_p{debut:%Y_%m}"
+
+
+def mois_de_partition(table, nom):
+    """Premier jour du mois d'une partition mensuelle, None pour la partition par défaut"""
+    try:
+        return datetime.strptime(nom[len(table) + 2:], '%Y_%m').replace(tzinfo=tz.utc)
+    except ValueError:
+        return None
+
+
+def _table_et_colonne(modele):
+    champ = modele._meta.get_field(TABLES_PARTITIONNEES[modele])
+    return modele._meta.db_table, champ.column
+
+
+# ===================== POSTGRESQL =====================
+
+def est_partitionnee(cursor, table):
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+    return cursor.fetchone() is not None
+
+
+def partitions(cursor, table):
+    """Partitions mensuelles de la table : [(nom, début du mois)] par mois croissant"""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)", [table]
+    )
+    mois = [(nom, mois_de_partition(table, nom)) for nom, in cursor.fetchall()]
+    return sorted((nom, debut) for nom, debut in mois if debut is not None)
+
+
+def creer_partition(cursor, table, colonne, debut):
+    """
+    Crée la partition du mois commençant à `debut` si elle n'existe pas.
+    Les lignes de ce mois déjà rangées dans la partition par défaut y sont
+    déplacées avant l'attachement (sinon PostgreSQL le refuse).
+    """
+    nom = nom_partition(table, debut)
+    cursor.execute("SELECT to_regclass(%s)", [nom])
+    if cursor.fetchone()[0] is not None:
+        return False
+    q = connection.ops.quote_name
+    bornes = (debut.isoformat(), mois_suivant(debut).isoformat())
+    cursor.execute(f"CREATE TABLE {q(nom)} (LIKE {q(table)} INCLUDING DEFAULTS)")
+    cursor.execute(
+        f"WITH deplacees AS (DELETE FROM {q(table + '_defaut')} WHERE {q(colonne)} >= %s AND {q(colonne)} < %s RETURNING *) "
+        f"INSERT INTO {q(nom)} SELECT * FROM deplacees", bornes
+    )
+    cursor.execute(f"ALTER TABLE {q(table)} ATTACH PARTITION {q(nom)} FOR VALUES FROM (%s) TO (%s)", bornes)
+    return True
+
+
+def creer_partitions_a_venir(avance=None, maintenant=None):
+    """Partitions du mois courant et des `avance` mois suivants, pour chaque table d'audit"""
+    if connection.vendor != 'postgresql':
+        return []
+    avance = getattr(settings, 'AUDIT_PARTITIONS_AVANCE', 3) if avance is None else avance
+    debut = debut_mois(maintenant or datetime.now(tz.utc))
+    creees = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for modele in TABLES_PARTITIONNEES:
+            table, colonne = _table_et_colonne(modele)
+            if not est_partitionnee(cursor, table):
+                continue
+            for n in range(avance + 1):
+                if creer_partition(cursor, table, colonne, mois_suivant(debut, n)):
+                    creees.append(nom_partition(table, mois_suivant(debut, n)))
+    return creees
+
+
+def _renommer_sequence(cursor, table):
+    """La séquence de id reprend le nom de celle de l'ancienne table, supprimée avec elle"""
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    if sequence.split('.')[-1] != f"{table}_id_seq":
+        cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {connection.ops.quote_name(table + '_id_seq')}")
+
+
+def partitionner(schema_editor, table, colonne, avance=3):
+    """
+    Convertit une table existante en table partitionnée par mois (migration) :
+    nouvelle table partitionnée, une partition par mois depuis la plus ancienne
+    ligne jusqu'à `avance` mois après le mois courant, copie des lignes, puis
+    index et clés étrangères recréés sous leurs noms d'origine.
+    """
+    q = schema_editor.quote_name
+    ancienne = f"{table}_avant_partition"
+    with schema_editor.connection.cursor() as cursor:
+        if est_partitionnee(cursor, table):
+            return
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s", [table, f"{table}_pkey"]
+        )
+        index = [definition for definition, in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table]
+        )
+        cles_etrangeres = cursor.fetchall()
+        cursor.execute(f"SELECT min({q(colonne)}) FROM {q(table)}")
+        plus_ancienne = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {q(table)} RENAME TO {q(ancienne)}")
+        cursor.execute(
+            f"CREATE TABLE {q(table)} (LIKE {q(ancienne)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE ({q(colonne)})"
+        )
+        cursor.execute(f"CREATE TABLE {q(table + '_defaut')} PARTITION OF {q(table)} DEFAULT")
+        debut = debut_mois(plus_ancienne or datetime.now(tz.utc))
+        fin = mois_suivant(debut_mois(datetime.now(tz.utc)), avance)
+        while debut <= fin:
+            creer_partition(cursor, table, colonne, debut)
+            debut = mois_suivant(debut)
+
+        cursor.execute(f"INSERT INTO {q(table)} SELECT * FROM {q(ancienne)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) FROM {q(table)}", [table]
+        )
+        cursor.execute(f"DROP TABLE {q(ancienne)}")
+        _renommer_sequence(cursor, table)
+        cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(table + '_pkey')} PRIMARY KEY (id, {q(colonne)})")
+        for definition in index:
+            cursor.execute(definition)
+        for nom, definition in cles_etrangeres:
+            cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(nom)} {definition}")
+    logger.info(f"Table {table} partitionnée par mois sur {colonne}")
+
+
+def departitionner(schema_editor, table):
+    """Inverse de partitionner : retour à une table simple de clé primaire id"""
+    q = schema_editor.quote_name
+    ancienne = f"{table}_partitionnee"
+    with schema_editor.connection.cursor() as cursor:
+        if not est_partitionnee(cursor, table):
+            return
+        cursor.execute("SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s", [table, f"{table}_pkey"])
+        index = [definition for definition, in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table]
+        )
+        cles_etrangeres = cursor.fetchall()
+        cursor.execute(f"ALTER TABLE {q(table)} RENAME TO {q(ancienne)}")
+        cursor.execute(f"CREATE TABLE {q(table)} (LIKE {q(ancienne)} INCLUDING DEFAULTS INCLUDING IDENTITY)")
+        cursor.execute(f"INSERT INTO {q(table)} SELECT * FROM {q(ancienne)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) FROM {q(table)}", [table]
+        )
+        cursor.execute(f"DROP TABLE {q(ancienne)}")
+        _renommer_sequence(cursor, table)
+        cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(table + '_pkey')} PRIMARY KEY (id)")
+        for definition in index:
+            cursor.execute(definition)
+        for nom, definition in cles_etrangeres:
+            cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(nom)} {definition}")
+
+
+# ===================== ARCHIVAGE =====================
+
+def _ecrire_archive(chemin, ecrire):
+    """Écrit l'archive sous un nom temporaire puis la renomme une fois sur disque"""
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    temporaire = chemin + '.tmp'
+    with open(temporaire, 'wb') as fichier:
+        with gzip.GzipFile(fileobj=fichier, mode='wb') as compresse:
+            ecrire(compresse)
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(temporaire, chemin)
+
+
+def _archiver_partition(cursor, table, nom, repertoire):
+    q = connection.ops.quote_name
+    chemin = os.path.join(repertoire, table, f"{nom}.csv.gz")
+    _ecrire_archive(chemin, lambda sortie: cursor.copy_expert(
+        f"COPY (SELECT * FROM {q(nom)} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)", sortie
+    ))
+    cursor.execute(f"ALTER TABLE {q(table)} DETACH PARTITION {q(nom)}")
+    cursor.execute(f"DROP TABLE {q(nom)}")
+    return chemin
+
+
+def _archiver_lignes(modele, colonne_champ, debut, repertoire, horodatage):
+    """
+    Archive puis supprime les lignes d'un mois restées hors partition mensuelle
+    (partition par défaut sur PostgreSQL, table simple sur SQLite)
+    """
+    table = modele._meta.db_table
+    fin = mois_suivant(debut)
+    lignes = modele.objects.filter(**{f'{colonne_champ}__gte': debut, f'{colonne_champ}__lt': fin})
+    # Les lignes insérées pendant l'archivage (id plus grand) restent pour la prochaine fois
+    dernier_id = lignes.order_by('-id').values_list('id', flat=True).first()
+    if dernier_id is None:
+        return None
+    lignes = lignes.filter(id__lte=dernier_id)
+    chemin = os.path.join(repertoire, table, f"{nom_partition(table, debut)}_{horodatage}.csv.gz")
+
+    if connection.vendor == 'postgresql':
+        def ecrire(sortie):
+            requete, parametres = lignes.order_by('id').query.sql_with_params()
+            with connection.cursor() as cursor:
+                requete = cursor.mogrify(requete, parametres).decode()
+                cursor.copy_expert(f"COPY ({requete}) TO STDOUT WITH (FORMAT csv, HEADER)", sortie)
+    else:
+        def ecrire(sortie):
+            texte = io.TextIOWrapper(sortie, encoding='utf-8', newline='')
+            champs = modele._meta.concrete_fields
+            ecrivain = csv.writer(texte)
+            ecrivain.writerow([champ.column for champ in champs])
+            for ligne in lignes.order_by('id').values_list(*[champ.attname for champ in champs]).iterator(chunk_size=2000):
+                ecrivain.writerow([json.dumps(v) if isinstance(v, (dict, list)) else v for v in ligne])
+            texte.detach()
+
+    _ecrire_archive(chemin, ecrire)
+    lignes.delete()
+    return chemin
+
+
+def archiver(retention_mois=None, repertoire=None, simulation=False, maintenant=None):
+    """
+    Archive les mois antérieurs aux `retention_mois` derniers mois (mois courant
+    compris) de chaque table d'audit. Renvoie les fichiers écrits, ou en
+    simulation les partitions et mois qui seraient archivés.
+    """
+    retention_mois = getattr(settings, 'AUDIT_RETENTION_MOIS', 12) if retention_mois is None else retention_mois
+    repertoire = repertoire or getattr(settings, 'AUDIT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archives_audit'))
+    limite = mois_suivant(debut_mois(maintenant or datetime.now(tz.utc)), 1 - retention_mois)
+    horodatage = datetime.now(tz.utc).strftime('%Y%m%d%H%M%S')
+    archives = []
+
+    for modele, champ in TABLES_PARTITIONNEES.items():
+        table, _ = _table_et_colonne(modele)
+        archivees = Q(**{f'{champ}__lt': limite})
+        if not simulation and modele.objects.filter(archivees).exists():
+            # Avant toute suppression : la chaîne d'empreintes reprend après les lignes archivées
+            noter_archivage(modele, archivees)
+        anciennes = []
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                anciennes = [nom for nom, debut in partitions(cursor, table) if debut < limite] \
+                    if est_partitionnee(cursor, table) else []
+            for nom in anciennes:
+                if simulation:
+                    archives.append(nom)
+                    continue
+                # Une partition par transaction : un échec n'annule pas les mois déjà archivés
+                with transaction.atomic(), connection.cursor() as cursor:
+                    archives.append(_archiver_partition(cursor, table, nom, repertoire))
+                logger.info(f"Partition {nom} archivée")
+
+        for debut in modele.objects.filter(archivees).datetimes(champ, 'month', tzinfo=tz.utc):
+            if simulation:
+                if nom_partition(table, debut) not in anciennes:
+                    archives.append(nom_partition(table, debut))
+                continue
+            with transaction.atomic():
+                chemin = _archiver_lignes(modele, champ, debut, repertoire, horodatage)
+            if chemin:
+                archives.append(chemin)
+                logger.info(f"Lignes de {table} du mois {debut:%Y-%m} archivées dans {chemin}")
+    return archives
@@ -0,0 +1,268 @@
+"""
+Service de rendu PDF commun aux exports
+Feuille de styles, styles de tableaux et gabarits de page sont construits une
+seule fois par processus à l'import du module ; chaque document ne fait plus
+que remplir un gabarit avec ses lignes (render_table) ou dessiner sur un canvas.
+Toute la mise en page des exports PDF est regroupée ici.
+"""
+
+import itertools
+import logging
+from io import BytesIO
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, letter, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import getFont
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+
+logger = logging.getLogger(__name__)
+
+# Polices utilisées par les exports : leurs métriques sont chargées dès
+# l'import plutôt qu'au premier document rendu
+POLICES = ['Helvetica', 'Helvetica-Bold']
+for _police in POLICES:
+    getFont(_police)
+
+STYLES = getSampleStyleSheet()
+
+STYLE_TABLEAU_PATIENTS = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.lightblue),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,0), 12),
+    ('BOTTOMPADDING', (0,0), (-1,0), 8),
+    ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+])
+
+STYLE_TABLEAU_AUDIT = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#003366')),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,0), 12),
+    ('FONTSIZE', (0,1), (-1,-1), 10),
+    ('BOTTOMPADDING', (0,0), (-1,0), 8),
+    ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.lightgrey]),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+])
+
+
+def numero_de_page(canvas_pdf, doc):
+    """Numéro de page en bas à droite"""
+    largeur, _ = doc.pagesize
+    canvas_pdf.setFont('Helvetica', 9)
+    canvas_pdf.drawRightString(largeur - 12, 15, f"Page {canvas_pdf.getPageNumber()}")
+
+
+class Gabarit:
+    """
+    Mise en page d'un document tabulaire : format, titre, en-tête et style du
+    tableau, largeurs de colonnes et nombre de lignes par page
+    """
+
+    def __init__(self, titre, entete, style=STYLE_TABLEAU_PATIENTS, format_page=A4, largeurs=None,
+                 lignes_par_page=35, lignes_premiere_page=None, pied_de_page=None):
+        self.titre = titre
+        self.entete = list(entete)
+        self.style = style
+        self.format_page = format_page
+        self.largeurs = largeurs
+        self.lignes_par_page = lignes_par_page
+        self.lignes_premiere_page = lignes_premiere_page
+        self.pied_de_page = pied_de_page
+
+    def en_tete_document(self, titre=None):
+        return [Paragraph(titre or self.titre, STYLES['Title']), Spacer(1, 12)]
+
+
+# Lignes de patients par page : chaque page est un tableau indépendant
+# (un seul tableau de N lignes est redécoupé à chaque page, en temps quadratique)
+GABARIT_PATIENTS = Gabarit(
+    "Export des patients",
+    ['ID Patient', 'Dossier résumé', 'Dossier date', 'Analyses', 'Résultats', 'Infections', 'Vaccins', 'Données médicales'],
+    lignes_par_page=35,
+)
+
+GABARIT_PATIENT = Gabarit("Export du patient", ['Dossier médical', 'Analyses'])
+
+# Paysage, moins de lignes sur la première page qui porte le titre
+GABARIT_RAPPORT_AUDIT = Gabarit(
+    "Rapport d'Audit des Accès",
+    ['Date', 'Utilisateur', "Type d'accès", 'Données concernées'],
+    style=STYLE_TABLEAU_AUDIT,
+    format_page=landscape(letter),
+    largeurs=[80, 100, 100, 300],
+    lignes_par_page=24,
+    lignes_premiere_page=20,
+    pied_de_page=numero_de_page,
+)
+
+
+class FlowablesAlaDemande(list):
+    """
+    Liste de flowables remplie au fur et à mesure par un générateur :
+    doc.build() consomme la liste par la tête, seuls les prochains éléments
+    sont donc construits et gardés en mémoire.
+    """
+
+    def __init__(self, generateur, reserve=2):
+        super().__init__()
+        self._generateur = iter(generateur)
+        self._reserve = reserve
+
+    def _remplir(self):
+        while self._generateur is not None and list.__len__(self) < self._reserve:
+            try:
+                self.append(next(self._generateur))
+            except StopIteration:
+                self._generateur = None
+
+    def __len__(self):
+        self._remplir()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._remplir()
+        return list.__getitem__(self, index)
+
+
+def tableaux_par_page(lignes, gabarit):
+    """
+    Découpe un itérable de lignes en un tableau par page (en-tête répété),
+    séparés par des sauts de page ; les lignes sont consommées page par page.
+    """
+    lignes = iter(lignes)
+    taille = gabarit.lignes_premiere_page or gabarit.lignes_par_page
+    premiere = True
+    while True:
+        page = list(itertools.islice(lignes, taille))
+        if not page and not premiere:
+            return
+        if not premiere:
+            yield PageBreak()
+        tableau = Table([gabarit.entete] + page, repeatRows=1, colWidths=gabarit.largeurs)
+        tableau.setStyle(gabarit.style)
+        yield tableau
+        if len(page) < taille:
+            return
+        premiere = False
+        taille = gabarit.lignes_par_page
+
+
+def render_table(lignes, gabarit, destination=None, titre=None):
+    """
+    Rend les lignes dans le gabarit : titre puis un tableau par page.
+    Les lignes peuvent venir d'un générateur, elles sont consommées au fil du rendu.
+    Écrit dans destination (fichier ou réponse HTTP), ou renvoie les octets du PDF.
+    """
+    sortie = destination if destination is not None else BytesIO()
+    doc = SimpleDocTemplate(sortie, pagesize=gabarit.format_page)
+    pages = {}
+    if gabarit.pied_de_page:
+        pages = {'onFirstPage': gabarit.pied_de_page, 'onLaterPages': gabarit.pied_de_page}
+    doc.build(FlowablesAlaDemande(itertools.chain(
+        gabarit.en_tete_document(titre),
+        tableaux_par_page(lignes, gabarit)
+    )), **pages)
+    if destination is None:
+        return sortie.getvalue()
+
+
+# ===================== DOCUMENTS DESSINÉS =====================
+
+def document_dossier(instantane):
+    """PDF d'un dossier médical (instantané) : en-tête du dossier puis analyses et résultats"""
+    dossier = instantane['dossier']
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer)
+    y = 800
+    p.drawString(100, y, f"Dossier médical #{dossier['idDossier']}")
+    y -= 20
+    p.drawString(100, y, f"Patient ID: {dossier['patient_id']}")
+    y -= 20
+    p.drawString(100, y, f"Date création: {dossier['dateCreation']}")
+    y -= 20
+    p.drawString(100, y, f"Commentaire: {dossier['commentaireGeneral']}")
+    y -= 40
+    p.drawString(100, y, "Analyses et résultats :")
+    y -= 20
+    if instantane['analyses']:
+        for analyse in instantane['analyses']:
+            p.drawString(120, y, f"Analyse ID: {analyse['idAnalyse']} | Type: {analyse['typeAnalyse']} | Date: {analyse['dateAnalyse']}")
+            y -= 20
+            resultat = analyse['resultat']
+            if resultat is not None:
+                p.drawString(140, y, f"Glycémie: {resultat['glycemie']} | Cholestérol: {resultat['cholesterol']} | Triglycéride: {resultat['triglyceride']}")
+                y -= 20
+                p.drawString(140, y, f"HDL: {resultat['hdl']} | LDL: {resultat['ldl']} | Créatinine: {resultat['creatinine']} | Urée: {resultat['uree']} | Protéinurie: {resultat['proteinurie']}")
+                y -= 30
+            else:
+                p.drawString(140, y, "Aucun résultat d'analyse associé.")
+                y -= 30
+            if y < 100:
+                p.showPage()
+                y = 800
+    else:
+        p.drawString(120, y, "Aucune analyse trouvée pour ce dossier.")
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def document_resultat(resultat):
+    """PDF d'un résultat d'analyse"""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer)
+    p.drawString(100, 800, f"Résultat d'analyse #{resultat.idResultatAnalyse}")
+    p.drawString(100, 780, f"Date analyse: {resultat.analyse.dateAnalyse}")
+    p.drawString(100, 760, f"Température: {getattr(resultat, 'temperature', '-')}")
+    p.drawString(100, 740, f"Pression Systolique: {getattr(resultat, 'pressionSystolique', '-')}")
+    p.drawString(100, 720, f"Pression Diastolique: {getattr(resultat, 'pressionDiastolique', '-')}")
+    p.drawString(100, 700, f"Glycémie: {resultat.glycemie}")
+    p.drawString(100, 680, f"Lymphocytes: {getattr(resultat, 'lymphocytesAbsolus', '-')}")
+    p.drawString(100, 660, f"Neutrophiles: {getattr(resultat, 'neutrophilesAbsolus', '-')}")
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def document_historique(destination, lignes, periode, genere_le):
+    """
+    PDF de l'historique dessiné ligne à ligne, nouvelle page dès que la précédente
+    est pleine ; lignes : (date, utilisateur, type, données) des accès
+    """
+    p = canvas.Canvas(destination, pagesize=letter)
+    width, height = letter
+
+    def entetes(y_position):
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(1*inch, y_position, "Date/Heure")
+        p.drawString(2.5*inch, y_position, "Utilisateur")
+        p.drawString(4*inch, y_position, "Action")
+        p.drawString(5.5*inch, y_position, "Ressource")
+        p.setFont("Helvetica", 8)
+        return y_position - 0.3*inch
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(1*inch, height-1*inch, "Rapport d'Historique - Conformed")
+    p.setFont("Helvetica", 12)
+    p.drawString(1*inch, height-1.5*inch, f"Période: {periode}")
+    p.drawString(1*inch, height-1.7*inch, f"Généré le: {genere_le.strftime('%Y-%m-%d %H:%M:%S')}")
+    y_position = entetes(height - 2.5*inch)
+
+    for date_acces, utilisateur, type_acces, donnees in lignes:
+        if y_position < 1*inch:
+            p.showPage()
+            y_position = entetes(height - 1*inch)
+        p.drawString(1*inch, y_position, date_acces.strftime('%Y-%m-%d %H:%M'))
+        p.drawString(2.5*inch, y_position, utilisateur or 'N/A')
+        p.drawString(4*inch, y_position, type_acces)
+        p.drawString(5.5*inch, y_position, donnees or 'N/A')
+        y_position -= 0.2*inch
+
+    p.showPage()
+    p.save()
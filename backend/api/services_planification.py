@@ -0,0 +1,223 @@
+"""
+Service de planification des exports de masse
+Avant de démarrer, un export est estimé (lignes à produire et durée de rendu) ;
+au-delà du seuil il est mis en file (ExportJob) et rendu en arrière-plan, en
+priorité basse, avec un nombre limité d'exports simultanés par utilisateur et
+au total. La file est en base : n'importe quel processus peut la faire avancer.
+"""
+
+import functools
+import logging
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Patient, Acces, ExportJob
+from .services_export import rendre_patients_pdf, lignes_patients_csv, soumettre_tache, abaisser_priorite
+from .services_audit import flux_historique_csv, rendre_historique_pdf
+
+logger = logging.getLogger(__name__)
+
+# Durée de rendu par ligne en secondes, mesurée sur PostgreSQL
+# (12 000 patients, 20 000 accès)
+COUT_PAR_LIGNE = {
+    ('PATIENTS', 'PDF'): 0.0006,
+    ('PATIENTS', 'CSV'): 0.00035,
+    ('HISTORIQUE', 'PDF'): 0.00011,
+    ('HISTORIQUE', 'CSV'): 0.000015,
+}
+
+CONTENT_TYPES_EXPORT = {
+    'PDF': 'application/pdf',
+    'CSV': 'text/csv',
+}
+
+
+# ===================== ESTIMATION =====================
+
+def compter_lignes(type_export, parametres=None):
+    """Nombre de lignes que produira l'export"""
+    if type_export == 'HISTORIQUE':
+        return Acces.objects.filter(dateAcces__gte=parse_datetime(parametres['date_debut'])).count()
+    return Patient.objects.count()
+
+
+def estimer_export(type_export, format_export, parametres=None):
+    """Lignes à produire et durée de rendu estimée (secondes)"""
+    lignes = compter_lignes(type_export, parametres)
+    return {
+        'lignes': lignes,
+        'cout_estime': round(lignes * COUT_PAR_LIGNE[(type_export, format_export)], 1),
+    }
+
+
+def export_differe(estimation):
+    """Vrai si l'export est trop long pour être rendu pendant la requête"""
+    return estimation['cout_estime'] > getattr(settings, 'EXPORT_SEUIL_SECONDES', 5)
+
+
+# ===================== FILE D'ATTENTE =====================
+
+def creer_export(utilisateur, type_export, format_export, parametres=None, estimation=None):
+    """Met un export en file ; il démarre dès qu'une place se libère"""
+    parametres = parametres or {}
+    estimation = estimation or estimer_export(type_export, format_export, parametres)
+    job = ExportJob.objects.create(
+        utilisateur=utilisateur,
+        type_export=type_export,
+        format=format_export,
+        parametres=parametres,
+        lignes_total=estimation['lignes'],
+        cout_estime=estimation['cout_estime'],
+    )
+    transaction.on_commit(planifier_exports)
+    return job
+
+
+def position_file(job):
+    """Rang de l'export dans la file d'attente (1 = le prochain), None s'il n'attend plus"""
+    if job.statut != 'EN_ATTENTE':
+        return None
+    return ExportJob.objects.filter(statut='EN_ATTENTE').filter(
+        Q(date_creation__lt=job.date_creation) | Q(date_creation=job.date_creation, id__lt=job.id)
+    ).count() + 1
+
+
+def planifier_exports():
+    """
+    Démarre les exports en attente, par ordre d'arrivée, dans la limite des
+    places libres : EXPORT_MAX_SIMULTANES au total, EXPORT_MAX_PAR_UTILISATEUR
+    par utilisateur. Appelée à la création et à la fin de chaque export.
+    Renvoie les identifiants des exports démarrés.
+    """
+    max_simultanes = getattr(settings, 'EXPORT_MAX_SIMULTANES', 2)
+    max_par_utilisateur = getattr(settings, 'EXPORT_MAX_PAR_UTILISATEUR', 1)
+    maintenant = timezone.now()
+    limite = maintenant - timedelta(seconds=getattr(settings, 'EXPORT_DUREE_MAX', 3600))
+
+    with transaction.atomic():
+        # Verrou sur la file : deux planifications simultanées ne donnent pas la même place
+        file = list(ExportJob.objects.select_for_update().filter(
+            statut__in=['EN_ATTENTE', 'EN_COURS']
+        ).order_by('date_creation', 'id').only('id', 'statut', 'utilisateur_id', 'date_debut'))
+
+        # Export dont le processus a disparu : sa place est rendue
+        expires = [job.pk for job in file if job.statut == 'EN_COURS' and job.date_debut and job.date_debut < limite]
+        if expires:
+            logger.warning(f"Exports interrompus (durée maximale dépassée) : {expires}")
+            ExportJob.objects.filter(pk__in=expires).update(
+                statut='ECHEC', message="Export interrompu : durée maximale dépassée", date_fin=maintenant
+            )
+
+        en_cours = [job for job in file if job.statut == 'EN_COURS' and job.pk not in expires]
+        par_utilisateur = Counter(job.utilisateur_id for job in en_cours)
+        places = max_simultanes - len(en_cours)
+        a_lancer = []
+        for job in file:
+            if places <= 0:
+                break
+            if job.statut != 'EN_ATTENTE' or par_utilisateur[job.utilisateur_id] >= max_par_utilisateur:
+                continue
+            par_utilisateur[job.utilisateur_id] += 1
+            places -= 1
+            a_lancer.append(job.pk)
+
+        if a_lancer:
+            ExportJob.objects.filter(pk__in=a_lancer).update(statut='EN_COURS', date_debut=maintenant)
+            transaction.on_commit(lambda: [_lancer_export(job_id) for job_id in a_lancer])
+    return a_lancer
+
+
+def _lancer_export(job_id):
+    soumettre_tache(executer_export, job_id).add_done_callback(functools.partial(_export_termine, job_id))
+
+
+def _export_termine(job_id, future):
+    """Fin d'un rendu (thread du pool) : la place libérée est donnée au suivant"""
+    try:
+        if future.exception() is not None:
+            # Processus du pool mort pendant le rendu
+            ExportJob.objects.filter(pk=job_id, statut='EN_COURS').update(
+                statut='ECHEC', message=f"Erreur lors de l'exportation : {future.exception()}", date_fin=timezone.now()
+            )
+        planifier_exports()
+    except Exception as e:
+        logger.error(f"Planification des exports impossible : {e}")
+    finally:
+        connection.close()
+
+
+# ===================== RENDU =====================
+
+def _rendre_patients_pdf(job, sortie, publier):
+    return rendre_patients_pdf(sortie, rappel_progression=publier)
+
+
+def _rendre_patients_csv(job, sortie, publier):
+    nb_patients = 0
+
+    def compter(n):
+        nonlocal nb_patients
+        nb_patients = n
+        publier(n)
+
+    for morceau in lignes_patients_csv(rappel_progression=compter):
+        sortie.write(morceau.encode('utf-8'))
+    return nb_patients
+
+
+def _rendre_historique_csv(job, sortie, publier):
+    for morceau in flux_historique_csv(parse_datetime(job.parametres['date_debut'])):
+        sortie.write(morceau.encode('utf-8'))
+
+
+def _rendre_historique_pdf(job, sortie, publier):
+    rendre_historique_pdf(sortie, parse_datetime(job.parametres['date_debut']), job.parametres['periode'], job.date_creation)
+
+
+RENDUS_EXPORT = {
+    ('PATIENTS', 'PDF'): _rendre_patients_pdf,
+    ('PATIENTS', 'CSV'): _rendre_patients_csv,
+    ('HISTORIQUE', 'CSV'): _rendre_historique_csv,
+    ('HISTORIQUE', 'PDF'): _rendre_historique_pdf,
+}
+
+
+def executer_export(job_id):
+    """Rend un ExportJob dans un processus du pool puis enregistre le fichier"""
+    abaisser_priorite()
+    try:
+        job = ExportJob.objects.get(pk=job_id)
+
+        def publier(lignes_traitees):
+            ExportJob.objects.filter(pk=job_id).update(lignes_traitees=lignes_traitees)
+
+        # Fichier temporaire sur disque : la mémoire ne dépend pas de la taille de l'export
+        with tempfile.TemporaryFile() as sortie:
+            nb_lignes = RENDUS_EXPORT[(job.type_export, job.format)](job, sortie, publier)
+            sortie.seek(0)
+            job.fichier.save(f"{job.type_export.lower()}_{job_id}.{job.format.lower()}", File(sortie), save=False)
+
+        if nb_lignes is not None:
+            job.lignes_total = nb_lignes
+        job.statut = 'TERMINE'
+        job.lignes_traitees = job.lignes_total
+        job.message = "Export terminé"
+        job.date_fin = timezone.now()
+        job.save()
+        logger.info(f"ExportJob #{job_id} terminé : {job.lignes_total} lignes")
+
+    except Exception as e:
+        logger.error(f"ExportJob #{job_id} en échec : {e}")
+        ExportJob.objects.filter(pk=job_id).update(
+            statut='ECHEC',
+            message=f"Erreur lors de l'exportation : {str(e)}",
+            date_fin=timezone.now()
+        )
+    finally:
+        connection.close()
@@ -0,0 +1,106 @@
+"""
+Index en mémoire des règles de conformité actives
+Les règles et leurs seuils changent rarement : ils sont compilés une fois par
+processus en un dictionnaire type d'accès -> règle, consulté sans requête SQL
+à chaque accès journalisé. Toute modification d'une règle ou d'un paramètre
+incrémente un numéro de version dans le cache partagé ; chaque processus le
+relit au plus toutes les REGLES_VERIFICATION_SECONDES et recompile son index
+s'il a changé.
+"""
+
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .models import RegleConformite, ParametreConformite
+
+logger = logging.getLogger(__name__)
+
+CLE_VERSION_REGLES = 'regles_conformite_version'
+
+
+class RegleCompilee:
+    """Règle active et seuils de son premier paramètre"""
+
+    __slots__ = ('regle_id', 'nom', 'seuil_min', 'seuil_max')
+
+    def __init__(self, regle_id, nom, seuil_min=None, seuil_max=None):
+        self.regle_id = regle_id
+        self.nom = nom
+        self.seuil_min = seuil_min
+        self.seuil_max = seuil_max
+
+    def declenche(self, extra=None):
+        """Vrai si l'événement doit déclencher une alerte (valeur sous le seuil minimal exceptée)"""
+        if self.seuil_min is not None and extra and 'valeur' in extra:
+            return extra['valeur'] >= self.seuil_min
+        return True
+
+
+def compiler_regles():
+    """
+    Index des règles actives par type d'accès (en minuscules), en deux requêtes.
+    Comme le filtre nomRegle__iexact(...).first(), la règle de plus petit
+    identifiant l'emporte, et de même pour son paramètre.
+    """
+    seuils = {}
+    for regle_id, seuil_min, seuil_max in ParametreConformite.objects.filter(
+        regle__isnull=False
+    ).order_by('pk').values_list('regle_id', 'seuilMin', 'seuilMax'):
+        seuils.setdefault(regle_id, (seuil_min, seuil_max))
+
+    index = {}
+    for regle_id, nom in RegleConformite.objects.filter(is_active=True).order_by('pk').values_list('pk', 'nomRegle'):
+        if nom.lower() not in index:
+            index[nom.lower()] = RegleCompilee(regle_id, nom, *seuils.get(regle_id, (None, None)))
+    return index
+
+
+def version_regles():
+    return cache.get(CLE_VERSION_REGLES, 0)
+
+
+class IndexRegles:
+    """Index des règles du processus, recompilé quand la version partagée change"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._index = None
+        self._version = None
+        self._prochaine_verification = 0
+
+    def regle(self, type_acces):
+        """Règle active pour ce type d'accès, ou None"""
+        maintenant = time.monotonic()
+        if self._index is None or maintenant >= self._prochaine_verification:
+            self._actualiser(maintenant)
+        return self._index.get(type_acces.lower())
+
+    def _actualiser(self, maintenant):
+        with self._verrou:
+            version = version_regles()
+            if self._index is None or version != self._version:
+                self._index = compiler_regles()
+                self._version = version
+                logger.info(f"Règles de conformité compilées : {len(self._index)} règles actives (version {version})")
+            self._prochaine_verification = maintenant + getattr(settings, 'REGLES_VERIFICATION_SECONDES', 1)
+
+    def invalider(self):
+        """Force la recompilation au prochain accès"""
+        with self._verrou:
+            self._index = None
+
+
+index_regles = IndexRegles()
+
+
+def invalider_regles():
+    """Nouvelle version des règles : ce processus et les autres recompilent leur index"""
+    try:
+        cache.incr(CLE_VERSION_REGLES)
+    except ValueError:
+        # Première modification (ou clé expulsée du cache)
+        if not cache.add(CLE_VERSION_REGLES, 1, timeout=None):
+            cache.incr(CLE_VERSION_REGLES)
+    index_regles.invalider()
@@ -0,0 +1,49 @@
+"""
+Signaux de l'application : traces de suppression (tombstones) des données
+médicales, reprises par l'export incrémental, invalidation de l'index des
+règles de conformité et compteurs horaires des accès
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from .models import (
+    Patient, DossierMedical, Analyse, ResultatAnalyse, Suppression, RegleConformite, ParametreConformite, Acces
+)
+from .services_activite import incrementer_activite
+from .services_regles import invalider_regles
+
+# Modèle suivi -> nom d'entité dans l'export incrémental
+ENTITES_SUIVIES = {
+    Patient: 'patients',
+    DossierMedical: 'dossiers',
+    Analyse: 'analyses',
+    ResultatAnalyse: 'resultats',
+}
+
+
+def enregistrer_suppression(sender, instance, **kwargs):
+    """Écrit la trace dans la transaction de la suppression (y compris les suppressions en cascade)"""
+    Suppression.objects.create(entite=ENTITES_SUIVIES[sender], objet_id=instance.pk)
+
+
+for modele in ENTITES_SUIVIES:
+    post_delete.connect(enregistrer_suppression, sender=modele, dispatch_uid=f'suppression_{modele.__name__}')
+
+
+def regles_modifiees(sender, instance, **kwargs):
+    """Après validation seulement : un autre processus ne recompile pas l'ancien état"""
+    transaction.on_commit(invalider_regles)
+
+
+for modele in (RegleConformite, ParametreConformite):
+    post_save.connect(regles_modifiees, sender=modele, dispatch_uid=f'regles_save_{modele.__name__}')
+    post_delete.connect(regles_modifiees, sender=modele, dispatch_uid=f'regles_delete_{modele.__name__}')
+
+
+def acces_enregistre(sender, instance, created, **kwargs):
+    """Accès écrit par save() (shell, script) ; ecrire_acces compte lui-même les accès qu'il écrit"""
+    if created:
+        incrementer_activite([instance])
+
+
+post_save.connect(acces_enregistre, sender=Acces, dispatch_uid='activite_acces')
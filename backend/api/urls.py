@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
-from .views import ImportCSVView, tester_detection_seuils, mes_patients, export_patients_pdf, export_patient_pdf, export_patients_csv, export_patient_csv, ForgotPasswordVerifyView, ForgotPasswordResetView, VerifyUsernameEmailView, SimplePasswordResetWithTokenView, VerifyUsernameView
+from .views import ImportCSVView, ValidationCSVView, tester_detection_seuils, mes_patients, export_patients_pdf, export_patient_pdf, export_patients_csv, export_patient_csv, ForgotPasswordVerifyView, ForgotPasswordResetView, VerifyUsernameEmailView, SimplePasswordResetWithTokenView, VerifyUsernameView
 from . import views_conformite
 
 router = DefaultRouter()
@@ -82,6 +82,11 @@ urlpatterns = [
     
     # URLs des autres modèles
     path('import-csv/', ImportCSVView.as_view(), name='import_csv'),  
+    path('import-csv/validation/', ValidationCSVView.as_view(), name='import_csv_validation'),
+    path('import-jobs/<int:job_id>/', views.import_job_status, name='import-job-status'),
+    path('import-jobs/<int:job_id>/reprendre/', views.reprendre_import_job, name='import-job-reprendre'),
+    path('export-jobs/<int:job_id>/', views.export_job_status, name='export-job-status'),
+    path('export-jobs/<int:job_id>/telecharger/', views.telecharger_export_job, name='export-job-telecharger'),
 
     # Statistiques par maladie
     path('stats/patients-par-maladie/', views.patients_par_maladie, name='patients_par_maladie'),
@@ -95,6 +100,7 @@ urlpatterns = [
     path('alertes/tester-detection-seuils/', tester_detection_seuils, name='tester-detection-seuils'),
     path('export/dossier-medical/<int:dossier_id>/', views.ExportDossierMedicalView.as_view(), name='export-dossier-medical'),
     path('export/resultats-analyse/<int:analyse_id>/', views.ExportResultatsAnalyseView.as_view(), name='export-resultats-analyse'),
+    path('export/dossier-medical-json/<int:dossier_id>/', views.ExportDossierMedicalJSONView.as_view(), name='export-dossier-medical-json'),
     path('export/dossier-medical-pdf/<int:dossier_id>/', views.ExportDossierMedicalPDFView.as_view(), name='export-dossier-medical-pdf'),
     path('export/resultats-analyse-pdf/<int:analyse_id>/', views.ExportResultatsAnalysePDFView.as_view(), name='export-resultats-analyse-pdf'),
     path('rapport-audit/', views.rapport_audit, name='rapport-audit'),
@@ -115,5 +121,8 @@ urlpatterns += [
     path('export-patients-pdf/', export_patients_pdf, name='export-patients-pdf'),
     path('export-patient-pdf/<int:patient_id>/', export_patient_pdf, name='export-patient-pdf'),
     path('export-patient-csv/<int:patient_id>/', export_patient_csv, name='export-patient-csv'),
+    path('export-patients-lot/', views.export_patients_lot, name='export-patients-lot'),
     path('export-patients-csv/', export_patients_csv, name='export-patients-csv'),
+    path('export-patients-parquet/', views.export_patients_parquet, name='export-patients-parquet'),
+    path('export-delta/', views.export_delta, name='export-delta'),
 ] 
\ No newline at end of file
@@ -1,6 +1,8 @@
 from .models import Acces
+from django.conf import settings
 from django.utils import timezone
 from .services import verifier_et_declencher_alerte
+from .services_journal import ecrire_acces, journal_audit
 def log_audit(user, type_acces, donnees_concernees, regle=None, statut=None):
     """
     Enregistre un accès (audit) dans la table Acces.
@@ -9,15 +11,20 @@ def log_audit(user, type_acces, donnees_concernees, regle=None, statut=None):
     - donnees_concernees : description courte (ex: 'Dossier #42')
     - regle : instance de RegleConformite (optionnel)
     - statut : 'SUCCES', 'REFUSE', etc. (optionnel, ignoré car non supporté par le modèle)
+    Avec AUDIT_TAMPON, l'accès est mis en file et enregistré par lots en arrière-plan
+    (les règles d'alerte sont alors vérifiées au moment de l'enregistrement).
     """
-    Acces.objects.create(
+    if getattr(settings, 'AUDIT_TAMPON', True):
+        journal_audit().enregistrer(user, type_acces, donnees_concernees, regle)
+        return
+    ecrire_acces([Acces(
         dateAcces=timezone.now(),
         utilisateur=user,
         typeAcces=type_acces,
         donnees_concernees=donnees_concernees,
         regle=regle
         # statut=statut  # <-- supprimé car non supporté par le modèle
-    )
+    )])
     # Déclenche une alerte si la règle le demande
     verifier_et_declencher_alerte(type_acces, user, donnees_concernees)
 class AuditAccessMixin:
@@ -1,7 +1,7 @@
 from django.shortcuts import render
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
@@ -21,49 +21,55 @@ from .models import (
     Patient, Profession, Logement, Residence, Comportement, Utilisateur,
     DossierMedical, Rapport, Vaccin, Infection, RegleConformite,
     ParametreConformite, Alerte, Analyse, ResultatAnalyse, Alimentation, Acces,
-    DemandeExportation
+    DemandeExportation, ImportJob, ExportJob
 )
 from .serializers import (
     PatientSerializer, ProfessionSerializer, LogementSerializer, ResidenceSerializer, ComportementSerializer,
     DossierMedicalSerializer, RapportSerializer, VaccinSerializer, InfectionSerializer, RegleConformiteSerializer,
     ParametreConformiteSerializer, AlerteSerializer, AnalyseSerializer, ResultatAnalyseSerializer, AlimentationSerializer, AccesSerializer,
     UserSerializer, LoginSerializer, UserCreateSerializer, UserUpdateSerializer,
-    DemandeExportationSerializer, DemandeExportationCreateSerializer, DemandeExportationTraitementSerializer
+    DemandeExportationSerializer, DemandeExportationCreateSerializer, DemandeExportationTraitementSerializer,
+    ImportJobSerializer, ExportJobSerializer
 )
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db.models import Count
 from rest_framework.permissions import IsAuthenticated
 from .services import DetectionSeuilsService, AuditTrailService
+from .services_export import (
+    lignes_patients_csv, rendre_patients_pdf, reponse_export_cache,
+    rendre_patient_pdf, rendre_dossier_pdf, rendre_resultat_pdf, version_patient, version_dossier, version_resultat,
+    parquet_disponible, exporter_jeu_recherche, COMPRESSIONS_PARQUET, flux_delta,
+    rendre_patient_csv, flux_lot_patients, FORMATS_LOT, MAX_PATIENTS_LOT,
+    instantane_dossier, reponse_instantane
+)
+from .services_audit import (
+    flux_rapport_audit_json, flux_rapport_audit_csv, rendre_rapport_audit_pdf,
+    flux_historique_csv, rendre_historique_pdf
+)
+from .services_planification import estimer_export, export_differe, creer_export, position_file, CONTENT_TYPES_EXPORT
+from .services_activite import statistiques_activite
 from .utils import log_audit, AuditAccessMixin
+from .services_journal import ecrire_acces
 from .models import DossierMedical, ResultatAnalyse
 import csv
-from reportlab.pdfgen import canvas
 from django.http import JsonResponse
 from .models import Acces
 from .serializers import AccesSerializer
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from io import BytesIO
 from django.shortcuts import get_object_or_404
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
 import csv
 from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
 from .serializers import ForgotPasswordVerifySerializer, ForgotPasswordResetSerializer
 from django.core.cache import cache
 from django.utils.crypto import get_random_string
 from django.utils import timezone
 from datetime import timedelta
+import tempfile
 import uuid
 from django.conf import settings
 from rest_framework.permissions import AllowAny
@@ -71,6 +77,10 @@ from django.contrib.auth import get_user_model
 import logging
 from rest_framework import serializers
 from .services import ConformiteAlertService
+from .services_import import (
+    ImportateurCSV, detecter_encodage, lire_csv_par_morceaux, point_de_reprise, soumettre_import,
+    relancer_import, progression_import, valider_csv
+)
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
@@ -262,6 +272,10 @@ class AccesViewSet(viewsets.ModelViewSet):
     queryset = Acces.objects.all().select_related('utilisateur', 'regle').order_by('-dateAcces')
     serializer_class = AccesSerializer
 
+    def perform_create(self, serializer):
+        # Écrit comme les autres accès : compté et chaîné (voir services_journal.ecrire_acces)
+        serializer.instance, = ecrire_acces([Acces(**serializer.validated_data)])
+
     def list(self, request, *args, **kwargs):
         acces = self.get_queryset()
         data = [
@@ -423,280 +437,8 @@ class ImportCSVView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
-    def clean_value(self, value):
-        """Nettoie une valeur (NaN, espaces, etc.)"""
-        if pd.isna(value) or value == '' or str(value).strip() == '':
-            return None
-        return str(value).strip()
-
-    def safe_float(self, value):
-        """Convertit en float de manière sécurisée"""
-        if pd.isna(value) or value == '':
-            return None
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return None
-
-    def safe_int(self, value):
-        """Convertit en int de manière sécurisée"""
-        if pd.isna(value) or value == '':
-            return None
-        try:
-            return int(float(value))
-        except (ValueError, TypeError):
-            return None
-
-    def safe_bool(self, value):
-        """Convertit en bool de manière sécurisée"""
-        if pd.isna(value) or value == '':
-            return None
-        if isinstance(value, bool):
-            return value
-        if isinstance(value, str):
-            value = value.lower().strip()
-            return value in ['true', '1', 'yes', 'oui', 'vrai']
-        if isinstance(value, (int, float)):
-            return bool(value)
-        return None
-
-    def get_or_create_profession(self, row):
-        """Crée ou récupère une profession"""
-        nom_profession = self.clean_value(row.get('Job', ''))
-        logger.info(f"    Job: '{row.get('Job', 'N/A')}' -> nom_profession: '{nom_profession}'")
-        if not nom_profession:
-            logger.info(f"    ✗ Pas de profession, retourne None")
-            return None
-        
-        try:
-            profession, created = Profession.objects.get_or_create(
-                nomProfession=nom_profession,
-                defaults={
-                    'typeProfession': self.clean_value(row.get('Job_type', '')),
-                    'environnementTravail': self.clean_value(row.get('Working_Env', '')),
-                    'travailleDehors': self.clean_value(row.get('Outdoor_Work_type', '')),
-                    'travailleSansEmploi': self.clean_value(row.get('Occup_if_jobless', '')),
-                    'situationSansEmploi': self.clean_value(row.get('Occup_if_jobless', '')),
-                    'revenu': self.clean_value(row.get('Incomes', '')),
-                    'freqRevenu': self.clean_value(row.get('Freq_Incomes', ''))
-                }
-            )
-            logger.info(f"    ✓ Profession créée/récupérée: {profession} (créé: {created})")
-            return profession
-        except Exception as e:
-            logger.info(f"    ✗ Erreur création profession: {e}")
-            return None
-
-    def get_or_create_residence(self, row):
-        """Crée ou récupère une résidence"""
-        pays = self.clean_value(row.get('Place_birth', ''))
-        logger.info(f"    Place_birth: '{row.get('Place_birth', 'N/A')}' -> pays: '{pays}'")
-        if not pays:
-            logger.info(f"    ✗ Pas de pays, retourne None")
-            return None
-        
-        residence, created = Residence.objects.get_or_create(
-            pays=pays,
-            defaults={
-                'ville': self.clean_value(row.get('Current_resid', '')),
-                'quartier': self.clean_value(row.get('Current_resid', '')),
-                'adresseComplete': f"{self.clean_value(row.get('Current_resid', ''))}, {pays}"
-            }
-        )
-        return residence
-
-    def get_or_create_logement(self, row):
-        """Crée ou récupère un logement"""
-        type_logement = self.clean_value(row.get('Housing_type', ''))
-        if not type_logement:
-            return None
-        
-        logement, created = Logement.objects.get_or_create(
-            typeLogement=type_logement,
-            defaults={
-                'nombrePersonnesFoyer': self.safe_int(row.get('Nr_people_house', 0)) or 1,
-                'nbMursMaisonCouverts': self.safe_int(row.get('Wall_Covered', 0)) or 0,
-                'nbSolsMaisonCouverts': self.safe_int(row.get('House_Ground_Covered', 0)) or 0,
-                'nbToilettesMaison': self.safe_int(row.get('Toilet_Location', 0)) or 0,
-                'toilettesInterieures': self.safe_bool(row.get('Toilet_Location', '')) or False
-            }
-        )
-        return logement
-
-    def get_or_create_comportement(self, row):
-        """Crée ou récupère un comportement"""
-        lieu_repas = self.clean_value(row.get('Eating_Location', ''))
-        if not lieu_repas:
-            return None
-        
-        comportement, created = Comportement.objects.get_or_create(
-            lieuRepas=lieu_repas,
-            defaults={
-                'mangeAvecLesMains': self.clean_value(row.get('Eating_Man', '')),
-                'laveLesMainsAvantDeManger': self.clean_value(row.get('Wash_Hand_When_Eating', '')),
-                'utiliseDuSavon': self.clean_value(row.get('Soab_Wash_Hand', '')),
-                'laveLesMainsDesEnfants': self.clean_value(row.get('Wash_Hand_Child', '')),
-                'utiliseGelHydroalcoolique': self.clean_value(row.get('Hand_Antisep_Use', ''))
-            }
-        )
-        return comportement
-
-    def get_or_create_alimentation(self, row):
-        """Crée ou récupère une alimentation"""
-        type_repas = self.clean_value(row.get('Eating_way', ''))
-        if not type_repas:
-            return None
-        
-        alimentation, created = Alimentation.objects.get_or_create(
-            typeRepas=type_repas
-        )
-        return alimentation
-
-    def create_patient(self, row, profession, residence, logement, comportement, alimentation):
-        """Crée un patient"""
-        id_code = self.clean_value(row.get('ID', ''))
-        logger.info(f"  ID_CODE: '{id_code}' (type: {type(id_code)})")
-        if id_code is None or id_code == '':
-            logger.info(f"  ✗ ID_CODE vide, patient ignoré")
-            return None
-        
-        # Vérifier si le patient existe déjà
-        if Patient.objects.filter(id_code=id_code).exists():
-            return Patient.objects.get(id_code=id_code)
-        
-        # Convertir le sexe
-        sexe_value = self.clean_value(row.get('Sex', ''))
-        sexe = None
-        if sexe_value:
-            sexe = sexe_value.lower() in ['m', 'male', '1', 'homme']
-        
-        patient = Patient.objects.create(
-            id_code=id_code,
-            sexe=sexe,
-            poids=self.safe_float(row.get('weight', 0)),
-            taille=self.safe_float(row.get('height', 0)),
-            lieuNaissance=self.clean_value(row.get('Place_birth', '')),
-            niveauEtude=self.clean_value(row.get('Edu_Level', '')),
-            profession=profession,
-            comportement=comportement,
-            logement=logement,
-            alimentation=alimentation,
-            residence=residence
-        )
-        return patient
-
-    def create_dossier_medical(self, patient, row):
-        """Crée un dossier médical"""
-        dossier, created = DossierMedical.objects.get_or_create(
-            patient=patient,
-            defaults={
-                'dateCreation': timezone.now().date(),
-                'commentaireGeneral': f"Dossier créé automatiquement pour le patient {patient.id_code}"
-            }
-        )
-        return dossier
-
-    def create_analyse(self, dossier, row):
-        """Crée une analyse"""
-        analyse, created = Analyse.objects.get_or_create(
-            dossier=dossier,
-            defaults={
-                'typeAnalyse': 'Analyse générale',
-                'dateAnalyse': timezone.now().date()
-            }
-        )
-        return analyse
-
-    def create_resultat_analyse(self, analyse, row):
-        """Crée un résultat d'analyse"""
-        # Vérifier si des données d'analyse existent
-        glycemie = self.safe_float(row.get('Gluc_mM_L'))
-        if glycemie is None:
-            return None
-        
-        resultat, created = ResultatAnalyse.objects.get_or_create(
-            analyse=analyse,
-            defaults={
-                'glycemie': glycemie,
-                'cholesterol': self.safe_float(row.get('Cholesterol', 0)) or 0,
-                'triglyceride': self.safe_float(row.get('Triglyceride', 0)) or 0,
-                'hdl': self.safe_float(row.get('HDL', 0)) or 0,
-                'ldl': self.safe_float(row.get('LDL', 0)) or 0,
-                'creatinine': self.safe_float(row.get('Creatinine', 0)) or 0,
-                'uree': self.safe_float(row.get('Uree', 0)) or 0,
-                'proteinurie': self.safe_float(row.get('Proteinurie', 0)) or 0
-            }
-        )
-        return resultat
-
-    def create_alerte(self, dossier, row):
-        """Crée une alerte si nécessaire"""
-        alertes = []
-        
-        # Alerte pour diabète
-        if self.clean_value(row.get('Diabetes', '')):
-            alerte, created = Alerte.objects.get_or_create(
-                dossier=dossier,
-                typeAlerte='Diabète',
-                defaults={
-                    'message': 'Patient diagnostiqué avec diabète',
-                    'dateAlerte': timezone.now().date()
-                }
-            )
-            alertes.append(alerte)
-        
-        # Alerte pour hypertension
-        ap_sys = self.safe_float(row.get('AP_Sys_mmHg'))
-        if ap_sys and ap_sys > 140:
-            alerte, created = Alerte.objects.get_or_create(
-                dossier=dossier,
-                typeAlerte='Hypertension',
-                defaults={
-                    'message': f'Pression artérielle élevée: {ap_sys} mmHg',
-                    'dateAlerte': timezone.now().date()
-                }
-            )
-            alertes.append(alerte)
-        
-        return alertes
-
-    def create_vaccin(self, dossier, row):
-        """Crée un vaccin"""
-        vaccin_recu = self.clean_value(row.get('Vacc_Received', ''))
-        if not vaccin_recu:
-            return None
-        
-        vaccin, created = Vaccin.objects.get_or_create(
-            dossier=dossier,
-            nomVaccin=vaccin_recu,
-            defaults={
-                'typeVaccination': self.clean_value(row.get('Vacc_Program', '')),
-                'dose': self.safe_int(row.get('Last_Vac_year', 1)) or 1
-            }
-        )
-        return vaccin
-
-    def create_infection(self, dossier, row):
-        """Crée une infection"""
-        infection_actuelle = self.clean_value(row.get('Cur_Infection1', ''))
-        if not infection_actuelle:
-            return None
-        
-        infection, created = Infection.objects.get_or_create(
-            dossier=dossier,
-            nomInfection=infection_actuelle,
-            defaults={
-                'typeInfection': self.clean_value(row.get('Cur_Infection1_type', ''))
-            }
-        )
-        return infection
-
     def post(self, request):
-        # Debug: afficher les fichiers reçus
-        logger.info("=== DEBUG IMPORT CSV ===")
-        logger.info(f"FILES reçus: {list(request.FILES.keys())}")
-        logger.info(f"Content-Type: {request.content_type}")
-        logger.info(f"Headers: {dict(request.headers)}")
+        logger.info(f"Import CSV - FILES reçus: {list(request.FILES.keys())}")
         
         # Accepter plusieurs noms de champ pour le fichier
         file = request.FILES.get('file') or request.FILES.get('csv_file')
@@ -707,150 +449,38 @@ class ImportCSVView(APIView):
                 "message": f"Aucun fichier CSV fourni. Utilisez le champ 'file' ou 'csv_file'. Fichiers reçus: {list(request.FILES.keys())}"
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        # Par défaut l'import tourne en arrière-plan ; ?synchrone=true conserve l'ancien comportement
+        synchrone = str(request.query_params.get('synchrone', request.data.get('synchrone', ''))).lower() in ['1', 'true', 'oui']
+        # ?mise_a_jour=true : les patients existants dont la ligne a changé sont mis à jour
+        mise_a_jour = str(request.query_params.get('mise_a_jour', request.data.get('mise_a_jour', ''))).lower() in ['1', 'true', 'oui']
+        if not synchrone:
+            job = ImportJob.objects.create(
+                utilisateur=request.user,
+                fichier=file,
+                nom_fichier=file.name,
+                mise_a_jour=mise_a_jour
+            )
+            soumettre_import(job)
+            return Response({
+                'status': True,
+                'message': "Import planifié, suivez sa progression via l'identifiant de tâche",
+                'job_id': job.pk,
+                'statut': job.statut
+            }, status=status.HTTP_202_ACCEPTED)
+
         try:
-            # Détection automatique de l'encodage avec fallback
-            raw_data = file.read()
-            file.seek(0)
-            
-            logger.info(f"=== ENCODAGE === ===")
-            logger.info(f"Taille du fichier reçu: {len(raw_data)} bytes")
-            logger.info(f"Premiers bytes: {raw_data[:50]}")
-            
-            # Essayer plusieurs encodages (ISO-8859-1 en premier car c'est le plus courant pour les CSV)
-            encodings_to_try = ['ISO-8859-1', 'latin-1', 'cp1252', 'windows-1252', 'utf-8']
-            encoding_detected = None
-            
-            # D'abord essayer chardet
+            # Encodage détecté sur un échantillon, puis lecture du fichier par morceaux
             try:
-                detected = chardet.detect(raw_data)
-                logger.info(f"Chardet détecté: {detected}")
-                if detected['confidence'] > 0.7 and detected['encoding']:
-                    # Ajouter l'encodage détecté en premier s'il n'est pas déjà dans la liste
-                    if detected['encoding'] not in encodings_to_try:
-                        encodings_to_try.insert(0, detected['encoding'])
-            except Exception as e:
-                logger.info(f"Erreur chardet: {e}")
-            
-            logger.info(f"Encodages à tester: {encodings_to_try}")
-            
-            # Essayer chaque encodage
-            for encoding in encodings_to_try:
-                try:
-                    file.seek(0)
-                    # Lire le fichier en mode binaire d'abord
-                    raw_data = file.read()
-                    # Décoder avec l'encodage spécifié
-                    decoded_data = raw_data.decode(encoding)
-                    # Créer un StringIO object pour pandas
-                    from io import StringIO
-                    df = pd.read_csv(StringIO(decoded_data), sep=';')
-                    encoding_detected = encoding
-                    logger.info(f"✓ Succès avec l'encodage: {encoding}")
-                    logger.info(f"  Dimensions: {df.shape}")
-                    break
-                except UnicodeDecodeError as e:
-                    logger.info(f"✗ {encoding}: UnicodeDecodeError - {str(e)[:50]}...")
-                    continue
-                except Exception as e:
-                    logger.info(f"✗ {encoding}: Exception - {str(e)[:50]}...")
-                    continue
-            
-            if encoding_detected is None:
-                return Response({
-                    "status": False,
-                    "message": "Impossible de lire le fichier CSV. Vérifiez l'encodage du fichier."
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Vérification des colonnes requises
-            required_columns = ['ID', 'Age', 'Sex', 'Place_birth', 'Edu_Level', ' weight', 'height']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
+                encoding_detected = detecter_encodage(file)
+                stats = ImportateurCSV(mise_a_jour=mise_a_jour).importer_morceaux(
+                    lire_csv_par_morceaux(file, encoding_detected), reprise=point_de_reprise(file)
+                )
+            except (ValueError, UnicodeDecodeError) as e:
                 return Response({
                     "status": False,
-                    "message": f"Colonnes manquantes: {', '.join(missing_columns)}"
+                    "message": str(e)
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Statistiques
-            stats = {
-                'patients_created': 0,
-                'patients_skipped': 0,
-                'dossiers_created': 0,
-                'analyses_created': 0,
-                'resultats_created': 0,
-                'alertes_created': 0,
-                'vaccins_created': 0,
-                'infections_created': 0,
-                'errors': []
-            }
-
-            for index, row in df.iterrows():
-                try:
-                    logger.info(f"\n=== TRAITEMENT LIGNE {index + 1} ===")
-                    logger.info(f"ID: {row.get('ID', 'N/A')}")
-                    logger.info(f"Age: {row.get('Age', 'N/A')}")
-                    logger.info(f"Sex: {row.get('Sex', 'N/A')}")
-                    
-                    # 1. Créer les objets de base
-                    logger.info(f"  Création des objets de base...")
-                    profession = self.get_or_create_profession(row)
-                    logger.info(f"  ✓ Profession créée: {profession}")
-                    
-                    residence = self.get_or_create_residence(row)
-                    logger.info(f"  ✓ Residence créée: {residence}")
-                    
-                    logement = self.get_or_create_logement(row)
-                    logger.info(f"  ✓ Logement créé: {logement}")
-                    
-                    comportement = self.get_or_create_comportement(row)
-                    logger.info(f"  ✓ Comportement créé: {comportement}")
-                    
-                    alimentation = self.get_or_create_alimentation(row)
-                    logger.info(f"  ✓ Alimentation créée: {alimentation}")
-                    
-                    # 2. Créer le patient
-                    patient = self.create_patient(row, profession, residence, logement, comportement, alimentation)
-                    if patient:
-                        stats['patients_created'] += 1
-                        logger.info(f"✓ Patient créé: {patient.id_code}")
-                    else:
-                        stats['patients_skipped'] += 1
-                        logger.info(f"✗ Patient ignoré")
-                        continue
-                    
-                    # 3. Créer le dossier médical
-                    dossier = self.create_dossier_medical(patient, row)
-                    if dossier:
-                        stats['dossiers_created'] += 1
-                    
-                    # 4. Créer l'analyse
-                    analyse = self.create_analyse(dossier, row)
-                    if analyse:
-                        stats['analyses_created'] += 1
-                    
-                    # 5. Créer le résultat d'analyse
-                    resultat = self.create_resultat_analyse(analyse, row)
-                    if resultat:
-                        stats['resultats_created'] += 1
-                    
-                    # 6. Créer les alertes
-                    alertes = self.create_alerte(dossier, row)
-                    stats['alertes_created'] += len(alertes)
-                    
-                    # 7. Créer le vaccin
-                    vaccin = self.create_vaccin(dossier, row)
-                    if vaccin:
-                        stats['vaccins_created'] += 1
-                    
-                    # 8. Créer l'infection
-                    infection = self.create_infection(dossier, row)
-                    if infection:
-                        stats['infections_created'] += 1
-
-                except Exception as e:
-                    error_msg = f"Ligne {index + 1}: {str(e)}"
-                    stats['errors'].append(error_msg)
-                    continue
-
             return Response({
                 'status': True,
                 'message': f"Import complet terminé avec succès!",
@@ -858,28 +488,82 @@ class ImportCSVView(APIView):
                     'encoding_used': encoding_detected,
                     'patients_created': stats['patients_created'],
                     'patients_skipped': stats['patients_skipped'],
+                    'patients_updated': stats['patients_updated'],
                     'dossiers_created': stats['dossiers_created'],
                     'analyses_created': stats['analyses_created'],
                     'resultats_created': stats['resultats_created'],
                     'alertes_created': stats['alertes_created'],
                     'vaccins_created': stats['vaccins_created'],
                     'infections_created': stats['infections_created'],
+                    'colonnes': stats['colonnes'],
                     'errors': stats['errors'][:10] if stats['errors'] else []
                 }
             }, status=status.HTTP_201_CREATED)
 
-        except UnicodeDecodeError as e:
+        except Exception as e:
+            return Response({
+                "status": False,
+                "message": f"Erreur lors de l'importation : {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ValidationCSVView(APIView):
+    """
+    Validation à blanc d'un fichier CSV : lecture et nettoyage de tout le
+    fichier sans écriture en base, pour corriger le fichier avant l'import.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        file = request.FILES.get('file') or request.FILES.get('csv_file')
+
+        if not file:
             return Response({
                 "status": False,
-                "message": f"Erreur d'encodage : {str(e)}"
+                "message": f"Aucun fichier CSV fourni. Utilisez le champ 'file' ou 'csv_file'. Fichiers reçus: {list(request.FILES.keys())}"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
+        try:
+            rapport = valider_csv(file)
+        except (ValueError, UnicodeDecodeError) as e:
             return Response({
                 "status": False,
-                "message": f"Erreur lors de l'importation : {str(e)}"
+                "message": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Erreur lors de la validation CSV : {e}")
+            return Response({
+                'status': False,
+                'message': f"Erreur lors de la validation : {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        return Response({'status': True, 'nom_fichier': file.name, **rapport})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def import_job_status(request, job_id):
+    """Progression d'un import CSV en arrière-plan (lignes traitées, compteurs par table, erreurs)"""
+    job = get_object_or_404(ImportJob, pk=job_id)
+    if job.utilisateur_id != request.user.id and not request.user.is_admin:
+        return Response({'error': 'Non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+    data = ImportJobSerializer(job).data
+    data.update(progression_import(job))
+    return Response(data)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def reprendre_import_job(request, job_id):
+    """Relance un import interrompu ; il reprend après le dernier morceau validé"""
+    job = get_object_or_404(ImportJob, pk=job_id)
+    if job.utilisateur_id != request.user.id and not request.user.is_admin:
+        return Response({'error': 'Non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+    if not job.fichier or not relancer_import(job):
+        return Response({'error': "Seul un import interrompu dont le fichier est conservé peut être repris"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response({'job_id': job.pk, 'statut': job.statut}, status=status.HTTP_202_ACCEPTED)
+
 @api_view(['GET'])
 def medecins_list(request):
     """Retourne la liste des utilisateurs ayant le rôle MEDECIN"""
@@ -1174,252 +858,192 @@ def mes_patients(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_patient_csv(request, patient_id):
-    import csv
-    from io import StringIO
     patient = get_object_or_404(Patient, pk=patient_id)
-    dossiers = patient.dossiermedical_set.order_by('-dateCreation')
-    dossier = dossiers.first() if dossiers.exists() else None
-    analyses = []
-    if dossier:
-        for analyse in dossier.analyse_set.all():
-            res = ''
-            if hasattr(analyse, 'resultatanalyse'):
-                ra = analyse.resultatanalyse
-                champs = ['glycemie', 'cholesterol', 'triglyceride', 'hdl', 'ldl', 'creatinine', 'uree', 'proteinurie']
-                res = '; '.join([f"{champ}: {getattr(ra, champ, '')}" for champ in champs if hasattr(ra, champ)])
-            analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - {res}")
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID Patient', 'Nom', 'Prénom', 'Date naissance', 'Dossier médical', 'Analyses'])
-    writer.writerow([
-        getattr(patient, 'idPatient', ''),
-        getattr(patient, 'nom', ''),
-        getattr(patient, 'prenom', ''),
-        getattr(patient, 'dateNaissance', ''),
-        dossier.commentaireGeneral if dossier else '',
-        ' | '.join(analyses)
-    ])
-    response = HttpResponse(output.getvalue(), content_type='text/csv')
+    response = HttpResponse(rendre_patient_csv(patient), content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="patient_{patient_id}.csv"'
     return response
 
+def export_asynchrone(request, estimation):
+    """
+    Vrai si l'export est mis en file plutôt que rendu pendant la requête :
+    rendu estimé trop long, ou ?asynchrone=true demandé par le client
+    """
+    asynchrone = str(request.query_params.get('asynchrone', request.data.get('asynchrone', ''))).lower() in ['1', 'true', 'oui']
+    return asynchrone or export_differe(estimation)
+
+def reponse_export_planifie(job):
+    """Réponse 202 d'un export mis en file : suivi et téléchargement via export-jobs/<id>/"""
+    # Le job a pu démarrer dès sa création si une place était libre
+    job.refresh_from_db(fields=['statut'])
+    return Response({
+        'message': "Export planifié, suivez sa progression via l'identifiant de tâche",
+        'job_id': job.pk,
+        'statut': job.statut,
+        'position_file': position_file(job),
+        'lignes': job.lignes_total,
+        'cout_estime': job.cout_estime,
+    }, status=status.HTTP_202_ACCEPTED)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_patients_csv(request):
-    patients = Patient.objects.all()
-    response = HttpResponse(content_type='text/csv')
+    # Export trop long pour la requête (ou ?asynchrone=true) : mis en file et rendu en arrière-plan
+    estimation = estimer_export('PATIENTS', 'CSV')
+    if export_asynchrone(request, estimation):
+        return reponse_export_planifie(creer_export(request.user, 'PATIENTS', 'CSV', estimation=estimation))
+    # Réponse en flux : les patients sont lus par pages avec leurs relations préchargées
+    response = StreamingHttpResponse(lignes_patients_csv(), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="patients.csv"'
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID Patient', 'Dossier résumé', 'Dossier date', 'Analyses', 'Résultats', 'Infections', 'Vaccins', 'Données médicales'
-    ])
-    for patient in patients:
-        # Dossier médical principal (le plus récent)
-        dossier = patient.dossiermedical_set.order_by('-dateCreation').first()
-        dossier_resume = dossier.commentaireGeneral if dossier else ''
-        dossier_date = dossier.dateCreation if dossier else ''
-        # Analyses
-        analyses = []
-        resultats = []
-        if dossier:
-            for analyse in dossier.analyse_set.all():
-                analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse})")
-                if hasattr(analyse, 'resultatanalyse'):
-                    ra = analyse.resultatanalyse
-                    res = []
-                    for champ in ['glycemie', 'cholesterol', 'triglyceride', 'hdl', 'ldl', 'creatinine', 'uree', 'proteinurie']:
-                        if hasattr(ra, champ):
-                            res.append(f"{champ}: {getattr(ra, champ, '')}")
-                    resultats.append('; '.join(res))
-        # Infections
-        infections = []
-        if dossier:
-            for inf in dossier.infection_set.all():
-                infections.append(f"{inf.nomInfection} ({inf.typeInfection})")
-        # Vaccins
-        vaccins = []
-        if dossier:
-            for vac in dossier.vaccin_set.all():
-                vaccins.append(f"{vac.nomVaccin} ({vac.typeVaccination}, dose {vac.dose})")
-        # Données médicales
-        donnees_medicales = []
-        for champ in ['antecedents', 'allergies', 'traitements']:
-            if hasattr(patient, champ):
-                donnees_medicales.append(f"{champ}: {getattr(patient, champ, '')}")
-        writer.writerow([
-            getattr(patient, 'idPatient', ''),
-            dossier_resume,
-            dossier_date,
-            ' | '.join(analyses),
-            ' | '.join(resultats),
-            ' | '.join(infections),
-            ' | '.join(vaccins),
-            ' | '.join(donnees_medicales)
-        ])
     return response
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def export_patients_parquet(request):
+    """
+    Jeu de données de recherche : archive ZIP d'un fichier Parquet typé par
+    entité (patients, dossiers, analyses, resultats, infections, vaccins).
+    ?compression=zstd (défaut), snappy ou none.
+    """
+    if not parquet_disponible():
+        return Response({'error': "Export Parquet indisponible : installez pyarrow"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    compression = request.query_params.get('compression', 'zstd').lower()
+    if compression not in COMPRESSIONS_PARQUET:
+        return Response({'error': f"Compression inconnue, valeurs possibles : {', '.join(COMPRESSIONS_PARQUET)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # Archive construite sur disque puis envoyée ; le fichier temporaire disparaît à la fermeture
+    archive = tempfile.TemporaryFile()
+    compteurs = exporter_jeu_recherche(archive, compression)
+    archive.seek(0)
+    logger.info(f"Export Parquet ({compression}) : {compteurs}")
+    return FileResponse(archive, as_attachment=True, filename='jeu_recherche_parquet.zip', content_type='application/zip')
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_delta(request):
+    """
+    Export incrémental : patients, dossiers, analyses et résultats créés ou
+    modifiés après ?depuis=<date ISO 8601>, et suppressions survenues depuis.
+    Le champ "watermark" de la réponse est la valeur de ?depuis du prochain appel.
+    """
+    depuis = request.query_params.get('depuis')
+    if depuis:
+        try:
+            date_depuis = parse_datetime(depuis)
+        except ValueError:
+            date_depuis = None
+        if date_depuis is None:
+            return Response({'error': "Paramètre 'depuis' invalide (date ISO 8601 attendue)"}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(date_depuis):
+            date_depuis = timezone.make_aware(date_depuis)
+    else:
+        date_depuis = None
+    return StreamingHttpResponse(flux_delta(date_depuis), content_type='application/json')
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
 def export_patients_pdf(request):
-    patients = Patient.objects.all()
-    
-    # Création de la réponse PDF
+    """
+    Export PDF de tous les patients, renvoyé directement si son rendu est
+    assez court. Sinon, ou avec ?asynchrone=true, le rendu est planifié en
+    arrière-plan (suivi et téléchargement via export-jobs/<id>/).
+    """
+    estimation = estimer_export('PATIENTS', 'PDF')
+    if export_asynchrone(request, estimation):
+        return reponse_export_planifie(creer_export(request.user, 'PATIENTS', 'PDF', estimation=estimation))
+
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="patients.pdf"'
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # En-têtes du tableau
-    data = [
-        ['ID Patient', 'Dossier résumé', 'Dossier date', 'Analyses', 'Résultats', 'Infections', 'Vaccins', 'Données médicales']
-    ]
-    
-    for patient in patients:
-        dossier = patient.dossiermedical_set.order_by('-dateCreation').first()
-        dossier_resume = dossier.commentaireGeneral if dossier else ''
-        dossier_date = dossier.dateCreation if dossier else ''
-        
-        analyses = []
-        resultats = []
-        if dossier:
-            for analyse in dossier.analyse_set.all():
-                analyses.append(f"{analyse.typeAnalyse} ({analyse.dateAnalyse})")
-                if hasattr(analyse, 'resultatanalyse'):
-                    ra = analyse.resultatanalyse
-                    res = []
-                    for champ in ['glycemie', 'cholesterol', 'triglyceride', 'hdl', 'ldl', 'creatinine', 'uree', 'proteinurie']:
-                        if hasattr(ra, champ):
-                            val = getattr(ra, champ, '')
-                            if val is not None:
-                                res.append(f"{champ}: {val}")
-                    resultats.append('; '.join(res))
-        
-        infections = []
-        if dossier:
-            for inf in dossier.infection_set.all():
-                infections.append(f"{inf.nomInfection} ({inf.typeInfection})")
-        
-        vaccins = []
-        if dossier:
-            for vac in dossier.vaccin_set.all():
-                vaccins.append(f"{vac.nomVaccin} ({vac.typeVaccination}, dose {vac.dose})")
-        
-        donnees_medicales = []
-        for champ in ['antecedents', 'allergies', 'traitements']:
-            if hasattr(patient, champ):
-                val = getattr(patient, champ, '')
-                if val:
-                    donnees_medicales.append(f"{champ}: {val}")
-        
-        data.append([
-            getattr(patient, 'idPatient', ''),
-            dossier_resume,
-            dossier_date,
-            ' | '.join(analyses),
-            ' | '.join(resultats),
-            ' | '.join(infections),
-            ' | '.join(vaccins),
-            ' | '.join(donnees_medicales)
-        ])
-    
-    # Création du tableau PDF
-    table = Table(data, repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.lightblue),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 12),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-    ]))
-    
-    # Composition du document
-    elements.append(Paragraph("Export des patients", styles['Title']))
-    elements.append(Spacer(1, 12))
-    elements.append(table)
-    doc.build(elements)
-    
-    # Écriture dans la réponse HTTP
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    
+    rendre_patients_pdf(response)
     return response
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_status(request, job_id):
+    """État d'un export en arrière-plan (patients rendus, statut, message)"""
+    job = get_object_or_404(ExportJob, pk=job_id)
+    if job.utilisateur_id != request.user.id and not request.user.is_admin:
+        return Response({'error': 'Non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(ExportJobSerializer(job).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def telecharger_export_job(request, job_id):
+    """Téléchargement du fichier d'un export terminé"""
+    job = get_object_or_404(ExportJob, pk=job_id)
+    if job.utilisateur_id != request.user.id and not request.user.is_admin:
+        return Response({'error': 'Non autorisé'}, status=status.HTTP_403_FORBIDDEN)
+    if job.statut != 'TERMINE' or not job.fichier:
+        return Response({'error': "L'export n'est pas terminé", 'statut': job.statut}, status=status.HTTP_409_CONFLICT)
+    return FileResponse(
+        job.fichier.open('rb'), as_attachment=True,
+        filename=f"{job.type_export.lower()}.{job.format.lower()}", content_type=CONTENT_TYPES_EXPORT[job.format]
+    )
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_patient_pdf(request, patient_id):
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet
-    from io import BytesIO
+    # Document mis en cache par version des données : rendu seulement s'il a changé
     patient = get_object_or_404(Patient, pk=patient_id)
-    dossiers = patient.dossiermedical_set.order_by('-dateCreation')
-    dossier = dossiers.first() if dossiers.exists() else None
-    analyses = []
-    if dossier:
-        for analyse in dossier.analyse_set.all():
-            # Récupérer tous les résultats d'analyse pour cette analyse
-            resultats = []
-            try:
-                ra = analyse.resultatanalyse
-                # Récupérer tous les champs du résultat d'analyse
-                champs_resultats = [
-                    'glycemie', 'cholesterol', 'triglyceride', 'hdl', 'ldl', 
-                    'creatinine', 'uree', 'proteinurie'
-                ]
-                for champ in champs_resultats:
-                    if hasattr(ra, champ):
-                        valeur = getattr(ra, champ)
-                        # Inclure même les valeurs à 0
-                        resultats.append(f"{champ}: {valeur}")
-                
-                # Formater l'analyse avec tous ses résultats
-                if resultats:
-                    analyse_text = f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - {', '.join(resultats)}"
-                else:
-                    analyse_text = f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - Aucun résultat disponible"
-                    
-            except ResultatAnalyse.DoesNotExist:
-                analyse_text = f"{analyse.typeAnalyse} ({analyse.dateAnalyse}) - Aucun résultat disponible"
-            
-            analyses.append(analyse_text)
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    elements.append(Paragraph(f"Export du patient {getattr(patient, 'idPatient', patient_id)}", styles['Title']))
-    elements.append(Spacer(1, 12))
-    data = [
-        ['Dossier médical', 'Analyses']
-    ]
-    data.append([
-        dossier.commentaireGeneral if dossier else '',
-        ' | '.join(analyses) if analyses else 'Aucune analyse disponible'
-    ])
-    table = Table(data, repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.lightblue),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 12),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="patient_{patient_id}.pdf"'
+    return reponse_export_cache(
+        request, 'patient', patient_id, version_patient(patient),
+        lambda: rendre_patient_pdf(patient), f"patient_{patient_id}.pdf"
+    )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def export_patients_lot(request):
+    """
+    Archive ZIP des exports de plusieurs patients en une requête.
+    Patients donnés par 'patients' (liste d'identifiants) ou par 'demande' : une
+    demande d'exportation approuvée de l'utilisateur, dont donnees_autorisees
+    porte la liste 'patients'. 'format' : pdf (défaut) ou csv.
+    Les documents sont rendus en parallèle et envoyés au fur et à mesure.
+    """
+    format_lot = str(request.data.get('format', 'pdf')).lower()
+    if format_lot not in FORMATS_LOT:
+        return Response({'error': f"Format inconnu, valeurs possibles : {', '.join(FORMATS_LOT)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    demande = None
+    if request.data.get('demande') is not None:
+        demandes = DemandeExportation.objects.filter(pk=request.data['demande'], statut='APPROUVEE')
+        if not request.user.is_admin:
+            demandes = demandes.filter(demandeur=request.user)
+        demande = demandes.first()
+        if demande is None:
+            return Response({'error': "Demande d'exportation approuvée introuvable"}, status=status.HTTP_404_NOT_FOUND)
+        patient_ids = (demande.donnees_autorisees or {}).get('patients')
+    else:
+        patient_ids = request.data.get('patients')
+
+    if not isinstance(patient_ids, list) or not patient_ids:
+        return Response({'error': "Liste 'patients' requise"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        patient_ids = list(dict.fromkeys(int(patient_id) for patient_id in patient_ids))
+    except (TypeError, ValueError):
+        return Response({'error': "Identifiants de patients invalides"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(patient_ids) > MAX_PATIENTS_LOT:
+        return Response({'error': f"{MAX_PATIENTS_LOT} patients au plus par lot"}, status=status.HTTP_400_BAD_REQUEST)
+
+    existants = set(Patient.objects.filter(pk__in=patient_ids).values_list('pk', flat=True))
+    introuvables = [patient_id for patient_id in patient_ids if patient_id not in existants]
+    if introuvables:
+        return Response({'error': "Patients introuvables", 'patients_introuvables': introuvables}, status=status.HTTP_404_NOT_FOUND)
+
+    log_audit(
+        user=request.user,
+        type_acces='EXPORT',
+        donnees_concernees=f"Lot de {len(patient_ids)} patients ({format_lot.upper()})"
+        + (f" - DemandeExportation #{demande.id}" if demande else '')
+    )
+    if demande is not None and not demande.utilisee:
+        demande.utilisee = True
+        demande.save(update_fields=['utilisee'])
+
+    response = StreamingHttpResponse(flux_lot_patients(patient_ids, format_lot), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="patients.zip"'
     return response
 
 @api_view(['GET'])
@@ -1604,17 +1228,17 @@ class ExportDossierMedicalView(APIView):
     def get(self, request, dossier_id):
         logger.info(f"[DEBUG] ExportDossierMedicalView appelé avec dossier_id={dossier_id} par user={request.user}")
         try:
-            dossier = DossierMedical.objects.get(pk=dossier_id)
-            logger.info(f"[DEBUG] Dossier trouvé: {dossier}")
+            dossier = instantane_dossier(dossier_id, sections=())['dossier']
+            logger.info(f"[DEBUG] Dossier trouvé: {dossier['idDossier']}")
             # Génération du CSV
             response = HttpResponse(content_type='text/csv')
             response['Content-Disposition'] = f'attachment; filename=\"dossier_{dossier_id}.csv\"'
             writer = csv.writer(response)
             writer.writerow(['Champ', 'Valeur'])
-            writer.writerow(['ID', dossier.idDossier])
-            writer.writerow(['Patient', dossier.patient.idPatient])
-            writer.writerow(['Date création', dossier.dateCreation])
-            writer.writerow(['Commentaire', dossier.commentaireGeneral])
+            writer.writerow(['ID', dossier['idDossier']])
+            writer.writerow(['Patient', dossier['patient_id']])
+            writer.writerow(['Date création', dossier['dateCreation']])
+            writer.writerow(['Commentaire', dossier['commentaireGeneral']])
             # Ajoute d'autres champs si besoin
             log_audit(
                 user=request.user,
@@ -1630,6 +1254,25 @@ class ExportDossierMedicalView(APIView):
             logger.info(f"[DEBUG] Exception dans ExportDossierMedicalView: {e}")
             return JsonResponse({'error': f"Erreur lors de l'export : {str(e)}"}, status=500)
 
+class ExportDossierMedicalJSONView(APIView):
+    """Dossier complet en JSON : patient, analyses et résultats, vaccins, infections et alertes"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dossier_id):
+        try:
+            response = reponse_instantane(request, instantane_dossier(dossier_id), f"dossier_{dossier_id}.json")
+            log_audit(
+                user=request.user,
+                type_acces='EXPORT',
+                donnees_concernees=f"Export JSON dossier médical #{dossier_id}"
+            )
+            return response
+        except DossierMedical.DoesNotExist:
+            return JsonResponse({'error': 'Dossier médical non trouvé'}, status=404)
+        except Exception as e:
+            logger.error(f"Erreur export JSON dossier #{dossier_id} : {e}")
+            return JsonResponse({'error': f"Erreur lors de l'export JSON : {str(e)}"}, status=500)
+
 class ExportDossierMedicalPDFView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -1637,42 +1280,10 @@ class ExportDossierMedicalPDFView(APIView):
         logger.info(f"[DEBUG] ExportDossierMedicalPDFView appelé avec dossier_id={dossier_id} par user={request.user}")
         try:
             dossier = DossierMedical.objects.get(pk=dossier_id)
-            patient = dossier.patient
-            analyses = Analyse.objects.filter(dossier=dossier)
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="dossier_{dossier_id}.pdf"'
-            p = canvas.Canvas(response)
-            y = 800
-            p.drawString(100, y, f"Dossier médical #{dossier.idDossier}")
-            y -= 20
-            p.drawString(100, y, f"Patient ID: {patient.idPatient}")
-            y -= 20
-            p.drawString(100, y, f"Date création: {dossier.dateCreation}")
-            y -= 20
-            p.drawString(100, y, f"Commentaire: {dossier.commentaireGeneral}")
-            y -= 40
-            p.drawString(100, y, "Analyses et résultats :")
-            y -= 20
-            if analyses.exists():
-                for analyse in analyses:
-                    p.drawString(120, y, f"Analyse ID: {analyse.idAnalyse} | Type: {analyse.typeAnalyse} | Date: {analyse.dateAnalyse}")
-                    y -= 20
-                    try:
-                        resultat = analyse.resultatanalyse
-                        p.drawString(140, y, f"Glycémie: {resultat.glycemie} | Cholestérol: {resultat.cholesterol} | Triglycéride: {resultat.triglyceride}")
-                        y -= 20
-                        p.drawString(140, y, f"HDL: {resultat.hdl} | LDL: {resultat.ldl} | Créatinine: {resultat.creatinine} | Urée: {resultat.uree} | Protéinurie: {resultat.proteinurie}")
-                        y -= 30
-                    except ResultatAnalyse.DoesNotExist:
-                        p.drawString(140, y, "Aucun résultat d'analyse associé.")
-                        y -= 30
-                    if y < 100:
-                        p.showPage()
-                        y = 800
-            else:
-                p.drawString(120, y, "Aucune analyse trouvée pour ce dossier.")
-            p.showPage()
-            p.save()
+            response = reponse_export_cache(
+                request, 'dossier', dossier_id, version_dossier(dossier),
+                lambda: rendre_dossier_pdf(dossier), f"dossier_{dossier_id}.pdf"
+            )
             log_audit(
                 user=request.user,
                 type_acces='EXPORT',
@@ -1734,23 +1345,12 @@ class ExportResultatsAnalysePDFView(APIView):
     def get(self, request, analyse_id):
         logger.info(f"[DEBUG] ExportResultatsAnalysePDFView appelé avec analyse_id={analyse_id} par user={request.user}")
         try:
-            analyse = ResultatAnalyse.objects.get(pk=analyse_id)
+            analyse = ResultatAnalyse.objects.select_related('analyse').get(pk=analyse_id)
             logger.info(f"[DEBUG] Analyse trouvée: {analyse}")
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename=\"resultats_analyse_{analyse_id}.pdf\"'
-            p = canvas.Canvas(response)
-            p.drawString(100, 800, f"Résultat d'analyse #{analyse.idResultatAnalyse}")
-            # Correction ici : on va chercher la date via la relation Analyse
-            p.drawString(100, 780, f"Date analyse: {analyse.analyse.dateAnalyse}")
-            p.drawString(100, 760, f"Température: {getattr(analyse, 'temperature', '-')}")
-            p.drawString(100, 740, f"Pression Systolique: {getattr(analyse, 'pressionSystolique', '-')}")
-            p.drawString(100, 720, f"Pression Diastolique: {getattr(analyse, 'pressionDiastolique', '-')}")
-            p.drawString(100, 700, f"Glycémie: {analyse.glycemie}")
-            p.drawString(100, 680, f"Lymphocytes: {getattr(analyse, 'lymphocytesAbsolus', '-')}")
-            p.drawString(100, 660, f"Neutrophiles: {getattr(analyse, 'neutrophilesAbsolus', '-')}")
-            # Ajoute d'autres champs si besoin
-            p.showPage()
-            p.save()
+            response = reponse_export_cache(
+                request, 'resultat', analyse_id, version_resultat(analyse),
+                lambda: rendre_resultat_pdf(analyse), f"resultats_analyse_{analyse_id}.pdf"
+            )
             log_audit(
                 user=request.user,
                 type_acces='EXPORT',
@@ -1775,75 +1375,18 @@ def rapport_audit(request):
         return export_pdf()
 
     else:
-        # format JSON par défaut
-        acces_list = Acces.objects.all().values(
-            'id', 'dateAcces', 'utilisateur__username', 'typeAcces', 'donnees_concernees'
-        )
-        return JsonResponse(list(acces_list), safe=False)
+        # format JSON par défaut, produit au fil de l'eau
+        return StreamingHttpResponse(flux_rapport_audit_json(), content_type='application/json')
 
 def export_csv():
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="rapport_audit.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Date', 'Utilisateur', 'Type d\'accès', 'Données concernées'])
-
-        for acces in Acces.objects.all():
-            writer.writerow([
-            acces.dateAcces,
-            acces.utilisateur.username if acces.utilisateur else '',
-            acces.typeAcces,
-            acces.donnees_concernees
-        ])
-        return response
+    response = StreamingHttpResponse(flux_rapport_audit_csv(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="rapport_audit.csv"'
+    return response
 
 def export_pdf():
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Titre
-    elements.append(Paragraph("Rapport d'Audit des Accès", styles['Title']))
-    elements.append(Spacer(1, 12))
-
-    # Données
-    data = [['Date', 'Utilisateur', "Type d'accès", 'Données concernées']]
-    for acces in Acces.objects.all():
-        data.append([
-            str(acces.dateAcces),
-            acces.utilisateur.username if acces.utilisateur else '',
-            acces.typeAcces,
-            acces.donnees_concernees or ''
-        ])
-
-    # Tableau stylé
-    table = Table(data, repeatRows=1, colWidths=[80, 100, 100, 300])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#003366')),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 12),
-        ('FONTSIZE', (0,1), (-1,-1), 10),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.lightgrey]),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-    ]))
-    elements.append(table)
-
-    # Pagination (numéro de page)
-    def add_page_number(canvas, doc):
-        page_num = canvas.getPageNumber()
-        text = f"Page {page_num}"
-        canvas.setFont('Helvetica', 9)
-        canvas.drawRightString(780, 15, text)
-
-    doc.build(elements, onFirstPage=add_page_number, onLaterPages=add_page_number)
-
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
+    response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="rapport_audit.pdf"'
+    rendre_rapport_audit_pdf(response)
     return response
 
 # ===================== VUES RÉINITIALISATION MOT DE PASSE =====================
@@ -1905,24 +1448,10 @@ def historique_admin(request):
         alertes_filtres &= Q(gravite=gravite)
     alertes_data = Alerte.objects.filter(alertes_filtres).select_related('utilisateur', 'dossier').order_by('-dateAlerte')[:50]
     
-    # Calculer les statistiques
-    total_actions = Acces.objects.filter(dateAcces__gte=date_debut).count()
-    actions_aujourdhui = Acces.objects.filter(dateAcces__date=timezone.now().date()).count()
+    # Statistiques et graphique d'activité : compteurs horaires (une requête)
+    activite = statistiques_activite(date_debut)
     alertes_critiques = Alerte.objects.filter(gravite='critique', dateAlerte__gte=date_debut).count()
-    tentatives_acces = Acces.objects.filter(typeAcces='CONNEXION', dateAcces__gte=date_debut).count()
-    
-    # Préparer les données pour le graphique d'activité
-    heures = []
-    actions_par_heure = []
-    
-    for i in range(24):
-        heure = f"{i:02d}h"
-        heures.append(heure)
-        count = Acces.objects.filter(
-            dateAcces__gte=date_debut,
-            dateAcces__hour=i
-        ).count()
-        actions_par_heure.append(count)
+    heures = [f"{i:02d}h" for i in range(24)]
     
     return Response({
         'historique': {
@@ -1938,7 +1467,7 @@ def historique_admin(request):
                         'role': acces.utilisateur.role
                     } if acces.utilisateur else None,
                     'regle': {
-                        'id': acces.regle.id,
+                        'id': acces.regle.pk,
                         'nomRegle': acces.regle.nomRegle
                     } if acces.regle else None
                 }
@@ -1946,7 +1475,7 @@ def historique_admin(request):
             ],
             'alertes': [
                 {
-                    'id': alerte.id,
+                    'id': alerte.pk,
                     'dateAlerte': alerte.dateAlerte,
                     'typeAlerte': alerte.typeAlerte,
                     'message': alerte.message,
@@ -1960,14 +1489,14 @@ def historique_admin(request):
             ]
         },
         'stats': {
-            'totalActions': total_actions,
-            'actionsAujourdhui': actions_aujourdhui,
+            'totalActions': activite['total'],
+            'actionsAujourdhui': activite['aujourdhui'],
             'alertesCritiques': alertes_critiques,
-            'tentativesAcces': tentatives_acces
+            'tentativesAcces': activite['connexions']
         },
         'graphique': {
             'heures': heures,
-            'actions_par_heure': actions_par_heure
+            'actions_par_heure': activite['par_heure']
         }
     })
 
@@ -1992,81 +1521,28 @@ def export_historique(request):
     else:
         date_debut = timezone.now() - timedelta(days=7)
     
-    # Récupérer les données
-    acces_data = Acces.objects.filter(
-        dateAcces__gte=date_debut
-    ).select_related('utilisateur', 'regle').order_by('-dateAcces')
-    
+    if format_export not in ['csv', 'pdf']:
+        return Response({'error': 'Format non supporté'}, status=400)
+
+    # Export trop long pour la requête (ou ?asynchrone=true) : mis en file et rendu en arrière-plan
+    parametres = {'periode': periode, 'date_debut': date_debut.isoformat()}
+    estimation = estimer_export('HISTORIQUE', format_export.upper(), parametres)
+    if export_asynchrone(request, estimation):
+        return reponse_export_planifie(
+            creer_export(request.user, 'HISTORIQUE', format_export.upper(), parametres, estimation)
+        )
+
+    # Accès lus par curseur, utilisateur et règle joints dans la même requête
     if format_export == 'csv':
-        response = HttpResponse(content_type='text/csv')
+        response = StreamingHttpResponse(flux_historique_csv(date_debut), content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="historique_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Date/Heure', 'Utilisateur', 'Type d\'Action', 'Ressource', 'Détails'])
-        
-        for acces in acces_data:
-            writer.writerow([
-                acces.dateAcces.strftime('%Y-%m-%d %H:%M:%S'),
-                acces.utilisateur.username if acces.utilisateur else 'N/A',
-                acces.typeAcces,
-                acces.donnees_concernees or 'N/A',
-                acces.regle.nomRegle if acces.regle else 'Action système'
-            ])
-        
         return response
     
     elif format_export == 'pdf':
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="historique_{timezone.now().strftime("%Y%m%d")}.pdf"'
-        
-        # Créer le PDF
-        p = canvas.Canvas(response, pagesize=letter)
-        width, height = letter
-        
-        # Titre
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(1*inch, height-1*inch, "Rapport d'Historique - Conformed")
-        
-        # Informations
-        p.setFont("Helvetica", 12)
-        p.drawString(1*inch, height-1.5*inch, f"Période: {periode}")
-        p.drawString(1*inch, height-1.7*inch, f"Généré le: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # En-têtes du tableau
-        y_position = height - 2.5*inch
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(1*inch, y_position, "Date/Heure")
-        p.drawString(2.5*inch, y_position, "Utilisateur")
-        p.drawString(4*inch, y_position, "Action")
-        p.drawString(5.5*inch, y_position, "Ressource")
-        
-        # Données
-        p.setFont("Helvetica", 8)
-        y_position -= 0.3*inch
-        
-        for acces in acces_data[:50]:  # Limiter à 50 lignes pour le PDF
-            if y_position < 1*inch:  # Nouvelle page si nécessaire
-                p.showPage()
-                y_position = height - 1*inch
-                p.setFont("Helvetica-Bold", 10)
-                p.drawString(1*inch, y_position, "Date/Heure")
-                p.drawString(2.5*inch, y_position, "Utilisateur")
-                p.drawString(4*inch, y_position, "Action")
-                p.drawString(5.5*inch, y_position, "Ressource")
-                y_position -= 0.3*inch
-                p.setFont("Helvetica", 8)
-            
-            p.drawString(1*inch, y_position, acces.dateAcces.strftime('%Y-%m-%d %H:%M'))
-            p.drawString(2.5*inch, y_position, acces.utilisateur.username if acces.utilisateur else 'N/A')
-            p.drawString(4*inch, y_position, acces.typeAcces)
-            p.drawString(5.5*inch, y_position, acces.donnees_concernees or 'N/A')
-            y_position -= 0.2*inch
-        
-        p.showPage()
-        p.save()
+        rendre_historique_pdf(response, date_debut, periode, timezone.now())
         return response
-    
-    return Response({'error': 'Format non supporté'}, status=400)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
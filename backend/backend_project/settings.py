@@ -158,6 +158,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Fichiers déposés (imports CSV en attente de traitement)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -359,6 +363,46 @@ CACHES = {
     }
 }
 
+# Imports CSV en arrière-plan (threads locaux, pas de broker externe)
+IMPORT_CSV_WORKERS = int(os.getenv('IMPORT_CSV_WORKERS', '2'))
+# Processus de préparation des lignes (1 = tout dans le processus courant)
+IMPORT_CSV_PROCESSUS = int(os.getenv('IMPORT_CSV_PROCESSUS', '1'))
+# Chargement par COPY FROM STDIN sur PostgreSQL (bulk_create sinon)
+IMPORT_CSV_COPY = os.getenv('IMPORT_CSV_COPY', 'True').lower() == 'true'
+# Import en cours sans morceau validé depuis ce délai (secondes) : interrompu, peut être repris
+IMPORT_INACTIVITE_MAX = int(os.getenv('IMPORT_INACTIVITE_MAX', '900'))
+
+# Journal des accès : enregistrement par lots en arrière-plan (False = écriture immédiate)
+# (AuditTrailService.enregistrer_acces renvoie alors None : la ligne Acces est écrite plus tard)
+AUDIT_TAMPON = os.getenv('AUDIT_TAMPON', 'True').lower() == 'true'
+AUDIT_TAILLE_LOT = int(os.getenv('AUDIT_TAILLE_LOT', '200'))
+AUDIT_DELAI_MS = int(os.getenv('AUDIT_DELAI_MS', '500'))
+# Segments locaux des accès pas encore en base, rejoués après un arrêt brutal
+AUDIT_JOURNAL_DIR = os.getenv('AUDIT_JOURNAL_DIR', os.path.join(BASE_DIR, 'journal_audit'))
+# Délai maximal avant qu'un processus voie une modification des règles de conformité
+REGLES_VERIFICATION_SECONDES = float(os.getenv('REGLES_VERIFICATION_SECONDES', '1'))
+# Tables d'audit : partitions mensuelles créées à l'avance (PostgreSQL), mois gardés
+# en base, au-delà archivés en CSV compressé par la commande archiver_audit
+AUDIT_PARTITIONS_AVANCE = int(os.getenv('AUDIT_PARTITIONS_AVANCE', '3'))
+AUDIT_RETENTION_MOIS = int(os.getenv('AUDIT_RETENTION_MOIS', '12'))
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archives_audit'))
+# Processus de vérification de la chaîne d'empreintes (commande verifier_audit)
+AUDIT_VERIFICATION_PROCESSUS = int(os.getenv('AUDIT_VERIFICATION_PROCESSUS', '2'))
+
+# Rendu des exports PDF de masse dans un pool de processus
+EXPORT_PDF_PROCESSUS = int(os.getenv('EXPORT_PDF_PROCESSUS', '2'))
+# Exports de masse : au-delà de la durée estimée (secondes) ils sont mis en file,
+# rendus en priorité basse (nice) et limités en nombre simultané
+EXPORT_SEUIL_SECONDES = float(os.getenv('EXPORT_SEUIL_SECONDES', '5'))
+EXPORT_MAX_SIMULTANES = int(os.getenv('EXPORT_MAX_SIMULTANES', '2'))
+EXPORT_MAX_PAR_UTILISATEUR = int(os.getenv('EXPORT_MAX_PAR_UTILISATEUR', '1'))
+EXPORT_PRIORITE = int(os.getenv('EXPORT_PRIORITE', '10'))
+# Au-delà (secondes), un export resté en cours est considéré comme interrompu
+EXPORT_DUREE_MAX = int(os.getenv('EXPORT_DUREE_MAX', '3600'))
+# Documents d'export rendus, mis en cache sur disque (taille maximale en octets, LRU)
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', os.path.join(BASE_DIR, 'cache_exports'))
+EXPORT_CACHE_TAILLE_MAX = int(os.getenv('EXPORT_CACHE_TAILLE_MAX', str(200 * 1024 * 1024)))
+
 # Configuration des sessions - Politique de sécurité stricte
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_CACHE_ALIAS = 'default'
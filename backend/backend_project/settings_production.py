@@ -301,6 +301,46 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 FILE_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'temp')
 
+# Imports CSV en arrière-plan (threads locaux, pas de broker externe)
+IMPORT_CSV_WORKERS = config('IMPORT_CSV_WORKERS', default=2, cast=int)
+# Processus de préparation des lignes (1 = tout dans le processus courant)
+IMPORT_CSV_PROCESSUS = config('IMPORT_CSV_PROCESSUS', default=1, cast=int)
+# Chargement par COPY FROM STDIN sur PostgreSQL (bulk_create sinon)
+IMPORT_CSV_COPY = config('IMPORT_CSV_COPY', default=True, cast=bool)
+# Import en cours sans morceau validé depuis ce délai (secondes) : interrompu, peut être repris
+IMPORT_INACTIVITE_MAX = config('IMPORT_INACTIVITE_MAX', default=900, cast=int)
+
+# Journal des accès : enregistrement par lots en arrière-plan (False = écriture immédiate)
+# (AuditTrailService.enregistrer_acces renvoie alors None : la ligne Acces est écrite plus tard)
+AUDIT_TAMPON = config('AUDIT_TAMPON', default=True, cast=bool)
+AUDIT_TAILLE_LOT = config('AUDIT_TAILLE_LOT', default=200, cast=int)
+AUDIT_DELAI_MS = config('AUDIT_DELAI_MS', default=500, cast=int)
+# Segments locaux des accès pas encore en base, rejoués après un arrêt brutal
+AUDIT_JOURNAL_DIR = config('AUDIT_JOURNAL_DIR', default=os.path.join(BASE_DIR, 'journal_audit'))
+# Délai maximal avant qu'un processus voie une modification des règles de conformité
+REGLES_VERIFICATION_SECONDES = config('REGLES_VERIFICATION_SECONDES', default=1, cast=float)
+# Tables d'audit : partitions mensuelles créées à l'avance (PostgreSQL), mois gardés
+# en base, au-delà archivés en CSV compressé par la commande archiver_audit
+AUDIT_PARTITIONS_AVANCE = config('AUDIT_PARTITIONS_AVANCE', default=3, cast=int)
+AUDIT_RETENTION_MOIS = config('AUDIT_RETENTION_MOIS', default=12, cast=int)
+AUDIT_ARCHIVE_DIR = config('AUDIT_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archives_audit'))
+# Processus de vérification de la chaîne d'empreintes (commande verifier_audit)
+AUDIT_VERIFICATION_PROCESSUS = config('AUDIT_VERIFICATION_PROCESSUS', default=2, cast=int)
+
+# Rendu des exports PDF de masse dans un pool de processus
+EXPORT_PDF_PROCESSUS = config('EXPORT_PDF_PROCESSUS', default=2, cast=int)
+# Exports de masse : au-delà de la durée estimée (secondes) ils sont mis en file,
+# rendus en priorité basse (nice) et limités en nombre simultané
+EXPORT_SEUIL_SECONDES = config('EXPORT_SEUIL_SECONDES', default=5, cast=float)
+EXPORT_MAX_SIMULTANES = config('EXPORT_MAX_SIMULTANES', default=2, cast=int)
+EXPORT_MAX_PAR_UTILISATEUR = config('EXPORT_MAX_PAR_UTILISATEUR', default=1, cast=int)
+EXPORT_PRIORITE = config('EXPORT_PRIORITE', default=10, cast=int)
+# Au-delà (secondes), un export resté en cours est considéré comme interrompu
+EXPORT_DUREE_MAX = config('EXPORT_DUREE_MAX', default=3600, cast=int)
+# Documents d'export rendus, mis en cache sur disque (taille maximale en octets, LRU)
+EXPORT_CACHE_DIR = config('EXPORT_CACHE_DIR', default=os.path.join(BASE_DIR, 'cache_exports'))
+EXPORT_CACHE_TAILLE_MAX = config('EXPORT_CACHE_TAILLE_MAX', default=200 * 1024 * 1024, cast=int)
+
 # Admin site security
 ADMIN_SITE_HEADER = "ConformiMed Administration"
 ADMIN_SITE_TITLE = "ConformiMed Admin Portal"
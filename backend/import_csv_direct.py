@@ -7,13 +7,13 @@ import os
 import sys
 import django
 import pandas as pd
-from datetime import datetime
+from django.db import transaction
 
 # Configuration Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
 django.setup()
 
-from api.models import Patient, Profession, Logement, Residence, Comportement, DossierMedical
+from api.services_import import ImportateurCSV
 
 def import_csv_data():
     """Importe les données du fichier base.csv"""
@@ -43,66 +43,18 @@ def import_csv_data():
         
         print("✅ Toutes les colonnes requises sont présentes.")
         
-        # Statistiques
-        patients_created = 0
-        patients_skipped = 0
-        errors = []
-        
         print("🔄 Début de l'importation...")
         
-        for index, row in df.iterrows():
-            try:
-                id_code = row['ID']
-                
-                # Ignorer les lignes vides
-                if pd.isna(id_code):
-                    continue
-                
-                # Vérifier si le patient existe déjà
-                if Patient.objects.filter(id_code=id_code).exists():
-                    patients_skipped += 1
-                    continue
-                
-                # Préparer les données du patient
-                patient_data = {
-                    'id_code': id_code,
-                    'age': row.get('Age'),
-                    'sex': row.get('Sex'),
-                    'place_birth': row.get('Place_birth'),
-                    'niveau_etude': row.get('Edu_Level'),
-                    'poids': row.get('weight'),
-                    'taille': row.get('height'),
-                }
-                
-                # Ajouter des champs optionnels s'ils existent
-                if 'Date_birth' in row and not pd.isna(row.get('Date_birth')):
-                    try:
-                        patient_data['date_birth'] = pd.to_datetime(row.get('Date_birth')).date()
-                    except:
-                        pass
-                
-                if 'Place_grow' in row and not pd.isna(row.get('Place_grow')):
-                    patient_data['place_grow'] = row.get('Place_grow')
-                
-                if 'Current_resid' in row and not pd.isna(row.get('Current_resid')):
-                    patient_data['current_resid'] = row.get('Current_resid')
-                
-                # Nettoyer les valeurs NaN
-                for key, value in patient_data.items():
-                    if pd.isna(value):
-                        patient_data[key] = None
-                
-                # Créer le patient
-                patient = Patient.objects.create(**patient_data)
-                patients_created += 1
-                
-                # Afficher le progrès tous les 100 patients
-                if patients_created % 100 == 0:
-                    print(f"📈 {patients_created} patients créés...")
-                
-            except Exception as e:
-                errors.append(f"Ligne {index + 1}: {str(e)}")
-                continue
+        # Patients seuls : dimensions résolues via le cache partagé, puis insertion en masse
+        importateur = ImportateurCSV()
+        lignes = importateur.preparer_lignes(df)
+        with transaction.atomic():
+            importateur.resolveur.resoudre(lignes)
+            importateur.creer_patients(lignes)
+        
+        patients_created = importateur.stats['patients_created']
+        patients_skipped = importateur.stats['patients_skipped']
+        errors = importateur.stats['errors']
         
         # Résultats finaux
         print("\n" + "="*50)
@@ -14,6 +14,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
 django.setup()
 
 from django.core.cache import cache
+from django.core.management import call_command
 from django.db import connection
 from api.models import Alerte, Acces, DemandeExportation
 
@@ -38,6 +39,11 @@ def optimiser_base_donnees():
         cursor.execute("VACUUM ANALYZE;")
     print("   VACUUM ANALYZE terminé")
 
+def archiver_audit():
+    """Partitions à venir et archivage des mois anciens des tables d'audit"""
+    print("🗃️ Archivage des tables d'audit...")
+    call_command('archiver_audit')
+
 def verifier_integrite():
     """Vérifier l'intégrité des données"""
     print("🔍 Vérification de l'intégrité...")
@@ -62,6 +68,7 @@ def main():
     
     nettoyer_cache()
     nettoyer_logs_anciens()
+    archiver_audit()
     optimiser_base_donnees()
     verifier_integrite()
     
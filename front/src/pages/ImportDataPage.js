@@ -1,6 +1,8 @@
 import React, { useState } from 'react';
 import { useAuth } from '../contexts/AuthContext';
-import { importCSV } from '../services/api';
+import { importCSV, getImportJob, validerCSV, reprendreImportJob } from '../services/api';
+
+const attendre = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 const ImportDataPage = () => {
   const { user } = useAuth();
@@ -8,11 +10,15 @@ const ImportDataPage = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [message, setMessage] = useState('');
   const [error, setError] = useState('');
+  const [miseAJour, setMiseAJour] = useState(false);
+  const [validation, setValidation] = useState(null);
+  const [jobInterrompu, setJobInterrompu] = useState(null);
 
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
     if (selectedFile && selectedFile.type === 'text/csv') {
       setFile(selectedFile);
+      setValidation(null);
       setError('');
     } else {
       setError('Veuillez sélectionner un fichier CSV valide');
@@ -20,6 +26,71 @@ const ImportDataPage = () => {
     }
   };
 
+  // Vérification à blanc : lecture et nettoyage du fichier, sans écriture en base
+  const handleValidation = async () => {
+    if (!file) {
+      setError('Veuillez sélectionner un fichier');
+      return;
+    }
+
+    setIsLoading(true);
+    setMessage('');
+    setError('');
+
+    try {
+      const formData = new FormData();
+      formData.append('file', file);
+      const rapport = await validerCSV(formData);
+      if (!rapport.status || rapport.colonnes_manquantes) {
+        setValidation(null);
+        setError(rapport.message || 'Fichier invalide');
+        return;
+      }
+      setValidation(rapport);
+    } catch (err) {
+      setError(err.response?.data?.message || 'Erreur de connexion au serveur');
+      console.error('Validation error:', err);
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
+  // Interroge la progression d'un import en arrière-plan jusqu'à sa fin
+  const suivreImport = async (jobId) => {
+    let job = await getImportJob(jobId);
+    while (job.statut === 'EN_ATTENTE' || job.statut === 'EN_COURS') {
+      setMessage(`Importation en cours... ${job.lignes_traitees} / ${job.lignes_total || '?'} lignes traitées`);
+      await attendre(2000);
+      job = await getImportJob(jobId);
+    }
+
+    if (job.statut === 'TERMINE') {
+      setJobInterrompu(null);
+      setMessage(`Importation réussie ! ${job.stats.patients_created} patients créés, ${job.stats.patients_updated || 0} mis à jour, ${job.stats.dossiers_created} dossiers médicaux créés.`);
+    } else {
+      // Les morceaux déjà validés sont conservés : l'import peut être repris
+      setJobInterrompu(job.id);
+      setMessage('');
+      setError(job.message || 'Erreur lors de l\'importation');
+    }
+    return job;
+  };
+
+  const handleReprise = async () => {
+    setIsLoading(true);
+    setMessage('');
+    setError('');
+    try {
+      await reprendreImportJob(jobInterrompu);
+      await suivreImport(jobInterrompu);
+    } catch (err) {
+      setError(err.response?.data?.error || 'Erreur de connexion au serveur');
+      console.error('Resume error:', err);
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     if (!file) {
@@ -34,16 +105,21 @@ const ImportDataPage = () => {
     try {
       const formData = new FormData();
       formData.append('file', file);
+      formData.append('mise_a_jour', miseAJour);
 
       const response = await importCSV(formData);
       
-      if (response.success) {
-        setMessage(`Importation réussie ! ${response.patients_created} patients créés, ${response.dossiers_created} dossiers médicaux créés.`);
+      if (!response.status) {
+        setError(response.message || 'Erreur lors de l\'importation');
+        return;
+      }
+
+      // L'import tourne en arrière-plan : interroger sa progression
+      const job = await suivreImport(response.job_id);
+      if (job.statut === 'TERMINE') {
         setFile(null);
         // Reset file input
         e.target.reset();
-      } else {
-        setError(response.error || 'Erreur lors de l\'importation');
       }
     } catch (err) {
       setError('Erreur de connexion au serveur');
@@ -128,6 +204,19 @@ const ImportDataPage = () => {
               )}
             </div>
 
+            <div className="flex items-center">
+              <input
+                id="mise_a_jour"
+                type="checkbox"
+                className="h-4 w-4 text-indigo-600 border-gray-300 rounded"
+                checked={miseAJour}
+                onChange={(e) => setMiseAJour(e.target.checked)}
+              />
+              <label htmlFor="mise_a_jour" className="ml-2 block text-sm text-gray-700">
+                Mettre à jour les patients existants dont les données ont changé
+              </label>
+            </div>
+
             {error && (
               <div className="bg-red-50 border border-red-200 rounded-md p-4">
                 <div className="flex">
@@ -158,7 +247,49 @@ const ImportDataPage = () => {
               </div>
             )}
 
-            <div className="flex justify-end">
+            {validation && (
+              <div className="bg-blue-50 border border-blue-200 rounded-md p-4 text-sm text-blue-900 space-y-2">
+                <p>
+                  Encodage {validation.encodage} — {validation.lignes} lignes, {validation.insertions_estimees.patients} nouveaux patients
+                  ({validation.patients_existants} déjà présents, {validation.doublons} doublons, {validation.lignes_sans_id} lignes sans ID).
+                </p>
+                {Object.entries(validation.colonnes).filter(([, c]) => c.invalides > 0).map(([nom, c]) => (
+                  <p key={nom}>⚠️ {nom} : {c.invalides} valeurs non convertibles (importées vides)</p>
+                ))}
+                {validation.exemples_invalides.slice(0, 5).map((exemple) => (
+                  <p key={exemple.ligne} className="text-xs text-blue-700">
+                    Ligne {exemple.ligne} ({exemple.id}) : {Object.entries(exemple.valeurs).map(([nom, valeur]) => `${nom}=${valeur}`).join(', ')}
+                  </p>
+                ))}
+                {validation.nb_erreurs > 0 && (
+                  <p className="text-red-700">{validation.nb_erreurs} lignes en erreur : {validation.erreurs.join(' ; ')}</p>
+                )}
+              </div>
+            )}
+
+            <div className="flex justify-end space-x-3">
+              {jobInterrompu && (
+                <button
+                  type="button"
+                  onClick={handleReprise}
+                  disabled={isLoading}
+                  className="px-6 py-2 border border-orange-500 text-sm font-medium rounded-md text-orange-600 hover:bg-orange-50"
+                >
+                  Reprendre l'import
+                </button>
+              )}
+              <button
+                type="button"
+                onClick={handleValidation}
+                disabled={isLoading || !file}
+                className={`px-6 py-2 border text-sm font-medium rounded-md ${
+                  isLoading || !file
+                    ? 'border-gray-300 text-gray-400 cursor-not-allowed'
+                    : 'border-indigo-600 text-indigo-600 hover:bg-indigo-50'
+                }`}
+              >
+                Vérifier le fichier
+              </button>
               <button
                 type="submit"
                 disabled={isLoading || !file}
@@ -143,6 +143,25 @@ export const importCSV = (formData) => {
   }).then(response => response.data);
 };
 
+// Validation à blanc d'un fichier CSV (aucune écriture en base)
+export const validerCSV = (formData) => {
+  return api.post('/import-csv/validation/', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  }).then(response => response.data);
+};
+
+// Progression d'un import lancé en arrière-plan
+export const getImportJob = (jobId) => {
+  return api.get(`/import-jobs/${jobId}/`).then(response => response.data);
+};
+
+// Relance un import interrompu : il reprend après le dernier morceau validé
+export const reprendreImportJob = (jobId) => {
+  return api.post(`/import-jobs/${jobId}/reprendre/`).then(response => response.data);
+};
+
 // === DEMANDES D'EXPORTATION ===
 
 export const exportationService = {